@@ -0,0 +1,168 @@
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+# --- Public FAQ Answer Cache ---
+# Most patient questions are near-duplicates ("what are your opening hours?"), yet each one used to
+# go through the FAQ Action Table and an LLM call. Answers are cached under the normalised question
+# and a scope: the versions of the data the answer was built from (duty list, knowledge base, the
+# dates and doctors the question mentions, and the patient's own bookings when those were in the
+# prompt). When any of that changes the scope changes, so stale answers are simply never matched.
+# Optionally, a question that is not an exact match can reuse the answer of a similar question in
+# the same scope: questions are embedded locally as hashed word and character-trigram counts and
+# compared by cosine similarity (no model download, no extra dependency).
+
+ANSWER_CACHE_TTL_SEC = float(os.getenv("ANSWER_CACHE_TTL_SEC", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# 0 disables similarity matching (exact normalised matches only); 0.9 is a reasonable starting point
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+EMBEDDING_DIMENSIONS = 2048
+
+# Greetings and politeness that don't change the question
+_FILLER_WORDS = {"hi", "hello", "hey", "please", "pls", "plz", "thanks", "thank", "thx", "kindly", "um", "uh"}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(text):
+    """'Hi! What are your OPENING hours??' -> 'what are your opening hours'."""
+    words = _WORD_RE.findall((text or "").lower())
+    return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+
+def embed(normalized):
+    """Sparse, L2-normalised vector {bucket: weight} of the words and character trigrams of a normalised question."""
+    features = Counter()
+    for word in normalized.split():
+        features["w:" + word] += 2
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += 1
+    vector = Counter()
+    for feature, count in features.items():
+        vector[zlib.crc32(feature.encode()) % EMBEDDING_DIMENSIONS] += count
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {bucket: weight / norm for bucket, weight in vector.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+class AnswerCache:
+    """
+    LRU cache of bot answers keyed by (scope, normalised question), with a TTL per entry.
+
+    - `lookup(question, scope)` returns the cached value or None; `store(question, scope, value, latency_sec)`
+      adds one. `latency_sec` is what producing the answer cost, counted as saved on every hit.
+    - `scope` is any hashable value; entries only ever match within the same scope.
+    - With `similarity` > 0, a lookup without an exact match returns the most similar question's answer in
+      the scope if its cosine similarity is at least `similarity`.
+    """
+
+    def __init__(self, ttl_sec=ANSWER_CACHE_TTL_SEC, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 similarity=ANSWER_CACHE_SIMILARITY, name="answer cache"):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (scope, normalized) -> entry dict
+        self._by_scope = {}            # scope -> set of normalized questions
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.saved_sec = 0.0
+        self.evictions = 0
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        scope, normalized = key
+        questions = self._by_scope.get(scope)
+        if questions is not None:
+            questions.discard(normalized)
+            if not questions:
+                del self._by_scope[scope]
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and now - entry["stored_at"] > self.ttl_sec:
+            self._drop(key)
+            return None
+        return entry
+
+    def _most_similar(self, normalized, scope, now):
+        vector = embed(normalized)
+        best, best_score = None, self.similarity
+        for other in list(self._by_scope.get(scope, ())):
+            entry = self._live((scope, other), now)
+            if entry is None:
+                continue
+            score = cosine(vector, entry["vector"])
+            if score >= best_score:
+                best, best_score = (scope, other), score
+        return best
+
+    def lookup(self, question, scope):
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            key = (scope, normalized)
+            entry = self._live(key, now)
+            if entry is None and self.similarity > 0:
+                key = self._most_similar(normalized, scope, now)
+                entry = self._entries.get(key) if key else None
+                if entry is not None:
+                    self.similar_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+            self.saved_sec += entry["latency_sec"]
+            return entry["value"]
+
+    def store(self, question, scope, value, latency_sec=0.0):
+        normalized = normalize_question(question)
+        if not normalized or not value:
+            return
+        entry = {"value": value, "latency_sec": latency_sec, "stored_at": time.monotonic(), "hits": 0,
+                 "vector": embed(normalized) if self.similarity > 0 else None}
+        with self._lock:
+            key = (scope, normalized)
+            self._drop(key)
+            self._entries[key] = entry
+            self._by_scope.setdefault(scope, set()).add(normalized)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_scope.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "saved_sec": round(self.saved_sec, 2),
+                "evictions": self.evictions,
+                "similarity": self.similarity,
+                "ttl_sec": self.ttl_sec,
+            }
@@ -0,0 +1,211 @@
+import json
+import time
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, StreamingResponse
+from supabase import acreate_client, AsyncClientOptions
+from auth import staff_url, staff_key
+from server import app as flask_app
+from list_query import ListQuery
+import metrics
+from request_profiler import request_profiler
+from utils import get_jam_ai_response_async, stream_jam_ai_response_async, post_chat_table_async
+
+# --- ASGI Serving Mode ---
+# Same /api/* routes and request/response contracts as server.py, for running many chats per process:
+#   uvicorn asgi_server:app --port 5001
+# The long-running chat routes and the hot Supabase reads are native async here, so a request
+# waiting on JamAI or Supabase does not hold a thread. Every other route (and the static pages)
+# falls through to the Flask app in server.py, so both modes always share the same behaviour.
+
+supabase_staff_async = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global supabase_staff_async
+    if staff_url and staff_key:
+        try:
+            supabase_staff_async = await acreate_client(
+                staff_url, staff_key, options=AsyncClientOptions(httpx_client=metrics.async_httpx_client()))
+            print("DEBUG: Async Supabase client (Staff) initialized successfully.")
+        except Exception as e:
+            print(f"Failed to initialize async Supabase client (Staff): {e}")
+    yield
+
+app = FastAPI(title="ClinicConnect", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    # Times the native routes below for /metrics; requests passed to Flask are timed by server.py's hooks.
+    # Slow ones are also profiled (spans only: cProfile on the event loop would also time other requests)
+    started = time.perf_counter()
+    trace = None
+    if request.url.path in native_paths():
+        trace = request_profiler.start(request.url.path, request.method, request.url.path, profile=False)
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        metrics.count_error('exception', e)
+        request_profiler.finish(trace, 500)
+        raise
+    if trace is not None:
+        response.body_iterator = _finish_after_body(response.body_iterator, trace, response.status_code)
+    route = request.scope.get('route')
+    if isinstance(route, APIRoute) and metrics.METRICS_ENABLED:
+        metrics.http_request_seconds.observe(time.perf_counter() - started, route=route.path,
+                                             method=request.method, status=str(response.status_code))
+        if response.status_code >= 500:
+            metrics.count_error('http', f'http_{response.status_code}')
+    return response
+
+_native_paths = None
+
+def native_paths():
+    global _native_paths
+    if _native_paths is None:
+        _native_paths = {route.path for route in app.routes if isinstance(route, APIRoute)}
+    return _native_paths
+
+async def _finish_after_body(body, trace, status):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        request_profiler.finish(trace, status)
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return {}
+
+def db_not_configured():
+    return JSONResponse({'success': False, 'message': 'Database not configured'}, status_code=500)
+
+@app.post('/api/chat')
+async def chat_endpoint(request: Request):
+    data = await read_json(request)
+    user_message = data.get('message')
+    table_id = data.get('table_id')
+    context = data.get('context', 'General Knowledge')
+    user_email = data.get('userEmail')
+
+    if not user_message:
+        return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+    try:
+        session_id = data.get('sessionId', 'flask_session')
+
+        # Step 1: Get the AI response (Action Table)
+        action_ai_response = await get_jam_ai_response_async(user_message, context, session_id=session_id, user_email=user_email)
+
+        # Step 2: Post the response/action to the specific chat table to maintain context
+        if table_id:
+            ai_response = await post_chat_table_async(action_ai_response, table_id)
+        else:
+            ai_response = action_ai_response
+
+        return {'response': ai_response}
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+@app.post('/api/chat/stream')
+async def chat_stream_endpoint(request: Request):
+    data = await read_json(request)
+    user_message = data.get('message')
+    table_id = data.get('table_id')
+    context = data.get('context', 'General Knowledge')
+    user_email = data.get('userEmail')
+
+    if not user_message:
+        return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+    session_id = data.get('sessionId', 'flask_session')
+
+    async def generate():
+        async for event in stream_jam_ai_response_async(user_message, context, session_id=session_id, user_email=user_email, table_id=table_id):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.get('/api/bookings')
+async def get_bookings_endpoint(date: str = None):
+    if not date:
+        return JSONResponse({'success': False, 'message': 'Date is required'}, status_code=400)
+    if not supabase_staff_async:
+        return db_not_configured()
+    try:
+        response = await supabase_staff_async.table('Booking').select('appoinment_time').eq('Date', date).execute()
+        booked_times = [item['appoinment_time'] for item in response.data]
+        return {'success': True, 'bookedTimes': booked_times}
+    except Exception as e:
+        print(f"Fetch Bookings Error: {e}")
+        return JSONResponse({'success': False, 'message': str(e)}, status_code=500)
+
+def list_query_or_error(request):
+    try:
+        return ListQuery.from_args(request.query_params), None
+    except ValueError as e:
+        return None, JSONResponse({'success': False, 'message': str(e)}, status_code=400)
+
+@app.get('/api/doctors')
+async def get_doctors_endpoint(request: Request):
+    if not supabase_staff_async:
+        return db_not_configured()
+    list_query, error = list_query_or_error(request)
+    if error:
+        return error
+    try:
+        query = supabase_staff_async.table('DutyList').select(list_query.select())
+        response = await list_query.apply(query, date_column='date', include_undated=True).execute()
+        doctors, next_cursor = list_query.page(response.data)
+        return {'success': True, 'doctors': doctors, 'next_cursor': next_cursor}
+    except Exception as e:
+        return JSONResponse({'success': False, 'message': str(e)}, status_code=500)
+
+@app.get('/api/appointments')
+async def get_appointments_endpoint(request: Request, date: str = None):
+    if not supabase_staff_async:
+        return db_not_configured()
+    if not date and not (request.query_params.get('from') or request.query_params.get('to')):
+        return JSONResponse({'success': False, 'message': 'Date is required'}, status_code=400)
+    list_query, error = list_query_or_error(request)
+    if error:
+        return error
+    try:
+        query = supabase_staff_async.table('Booking').select(list_query.select())
+        if date:
+            query = query.eq('Date', date)
+        response = await list_query.apply(query, date_column='Date').execute()
+        appointments, next_cursor = list_query.page(response.data)
+        return {'success': True, 'appointments': appointments, 'next_cursor': next_cursor}
+    except Exception as e:
+        return JSONResponse({'success': False, 'message': str(e)}, status_code=500)
+
+@app.get('/api/patient_history')
+async def patient_history_endpoint(request: Request, email: str = None):
+    if not email:
+        return JSONResponse({'success': False, 'message': 'Email is required'}, status_code=400)
+    if not supabase_staff_async:
+        return db_not_configured()
+    list_query, error = list_query_or_error(request)
+    if error:
+        return error
+    try:
+        query = supabase_staff_async.table('Booking').select(list_query.select()).eq('patient_name', email)
+        response = await list_query.apply(query, date_column='Date').execute()
+        appointments, next_cursor = list_query.page(response.data)
+        return {'success': True, 'appointments': appointments, 'next_cursor': next_cursor}
+    except Exception as e:
+        print(f"Patient History Error: {e}")
+        return JSONResponse({'success': False, 'message': str(e)}, status_code=500)
+
+# Everything else (auth, writes, config, uploads, history, static pages) is served by the Flask app.
+# Writes go through Flask so the in-process caches are invalidated exactly as in server.py.
+app.mount('/', WSGIMiddleware(flask_app))
@@ -1,5 +1,6 @@
 import os
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from metrics import httpx_client
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,7 +24,8 @@ supabase_staff: Client = None
 
 if url and key and "your-project" not in url:
     try:
-        supabase = create_client(url, key)
+        # The httpx client times each request for /metrics (see metrics.py)
+        supabase = create_client(url, key, options=ClientOptions(httpx_client=httpx_client()))
         print("DEBUG: Supabase client (Patient) initialized successfully.")
     except Exception as e:
         print(f"Failed to initialize Supabase client (Patient): {e}")
@@ -32,7 +34,7 @@ else:
 
 if staff_url and staff_key:
     try:
-        supabase_staff = create_client(staff_url, staff_key)
+        supabase_staff = create_client(staff_url, staff_key, options=ClientOptions(httpx_client=httpx_client()))
         print("DEBUG: Supabase client (Staff) initialized successfully.")
     except Exception as e:
         print(f"Failed to initialize Supabase client (Staff): {e}")
@@ -0,0 +1,184 @@
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+# --- Availability Engine ---
+# Free appointment slots are the bookable times that fall inside a doctor's DutyList shift
+# (time_start - time_end) and are not yet taken in Booking (appoinment_time). Shifts are kept in
+# an interval index (sorted, merged intervals per doctor and day) so each slot check is a bisect,
+# and the sorted list of dated shifts lets "earliest available" jump straight to days with shifts.
+
+# Same slot labels as the booking page; Booking.appoinment_time stores these strings
+BOOKING_SLOT_TIMES = [t.strip() for t in os.getenv(
+    "BOOKING_SLOT_TIMES",
+    "08:00 AM,09:00 AM,10:00 AM,11:00 AM,12:30 PM,01:30 PM,02:30 PM,03:30 PM,04:30 PM"
+).split(",") if t.strip()]
+BOOKING_SLOT_MINUTES = int(os.getenv("BOOKING_SLOT_MINUTES", "30"))
+AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "62"))
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?(?::\d{2}(?:\.\d+)?)?\s*([AaPp][Mm])?\s*$")
+
+
+def parse_minutes(value):
+    """'08:00 AM', '8:00pm', '14:30', '14:30:00' -> minutes since midnight. None if unparseable."""
+    match = _TIME_RE.match(str(value or ""))
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 24 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_date(value):
+    """'YYYY-MM-DD' (or a date) -> date. Raises ValueError otherwise."""
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def _merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class _Intervals:
+    """Sorted, non-overlapping (start, end) minute intervals with O(log n) containment checks."""
+
+    def __init__(self, intervals):
+        self.intervals = _merge(intervals)
+        self.starts = [start for start, _ in self.intervals]
+
+    def covers(self, start, end):
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.intervals[i][1] >= end
+
+
+class ShiftIndex:
+    """
+    Interval index over DutyList rows. A row's `date` may be a YYYY-MM-DD date, a weekday name
+    (weekly shift) or empty (every day, shown as "Recurring" on the booking page).
+    """
+
+    def __init__(self, rows):
+        dated, weekly, daily = {}, {}, {}
+        for row in rows:
+            doctor = row.get("doctor_name")
+            start, end = parse_minutes(row.get("time_start")), parse_minutes(row.get("time_end"))
+            if not doctor or start is None or end is None or end <= start:
+                continue
+            day = str(row.get("date") or "").strip()
+            if not day:
+                daily.setdefault(doctor, []).append((start, end))
+            elif day.lower() in WEEKDAYS:
+                weekly.setdefault(WEEKDAYS.index(day.lower()), {}).setdefault(doctor, []).append((start, end))
+            else:
+                try:
+                    dated.setdefault(parse_date(day), {}).setdefault(doctor, []).append((start, end))
+                except ValueError:
+                    continue
+
+        self._dated = dated
+        self._dated_days = sorted(dated)
+        self._weekly = weekly
+        self._daily = daily
+
+    def shifts_on(self, day, doctor=None):
+        """dict of doctor -> _Intervals for the shifts on `day`."""
+        per_doctor = {}
+        for source in (self._daily, self._weekly.get(day.weekday(), {}), self._dated.get(day, {})):
+            for name, intervals in source.items():
+                if doctor is None or name == doctor:
+                    per_doctor.setdefault(name, []).extend(intervals)
+        return {name: _Intervals(intervals) for name, intervals in per_doctor.items()}
+
+    def _has_undated(self, doctor):
+        if doctor is None:
+            return bool(self._daily), set(self._weekly)
+        weekdays = {weekday for weekday, doctors in self._weekly.items() if doctor in doctors}
+        return doctor in self._daily, weekdays
+
+    def next_shift_day(self, day, last_day, doctor=None):
+        """First day in [day, last_day] on which `doctor` (or anyone) has a shift, or None."""
+        every_day, weekdays = self._has_undated(doctor)
+        if every_day:
+            return day if day <= last_day else None
+
+        candidates = []
+        if weekdays:
+            offset = min((weekday - day.weekday()) % 7 for weekday in weekdays)
+            candidates.append(day + timedelta(days=offset))
+        i = bisect_left(self._dated_days, day)
+        while i < len(self._dated_days) and self._dated_days[i] <= last_day:
+            if doctor is None or doctor in self._dated[self._dated_days[i]]:
+                candidates.append(self._dated_days[i])
+                break
+            i += 1
+
+        candidates = [c for c in candidates if c <= last_day]
+        return min(candidates) if candidates else None
+
+
+class AvailabilityEngine:
+    """Free slots from a ShiftIndex and the booked (doctor_name, Date, appoinment_time) rows."""
+
+    def __init__(self, duty_rows, booking_rows, slot_times=None, slot_minutes=BOOKING_SLOT_MINUTES, now=None):
+        self.shifts = ShiftIndex(duty_rows)
+        self.slots = [(label, parse_minutes(label)) for label in (slot_times or BOOKING_SLOT_TIMES)]
+        self.slots = [(label, minute) for label, minute in self.slots if minute is not None]
+        self.slot_minutes = slot_minutes
+        self.now = now or datetime.now()
+        self.booked = set()
+        for row in booking_rows:
+            minute = parse_minutes(row.get("appoinment_time"))
+            try:
+                self.booked.add((row.get("doctor_name"), parse_date(row.get("Date")), minute))
+            except ValueError:
+                continue
+
+    def free_slots(self, day, doctor=None):
+        """dict of doctor -> list of free slot labels on `day` (doctors with no free slot left out)."""
+        # Slots earlier today have already passed
+        earliest = self.now.hour * 60 + self.now.minute if day == self.now.date() else -1
+        result = {}
+        for name, shifts in sorted(self.shifts.shifts_on(day, doctor).items()):
+            free = [
+                label for label, minute in self.slots
+                if minute > earliest
+                and shifts.covers(minute, minute + self.slot_minutes)
+                and (name, day, minute) not in self.booked
+            ]
+            if free:
+                result[name] = free
+        return result
+
+    def range(self, start, end, doctor=None):
+        """List of {date, doctor_name, slots} for every day in [start, end] with free slots."""
+        availability = []
+        day = start
+        while day <= end:
+            for name, slots in self.free_slots(day, doctor).items():
+                availability.append({"date": day.isoformat(), "doctor_name": name, "slots": slots})
+            day += timedelta(days=1)
+        return availability
+
+    def earliest(self, start, end, doctor=None):
+        """First free {date, time, doctor_name} in [start, end], skipping days without shifts. None if none."""
+        day = self.shifts.next_shift_day(start, end, doctor)
+        while day is not None:
+            free = self.free_slots(day, doctor)
+            if free:
+                name, slots = min(free.items(), key=lambda item: (parse_minutes(item[1][0]), item[0]))
+                return {"date": day.isoformat(), "time": slots[0], "doctor_name": name}
+            day = self.shifts.next_shift_day(day + timedelta(days=1), end, doctor)
+        return None
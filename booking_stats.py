@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# --- Dashboard Aggregates ---
+# The staff dashboard shows today's appointments and the number of distinct patients this week.
+# Instead of querying and de-duplicating the week's bookings on every load, we keep this week's
+# bookings in memory, with per-day counts and a patient multiset, and update them as bookings are
+# written. A periodic full reconcile corrects drift (e.g. writes made by another process).
+
+DASHBOARD_RECONCILE_SEC = float(os.getenv("DASHBOARD_RECONCILE_SEC", "300"))
+
+
+def week_bounds(day):
+    """(Monday, Sunday) of the week containing `day`, as YYYY-MM-DD strings."""
+    start = day - timedelta(days=day.weekday())
+    return start.strftime('%Y-%m-%d'), (start + timedelta(days=6)).strftime('%Y-%m-%d')
+
+
+class BookingStats:
+    """
+    In-memory aggregates over the current week's Booking rows.
+
+    - `loader(start, end)` returns every Booking row with Date in [start, end].
+    - Call `record_upserted(rows)` after inserts/updates and `record_deleted(rows)` after deletes,
+      with the rows Supabase returned (they must carry `id`).
+    - `snapshot()` is O(1) in the number of bookings apart from copying today's list.
+    """
+
+    def __init__(self, loader, reconcile_sec=DASHBOARD_RECONCILE_SEC, now=datetime.now):
+        self.loader = loader
+        self.reconcile_sec = reconcile_sec
+        self.now = now
+
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._week = None           # (start, end) the aggregates cover
+        self._rows = {}             # id -> row
+        self._by_date = {}          # Date -> {id: row}
+        self._patients = Counter()  # patient_name -> bookings this week
+        self._dirty = True          # set when a write could not be applied
+        self._reconciled_at = 0.0
+        self._pending = None        # writes that arrive while a reconcile is loading
+        self.reconciles = 0
+        self.drift = 0              # rows the last reconcile had to correct
+
+    # --- Applying writes ---
+
+    def _remove(self, booking_id):
+        row = self._rows.pop(booking_id, None)
+        if row is None:
+            return
+        day_rows = self._by_date.get(row.get('Date'), {})
+        day_rows.pop(booking_id, None)
+        if not day_rows:
+            self._by_date.pop(row.get('Date'), None)
+        patient = row.get('patient_name')
+        if patient:
+            self._patients[patient] -= 1
+            if self._patients[patient] <= 0:
+                del self._patients[patient]
+
+    def _add(self, row, booking_id=None):
+        booking_id = row.get('id') if booking_id is None else booking_id
+        self._remove(booking_id)
+        date = str(row.get('Date') or '')[:10]
+        if not (self._week[0] <= date <= self._week[1]):
+            return
+        row = dict(row, Date=date)
+        self._rows[booking_id] = row
+        self._by_date.setdefault(date, {})[booking_id] = row
+        if row.get('patient_name'):
+            self._patients[row['patient_name']] += 1
+
+    def _apply(self, op, rows):
+        for row in rows or []:
+            if row.get('id') is None:
+                self._dirty = True
+                continue
+            if op == "upsert":
+                self._add(row)
+            else:
+                self._remove(row['id'])
+
+    def _record(self, op, rows):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((op, rows))
+            if self._week is not None:
+                self._apply(op, rows)
+
+    def record_upserted(self, rows):
+        """Applies inserted or updated Booking rows."""
+        self._record("upsert", rows)
+
+    def record_deleted(self, rows):
+        """Applies deleted Booking rows."""
+        self._record("delete", rows)
+
+    # --- Reconcile ---
+
+    def reconcile(self):
+        """Reloads the current week from the database and swaps the aggregates in."""
+        with self._reconcile_lock:
+            week = week_bounds(self.now())
+            with self._lock:
+                self._pending = []
+            try:
+                rows = self.loader(*week) or []
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                previous = (self._week, self._rows)
+                self._week, self._rows, self._by_date, self._patients = week, {}, {}, Counter()
+                for i, row in enumerate(rows):
+                    # Rows without an id can't be matched to later writes, but still count
+                    self._add(row, booking_id=row.get('id') if row.get('id') is not None else ('row', i))
+                self._dirty = False
+                # Writes that landed while we were loading may or may not be in `rows`; replay them
+                for op, pending_rows in self._pending:
+                    self._apply(op, pending_rows)
+                self._pending = None
+                if previous[0] == week:
+                    self.drift = len(set(previous[1]) ^ set(self._rows)) + sum(
+                        1 for booking_id, row in self._rows.items()
+                        if booking_id in previous[1] and previous[1][booking_id] != row
+                    )
+                self._reconciled_at = time.monotonic()
+                self.reconciles += 1
+
+    def _reconcile_in_background(self):
+        try:
+            self.reconcile()
+        except Exception as e:
+            print(f"DEBUG: Dashboard stats reconcile failed, keeping current counters: {e}")
+
+    # --- Reads ---
+
+    def snapshot(self):
+        """Today's appointments, today's count and distinct patients this week."""
+        today = self.now()
+        week = week_bounds(today)
+        with self._lock:
+            must_reload = self._week != week or self._dirty
+            due = time.monotonic() - self._reconciled_at > self.reconcile_sec
+
+        if must_reload:
+            # First load, a new week, or a write we could not apply: reload before answering
+            self.reconcile()
+        elif due and not self._reconcile_lock.locked():
+            threading.Thread(target=self._reconcile_in_background, daemon=True).start()
+
+        date = today.strftime('%Y-%m-%d')
+        with self._lock:
+            appointments = list(self._by_date.get(date, {}).values())
+            return {
+                'todayAppointments': len(appointments),
+                'patientsThisWeek': len(self._patients),
+                'appointments': appointments,
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                'week': self._week,
+                'bookings': len(self._rows),
+                'reconciles': self.reconciles,
+                'last_drift': self.drift,
+                'age_sec': round(time.monotonic() - self._reconciled_at, 1) if self.reconciles else None,
+                'reconcile_sec': self.reconcile_sec,
+            }
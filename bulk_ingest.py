@@ -0,0 +1,300 @@
+import argparse
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+# --- Bulk Knowledge Ingestion ---
+# Loads many documents into a bot's knowledge table (BOT_CONFIG[bot]["knowledge_table_id"]) at once:
+# files, directories (walked recursively) and .zip/.tar(.gz) archives are expanded into a flat list
+# of supported documents and embedded in parallel. Every embed call goes through a per-bot limiter
+# (a token bucket for calls per minute plus a cap on calls in flight) so a large batch can't exceed
+# the JamAI rate limits of the project or starve the chat bots that share it.
+#   API: POST /api/upload/bulk queues the files as upload jobs (see upload_jobs.py)
+#   CLI: python bulk_ingest.py --bot Public handbooks/ policies.zip
+
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+INGEST_RATE_PER_MIN = float(os.getenv("INGEST_RATE_PER_MIN", "120"))
+INGEST_MAX_FILES = int(os.getenv("INGEST_MAX_FILES", "500"))
+# Uploaded archives are expanded in the request, so their size is capped before anything is written:
+# total bytes of the documents in a batch, and entries (of any type) read from its archives
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(500 * 1024 * 1024)))
+INGEST_MAX_ARCHIVE_MEMBERS = int(os.getenv("INGEST_MAX_ARCHIVE_MEMBERS", "5000"))
+
+# Document types the JamAI knowledge tables accept
+SUPPORTED_EXTENSIONS = {".pdf", ".txt", ".md", ".docx", ".doc", ".pptx", ".ppt", ".xlsx", ".xls",
+                        ".csv", ".tsv", ".json", ".jsonl", ".html", ".xml"}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2")
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def is_supported(name):
+    return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+class IngestLimitError(ValueError):
+    pass
+
+
+class IngestBudget:
+    """
+    What a batch may still add: documents, their total bytes and archive entries read. `take()` is
+    called for each document before it is written, so an archive bomb is stopped at the limit.
+    None disables a limit (the CLI, which only reads local files).
+    """
+
+    def __init__(self, max_files=INGEST_MAX_FILES, max_bytes=INGEST_MAX_BYTES,
+                 max_members=INGEST_MAX_ARCHIVE_MEMBERS):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_members = max_members
+        self.files = 0
+        self.bytes = 0
+        self.members = 0
+
+    def member(self, count=1):
+        self.members += count
+        if self.max_members is not None and self.members > self.max_members:
+            raise IngestLimitError(f"Archives have too many entries, at most {self.max_members} per batch")
+
+    def take(self, size):
+        self.files += 1
+        self.bytes += size
+        if self.max_files is not None and self.files > self.max_files:
+            raise IngestLimitError(f"Too many files, at most {self.max_files} per batch")
+        if self.max_bytes is not None and self.bytes > self.max_bytes:
+            raise IngestLimitError(f"Files are too large, at most {self.max_bytes // (1024 * 1024)} MB per batch")
+
+
+def _safe_member_path(dest, name):
+    """Where an archive member may be extracted, or None if it would land outside `dest`."""
+    target = os.path.realpath(os.path.join(dest, name))
+    return target if target.startswith(os.path.realpath(dest) + os.sep) else None
+
+
+def extract_archive(path, dest, budget=None):
+    """
+    Extracts the supported documents of a zip/tar archive into `dest`. Returns [(path, name in archive)].
+    Raises IngestLimitError once the archive would exceed `budget` (an IngestBudget).
+    """
+    budget = budget or IngestBudget()
+    extracted = []
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            # The central directory lists every entry and its size, so the whole archive is checked up front
+            budget.member(len(archive.infolist()))
+            members = []
+            for member in archive.infolist():
+                target = _safe_member_path(dest, member.filename)
+                if member.is_dir() or not target or not is_supported(member.filename):
+                    continue
+                budget.take(member.file_size)
+                members.append((member, target))
+            for member, target in members:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(member) as src, open(target, "wb") as out:
+                    shutil.copyfileobj(src, out)
+                extracted.append((target, member.filename))
+    else:
+        with tarfile.open(path) as archive:
+            # Headers are read one at a time (listing a compressed tar means decompressing it)
+            for member in archive:
+                budget.member()
+                target = _safe_member_path(dest, member.name)
+                if not member.isfile() or not target or not is_supported(member.name):
+                    continue
+                budget.take(member.size)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as src, open(target, "wb") as out:
+                    shutil.copyfileobj(src, out)
+                extracted.append((target, member.name))
+    return extracted
+
+
+def expand_inputs(paths, workdir, budget=None):
+    """
+    Files, directories and archives -> ([(path, display name)], [skipped names]).
+    Archives are extracted under `workdir`; hidden files and unsupported types are skipped.
+    Raises IngestLimitError when the documents exceed `budget` (default: the INGEST_MAX_* limits).
+    """
+    budget = budget or IngestBudget()
+    files, skipped = [], []
+
+    def add(path, name):
+        base = os.path.basename(name)
+        if base.startswith("."):
+            return
+        if is_archive(base):
+            dest = tempfile.mkdtemp(dir=workdir, prefix="archive-")
+            try:
+                files.extend((p, f"{name}/{member}") for p, member in extract_archive(path, dest, budget))
+            except (zipfile.BadZipFile, tarfile.TarError) as e:
+                skipped.append(f"{name} ({e})")
+        elif is_supported(base):
+            budget.take(os.path.getsize(path))
+            files.append((path, name))
+        else:
+            skipped.append(name)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(names):
+                    full = os.path.join(root, name)
+                    add(full, os.path.relpath(full, os.path.dirname(os.path.abspath(path))))
+        elif os.path.isfile(path):
+            add(path, os.path.basename(path))
+        else:
+            skipped.append(f"{path} (not found)")
+    return files, skipped
+
+
+class BotRateLimiter:
+    """
+    Per-bot limits on embed calls: at most `rate_per_min` starts per minute (token bucket, bursts up
+    to `concurrency`) and at most `concurrency` calls in flight. INGEST_RATE_PER_MIN_<BOT> and
+    INGEST_CONCURRENCY_<BOT> override the defaults for one bot.
+    """
+
+    def __init__(self, rate_per_min=INGEST_RATE_PER_MIN, concurrency=INGEST_CONCURRENCY):
+        self.rate_per_min = rate_per_min
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._buckets = {}  # bot -> [tokens, last refill, rate per sec, burst, semaphore]
+        self.waited_sec = 0.0
+
+    def _bucket(self, bot_type):
+        with self._lock:
+            bucket = self._buckets.get(bot_type)
+            if bucket is None:
+                rate = float(os.getenv(f"INGEST_RATE_PER_MIN_{bot_type.upper()}", self.rate_per_min)) / 60
+                limit = int(os.getenv(f"INGEST_CONCURRENCY_{bot_type.upper()}", self.concurrency))
+                bucket = [float(limit), time.monotonic(), rate, float(limit), threading.BoundedSemaphore(limit)]
+                self._buckets[bot_type] = bucket
+            return bucket
+
+    def _take_token(self, bucket):
+        """Seconds to wait before a token is available (0 if one was taken)."""
+        with self._lock:
+            now = time.monotonic()
+            bucket[0] = min(bucket[3], bucket[0] + (now - bucket[1]) * bucket[2])
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / bucket[2] if bucket[2] > 0 else 1.0
+
+    @contextmanager
+    def slot(self, bot_type):
+        bucket = self._bucket(bot_type)
+        started = time.monotonic()
+        with bucket[4]:
+            while True:
+                wait = self._take_token(bucket)
+                if not wait:
+                    break
+                time.sleep(wait)
+            with self._lock:
+                self.waited_sec += time.monotonic() - started
+            yield
+
+
+def ingest_files(files, bot_type, embed, limiter=None, concurrency=INGEST_CONCURRENCY, on_progress=None):
+    """
+    Embeds `files` ([(path, name)]) with `embed(path, bot_type, name)`, `concurrency` at a time, each call
+    through `limiter`. `on_progress(result, done, total)` is called as each file finishes.
+    Returns a summary dict with per-file results.
+    """
+    limiter = limiter or BotRateLimiter(concurrency=concurrency)
+    total = len(files)
+    results = []
+    started = time.perf_counter()
+
+    def one(path, name):
+        with limiter.slot(bot_type):
+            file_started = time.perf_counter()
+            try:
+                outcome = embed(path, bot_type, name)
+                error = None
+            except Exception as e:
+                outcome, error = None, str(e) or e.__class__.__name__
+        status = outcome.get("status") if isinstance(outcome, dict) else None
+        return {"name": name, "bytes": os.path.getsize(path), "ok": error is None, "error": error, "status": status,
+                "seconds": round(time.perf_counter() - file_started, 3)}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="ingest") as pool:
+        futures = [pool.submit(one, path, name) for path, name in files]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_progress:
+                on_progress(result, len(results), total)
+
+    elapsed = time.perf_counter() - started
+    ok = [r for r in results if r["ok"]]
+    return {
+        "bot_type": bot_type,
+        "total": total,
+        "succeeded": len(ok),
+        "failed": total - len(ok),
+        "unchanged": sum(1 for r in ok if r["status"] == "unchanged"),
+        "bytes": sum(r["bytes"] for r in ok),
+        "seconds": round(elapsed, 2),
+        "files_per_sec": round(len(ok) / elapsed, 2) if elapsed else None,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed many files, directories or archives into a bot's knowledge table.")
+    parser.add_argument("paths", nargs="+", help="files, directories or .zip/.tar archives")
+    parser.add_argument("--bot", default="Public", help="bot whose knowledge_table_id receives the files (default: Public)")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY, help="embed calls in flight")
+    parser.add_argument("--rate", type=float, default=INGEST_RATE_PER_MIN, help="embed calls started per minute")
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be embedded")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bulk-ingest-")
+    try:
+        files, skipped = expand_inputs(args.paths, workdir, IngestBudget(max_files=None, max_bytes=None, max_members=None))
+        for name in skipped:
+            print(f"skip  {name}")
+        print(f"{len(files)} file(s) to embed into the {args.bot} knowledge table")
+        if args.dry_run or not files:
+            for _, name in files:
+                print(f"      {name}")
+            return 0
+
+        from utils import BOT_CONFIG, embed_file_in_jamai
+        if not BOT_CONFIG.get(args.bot, {}).get("knowledge_table_id"):
+            print(f"No knowledge table configured for bot_type: {args.bot}")
+            return 2
+
+        def progress(result, done, total):
+            status = "ok  " if result["ok"] else "FAIL"
+            detail = f"{result['status']}, {result['seconds']:.1f}s" if result["ok"] else result["error"]
+            print(f"[{done}/{total}] {status} {result['name']} ({detail})", flush=True)
+
+        limiter = BotRateLimiter(rate_per_min=args.rate, concurrency=args.concurrency)
+        summary = ingest_files(files, args.bot, lambda path, bot, name: embed_file_in_jamai(path, bot_type=bot, filename=name),
+                               limiter=limiter, concurrency=args.concurrency, on_progress=progress)
+        print(f"{summary['succeeded']}/{summary['total']} embedded in {summary['seconds']}s "
+              f"({summary['files_per_sec']} files/s, {summary['bytes'] / 1024:.0f} KB), "
+              f"{summary['unchanged']} unchanged, {summary['failed']} failed")
+        return 0 if not summary["failed"] else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+# --- Pre-warmed Chat Table Pool ---
+# Every patient session gets its own Chat Table, duplicated from a base table. Duplication is the
+# slowest part of opening a chat, so we keep a few ready-made tables per base table, filled in the
+# background, and hand one out immediately when a session starts.
+
+CHAT_TABLE_POOL_SIZE = int(os.getenv("CHAT_TABLE_POOL_SIZE", "5"))
+CHAT_TABLE_POOL_REFILL_AT = int(os.getenv("CHAT_TABLE_POOL_REFILL_AT", "2"))
+# Tables older than this are not handed out (they were copied from an older version of the base table)
+CHAT_TABLE_POOL_MAX_AGE_SEC = float(os.getenv("CHAT_TABLE_POOL_MAX_AGE_SEC", "3600"))
+# Comma-separated base table IDs to pool, filled at startup. Other base IDs are never pooled (they come
+# from the client, so pooling them would let any caller start background duplications of any table).
+# The default is the base table static/patient_chat.html opens sessions from.
+CHAT_TABLE_POOL_PREWARM = [t.strip() for t in os.getenv("CHAT_TABLE_POOL_PREWARM", "niceguy").split(",") if t.strip()]
+
+
+class ChatTablePool:
+    """
+    Per-base-table pool of duplicated Chat Tables.
+
+    - `acquire(base_table_id)` pops a ready table in O(1), or returns None when the pool is empty
+      or `base_table_id` isn't one of `base_tables` (the caller then duplicates on demand).
+    - Whenever a pool drops to `refill_at` tables or fewer, one background thread tops it back up
+      to `size`. `size=0` disables pooling.
+    - `start()` fills the pools of `base_tables` and deletes the tables still pooled at exit (the
+      pool is only in memory, so they could not be handed out after a restart). Nothing is
+      duplicated until it is called, so importing utils (CLI, benchmarks) creates no tables.
+    """
+
+    def __init__(self, create_table, delete_table=None, base_tables=CHAT_TABLE_POOL_PREWARM,
+                 size=CHAT_TABLE_POOL_SIZE, refill_at=CHAT_TABLE_POOL_REFILL_AT,
+                 max_age_sec=CHAT_TABLE_POOL_MAX_AGE_SEC):
+        self.create_table = create_table  # base_table_id -> new table_id or None
+        self.delete_table = delete_table  # table_id -> bool, used to drop expired tables
+        self.base_tables = frozenset(base_tables)
+        self.size = max(0, size)
+        self.refill_at = min(refill_at, self.size - 1) if self.size else 0
+        self.max_age_sec = max_age_sec
+
+        self._lock = threading.Lock()
+        self._pools = {}       # base_table_id -> deque of (table_id, created_at)
+        self._refilling = set()
+        self._started = False
+        self._closed = False
+        self.handed_out = 0
+        self.fallbacks = 0
+        self.expired = 0
+
+    def start(self):
+        with self._lock:
+            if self._started or not self.size:
+                return
+            self._started = True
+        atexit.register(self.drain)
+        for base_table_id in self.base_tables:
+            self.refill(base_table_id)
+
+    def drain(self):
+        """Stops refilling and deletes every table still waiting in a pool. Returns how many were deleted."""
+        with self._lock:
+            self._closed = True
+            pooled = [table_id for pool in self._pools.values() for table_id, _ in pool]
+            for pool in self._pools.values():
+                pool.clear()
+        if pooled and self.delete_table:
+            print(f"DEBUG: Deleting {len(pooled)} unused pooled chat table(s).")
+            self._delete_all(pooled)
+        return len(pooled)
+
+    def acquire(self, base_table_id):
+        if not self.size or not self._started:
+            return None
+        if base_table_id not in self.base_tables:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+
+        expired = []
+        table_id = None
+        with self._lock:
+            pool = self._pools.setdefault(base_table_id, deque())
+            while pool:
+                candidate, created_at = pool.popleft()
+                if time.monotonic() - created_at <= self.max_age_sec:
+                    table_id = candidate
+                    break
+                expired.append(candidate)
+            self.expired += len(expired)
+            if table_id:
+                self.handed_out += 1
+            else:
+                self.fallbacks += 1
+
+        if expired and self.delete_table:
+            threading.Thread(target=self._delete_all, args=(expired,), daemon=True).start()
+        self.refill(base_table_id)
+        return table_id
+
+    def refill(self, base_table_id):
+        """Starts a background top-up of `base_table_id`'s pool if it is running low."""
+        if base_table_id not in self.base_tables:
+            return
+        with self._lock:
+            pool = self._pools.setdefault(base_table_id, deque())
+            if not self._started or self._closed or not self.size or base_table_id in self._refilling or len(pool) > self.refill_at:
+                return
+            self._refilling.add(base_table_id)
+        threading.Thread(target=self._fill, args=(base_table_id,), daemon=True).start()
+
+    def _fill(self, base_table_id):
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._pools[base_table_id]) >= self.size:
+                        return
+                table_id = self.create_table(base_table_id)
+                if table_id is None:
+                    # Duplication is failing; try again on the next acquire instead of spinning
+                    print(f"DEBUG: Chat table pool refill for '{base_table_id}' stopped after a failed duplication.")
+                    return
+                with self._lock:
+                    closed = self._closed
+                    if not closed:
+                        self._pools[base_table_id].append((table_id, time.monotonic()))
+                if closed:
+                    # Finished duplicating after drain(): nobody will hand it out
+                    if self.delete_table:
+                        self.delete_table(table_id)
+                    return
+        finally:
+            with self._lock:
+                self._refilling.discard(base_table_id)
+
+    def _delete_all(self, table_ids):
+        for table_id in table_ids:
+            self.delete_table(table_id)
+
+    def is_pooled(self, table_id):
+        """True while `table_id` is waiting in a pool (not yet given to a session)."""
+        with self._lock:
+            return any(table_id == pooled for pool in self._pools.values() for pooled, _ in pool)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "base_tables": sorted(self.base_tables),
+                "ready": {base: len(pool) for base, pool in self._pools.items()},
+                "refilling": sorted(self._refilling),
+                "handed_out": self.handed_out,
+                "fallbacks": self.fallbacks,
+                "expired": self.expired,
+                "size": self.size,
+                "refill_at": self.refill_at,
+            }
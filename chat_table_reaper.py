@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# --- Idle Chat Table Reaper ---
+# Per-session Chat Tables are only deleted when the browser calls /api/deleteChatTable, so closed
+# tabs leave them behind, and listing / duplicating tables in the project slows down as they pile up.
+# The reaper periodically finds chat tables with no activity for longer than a TTL and deletes them
+# a small batch at a time, pausing between batches so it never floods JamAI.
+
+CHAT_TABLE_IDLE_TTL_SEC = float(os.getenv("CHAT_TABLE_IDLE_TTL_SEC", str(24 * 3600)))
+CHAT_TABLE_REAP_INTERVAL_SEC = float(os.getenv("CHAT_TABLE_REAP_INTERVAL_SEC", "900"))  # 0 disables the background run
+CHAT_TABLE_REAP_BATCH_SIZE = int(os.getenv("CHAT_TABLE_REAP_BATCH_SIZE", "20"))
+CHAT_TABLE_REAP_BATCH_PAUSE_SEC = float(os.getenv("CHAT_TABLE_REAP_BATCH_PAUSE_SEC", "2"))
+CHAT_TABLE_REAP_MAX_PER_RUN = int(os.getenv("CHAT_TABLE_REAP_MAX_PER_RUN", "500"))
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class ChatTableReaper:
+    """
+    Deletes chat tables idle for longer than `ttl_sec`.
+
+    - `list_tables()` yields (table_id, updated_at) for every per-session chat table in JamAI.
+    - `last_active()` returns {table_id: last activity} recorded locally; a table's idle time is
+      measured from the later of that and its JamAI updated_at.
+    - `delete_table(table_id)` returns True on success.
+    - `is_protected(table_id)` can exempt tables (e.g. ones waiting in the pre-warmed pool).
+    """
+
+    def __init__(self, list_tables, delete_table, last_active, is_protected=None,
+                 ttl_sec=CHAT_TABLE_IDLE_TTL_SEC, interval_sec=CHAT_TABLE_REAP_INTERVAL_SEC,
+                 batch_size=CHAT_TABLE_REAP_BATCH_SIZE, batch_pause_sec=CHAT_TABLE_REAP_BATCH_PAUSE_SEC,
+                 max_per_run=CHAT_TABLE_REAP_MAX_PER_RUN):
+        self.list_tables = list_tables
+        self.delete_table = delete_table
+        self.last_active = last_active
+        self.is_protected = is_protected or (lambda table_id: False)
+        self.ttl_sec = ttl_sec
+        self.interval_sec = interval_sec
+        self.batch_size = max(1, batch_size)
+        self.batch_pause_sec = batch_pause_sec
+        self.max_per_run = max_per_run
+
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.reclaimed = 0
+        self.failed = 0
+        self.last_run = None
+
+    def find_idle(self, now=None):
+        """Chat table IDs idle for longer than the TTL, longest idle first."""
+        now = now or datetime.now(timezone.utc)
+        activity = self.last_active()
+        idle = []
+        for table_id, updated_at in self.list_tables():
+            if self.is_protected(table_id):
+                continue
+            seen = [t for t in (_as_utc(updated_at), _as_utc(activity.get(table_id))) if t is not None]
+            last = max(seen) if seen else None
+            if last is None or (now - last).total_seconds() > self.ttl_sec:
+                idle.append((last or datetime.min.replace(tzinfo=timezone.utc), table_id))
+        idle.sort()
+        return [table_id for _, table_id in idle]
+
+    def reap_once(self):
+        """One pass: deletes up to `max_per_run` idle tables in paused batches. Returns a summary."""
+        if not self._run_lock.acquire(blocking=False):
+            return {"skipped": "A reap is already running"}
+        try:
+            start = time.perf_counter()
+            idle = self.find_idle()[:self.max_per_run]
+            deleted = failed = 0
+            for i in range(0, len(idle), self.batch_size):
+                if i and self._stop.wait(self.batch_pause_sec):
+                    break
+                # A session may have come back since the scan (or since the previous batch)
+                activity = self.last_active()
+                now = datetime.now(timezone.utc)
+                for table_id in idle[i:i + self.batch_size]:
+                    last = _as_utc(activity.get(table_id))
+                    if self.is_protected(table_id) or (last and (now - last).total_seconds() <= self.ttl_sec):
+                        continue
+                    if self.delete_table(table_id):
+                        deleted += 1
+                    else:
+                        failed += 1
+
+            summary = {
+                "idle": len(idle),
+                "deleted": deleted,
+                "failed": failed,
+                "duration_sec": round(time.perf_counter() - start, 2),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self.runs += 1
+            self.reclaimed += deleted
+            self.failed += failed
+            self.last_run = summary
+            print(f"DEBUG: Chat table reaper deleted {deleted} of {len(idle)} idle tables ({failed} failed) in {summary['duration_sec']}s.")
+            return summary
+        finally:
+            self._run_lock.release()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_sec):
+            try:
+                self.reap_once()
+            except Exception as e:
+                print(f"Error in chat table reaper: {e}")
+
+    def start(self):
+        """Starts the periodic background reaper (no-op if the interval is 0 or it is already running)."""
+        if self.interval_sec <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="chat-table-reaper")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "reclaimed": self.reclaimed,
+            "failed": self.failed,
+            "last_run": self.last_run,
+            "ttl_sec": self.ttl_sec,
+            "interval_sec": self.interval_sec,
+        }
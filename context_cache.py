@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# --- Prompt Context Caches ---
+# The duty list and booking list are appended to every chat message, but change far less often
+# than they are read. These caches hold the rendered context strings in memory.
+
+DUTY_LIST_CACHE_TTL_SEC = float(os.getenv("DUTY_LIST_CACHE_TTL_SEC", "300"))
+
+
+class VersionedCache:
+    """
+    Single-value cache with a TTL and a version number.
+
+    - `bump()` marks the cached value as outdated right away (call it after writes),
+      so the next `get()` reloads synchronously while other readers keep the old copy.
+    - Once the TTL runs out, `get()` returns the stale value immediately and reloads in the
+      background (stale-while-revalidate), so a slow or failing database never stalls a read.
+    - If a synchronous reload fails, the last good value is served instead.
+    """
+
+    def __init__(self, loader, ttl_sec, name="cache"):
+        self.loader = loader
+        self.ttl_sec = ttl_sec
+        self.name = name
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    def _load(self):
+        with self._lock:
+            version = self.version
+        value = self.loader()
+        with self._lock:
+            # Don't overwrite a newer load that finished first
+            if version >= self._loaded_version:
+                self._value = value
+                self._loaded = True
+                self._loaded_version = version
+                self._loaded_at = time.monotonic()
+        return value
+
+    def _refresh_in_background(self):
+        try:
+            self._load()
+        except Exception as e:
+            print(f"DEBUG: Background refresh of {self.name} failed, keeping stale copy: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self):
+        with self._lock:
+            loaded = self._loaded
+            value = self._value
+            outdated = self._loaded_version != self.version
+            expired = time.monotonic() - self._loaded_at > self.ttl_sec
+            busy = self._refreshing
+            if loaded and not busy and (outdated or expired):
+                self._refreshing = True
+
+        if loaded and (busy or not (outdated or expired)):
+            return value
+        if loaded and not outdated:
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+            return value
+
+        # Nothing cached yet, or a write bumped the version: reload now. Only one caller does
+        # this at a time; concurrent readers keep getting the previous copy until it finishes.
+        try:
+            return self._load()
+        except Exception as e:
+            if loaded:
+                print(f"DEBUG: Reload of {self.name} failed, serving stale copy: {e}")
+                return value
+            raise
+        finally:
+            if loaded:
+                with self._lock:
+                    self._refreshing = False
+
+    def bump(self):
+        """Invalidates the cached value; the next read reloads it."""
+        with self._lock:
+            self.version += 1
+            return self.version
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "loaded_version": self._loaded_version,
+                "age_sec": round(time.monotonic() - self._loaded_at, 1) if self._loaded else None,
+                "ttl_sec": self.ttl_sec,
+            }
+
+
+BOOKING_CACHE_TTL_SEC = float(os.getenv("BOOKING_CACHE_TTL_SEC", "120"))
+BOOKING_CACHE_MAX_ENTRIES = int(os.getenv("BOOKING_CACHE_MAX_ENTRIES", "1000"))
+
+
+class KeyedCache:
+    """
+    LRU cache of loaded values keyed by an arbitrary hashable key, with a TTL per entry,
+    explicit per-key invalidation and hit/miss counters.
+
+    A load that was already running when `invalidate()` or `clear()` was called may have read the
+    data from before the write, so its result is returned to its caller but not stored.
+    """
+
+    def __init__(self, ttl_sec, max_entries=1000, name="cache"):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, loaded_at)
+        self._generation = 0  # bumped by every invalidate()/clear()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.discarded = 0
+
+    def get(self, key, loader):
+        """Returns the cached value for `key`, calling `loader()` on a miss. Loader errors are not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] <= self.ttl_sec:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            if generation != self._generation:
+                self.discarded += 1
+                return value
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, match):
+        """Drops every entry whose key satisfies `match(key)`. Returns how many were dropped."""
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if match(key)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "discarded": self.discarded,
+                "ttl_sec": self.ttl_sec,
+            }
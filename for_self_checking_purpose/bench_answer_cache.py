@@ -0,0 +1,67 @@
+import os
+import random
+import sys
+import time
+
+# Benchmark: Public FAQ turns with the answer cache, against local JamAI and Supabase stand-ins.
+# Replays a stream of patient questions drawn from a few FAQ topics with different wordings, then
+# prints the hit rate and the LLM time saved. A duty list change part-way through must cause misses.
+#   python for_self_checking_purpose/bench_answer_cache.py [turns] [llm_delay_ms] [similarity]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jamai_standin import start_standin
+from supabase_standin import start_supabase_standin
+
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LLM_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+SIMILARITY = sys.argv[3] if len(sys.argv) > 3 else "0.85"
+
+jamai_server, api_base = start_standin(request_delay=LLM_DELAY)
+supabase_server, supabase_url, tables = start_supabase_standin()
+fake_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.x"
+os.environ.update(JAMAI_API_BASE=api_base, PUBLIC_API_KEY="bench", PUBLIC_PROJECT_ID="bench",
+                  SUPABASE_URL=supabase_url, SUPABASE_KEY=fake_key,
+                  SUPABASE_STAFF_URL=supabase_url, SUPABASE_STAFF_KEY=fake_key,
+                  ANSWER_CACHE_SIMILARITY=SIMILARITY, CHAT_TABLE_POOL_PREWARM="",
+                  CHAT_TABLE_REAP_INTERVAL_SEC="0")
+tables["DutyList"] = {"rows": [{"id": 1, "doctor_name": "Dr. Tan", "date": None,
+                                "time_start": "09:00", "time_end": "17:00"}], "next_id": 2}
+
+import contextlib
+import io
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import utils
+
+QUESTIONS = [
+    ["What are your opening hours?", "what are your opening hours", "Hi, what are your opening hours please?",
+     "What are the opening hours?", "what r your opening hours"],
+    ["Do you accept walk-in patients?", "do you accept walk in patients", "Do you accept walk-ins?"],
+    ["Where is the clinic located?", "where is the clinic located?", "Where's the clinic located"],
+    ["How much is a consultation?", "how much is a consultation", "How much does a consultation cost?"],
+    ["Which doctors are available?", "which doctors are available", "Which doctors are available now?"],
+]
+
+random.seed(7)
+timings = {"hit": [], "miss": []}
+for turn in range(TURNS):
+    if turn == TURNS // 2:
+        # Roster change: answers cached before it must not be reused
+        tables["DutyList"]["rows"].append({"id": 2, "doctor_name": "Dr. Lee", "date": None,
+                                           "time_start": "13:00", "time_end": "20:00"})
+        utils.invalidate_duty_list_context()
+    question = random.choice(random.choice(QUESTIONS))
+    hits_before = utils.answer_cache.hits
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        utils.get_public_jam_ai_response(question, session_id="bench")
+    elapsed = (time.perf_counter() - start) * 1000
+    timings["hit" if utils.answer_cache.hits > hits_before else "miss"].append(elapsed)
+
+stats = utils.answer_cache.stats()
+print(f"{TURNS} turns, LLM stand-in delay {LLM_DELAY * 1000:.0f} ms, similarity {SIMILARITY}")
+for kind, values in timings.items():
+    if values:
+        print(f"  {kind:<5} {len(values):4d} turns, mean {sum(values) / len(values):7.2f} ms")
+print(f"  hit rate {stats['hit_rate']} ({stats['similar_hits']} by similarity), entries {stats['entries']}, "
+      f"LLM time saved {stats['saved_sec']} s")
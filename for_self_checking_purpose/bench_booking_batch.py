@@ -0,0 +1,92 @@
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+# Benchmark: applying a 500-operation reschedule (creates, updates, deletes) one request at a time
+# through /api/book and /api/appointments PUT/DELETE vs a single POST /api/appointments/batch.
+# Runs against a local Supabase stand-in with `delay_ms` per round trip, so no credentials are needed.
+#   python for_self_checking_purpose/bench_booking_batch.py [operations] [delay_ms]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+from supabase_standin import start_supabase_standin
+
+OPERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+
+standin, url, tables = start_supabase_standin(request_delay=DELAY)
+os.environ.update({
+    "SUPABASE_URL": "", "SUPABASE_STAFF_URL": url,
+    "SUPABASE_STAFF_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench",
+})
+with redirect_stdout(io.StringIO()):
+    from server import app
+
+client = app.test_client()
+
+
+def slot(i):
+    """A distinct (date, time) per seeded booking, so cancelling by slot hits exactly one row."""
+    return f"2026-11-{1 + i % 28:02d}", f"{i // 28:02d}:00"
+
+
+def seed():
+    tables["Booking"] = {"rows": [
+        {"id": i, "doctor_name": "Dr. Sick (GP)", "patient_name": f"patient{i}@example.com",
+         "appoinment_time": slot(i)[1], "Date": slot(i)[0]}
+        for i in range(1, OPERATIONS + 1)
+    ], "next_id": OPERATIONS + 1}
+
+
+def operations():
+    """40% reschedules, 30% cancellations (half by id, half by slot), 30% new bookings."""
+    ops = []
+    for i in range(1, OPERATIONS + 1):
+        if i % 10 < 4:
+            ops.append({"op": "update", "id": i, "newDate": "2026-12-01", "newTime": "10:00 AM"})
+        elif i % 10 < 7:
+            if i % 2:
+                ops.append({"op": "delete", "id": i})
+            else:
+                ops.append({"op": "delete", "doctor_name": "Dr. Sick (GP)", "date": slot(i)[0], "time": slot(i)[1]})
+        else:
+            ops.append({"op": "create", "doctorName": "Dr. Cover (GP)", "date": "2026-11-15", "time": "11:00 AM",
+                        "patientEmail": f"new{i}@example.com"})
+    return ops
+
+
+def one_by_one(ops):
+    ok = 0
+    for op in ops:
+        if op["op"] == "create":
+            response = client.post("/api/book", json={k: v for k, v in op.items() if k != "op"})
+        elif op["op"] == "update":
+            response = client.put("/api/appointments", json=op)
+        else:
+            response = client.delete("/api/appointments", json=op)
+        ok += bool(response.get_json().get("success"))
+    return ok
+
+
+def batched(ops):
+    return client.post("/api/appointments/batch", json={"operations": ops}).get_json()["succeeded"]
+
+
+def run(label, apply):
+    seed()
+    ops = operations()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        ok = apply(ops)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:9.1f} ms | {len(ops) / elapsed:8.1f} ops/s | {ok}/{len(ops)} succeeded"
+          f" | {len(tables['Booking']['rows'])} rows after")
+
+
+print(f"{OPERATIONS} operations, {DELAY * 1000:.0f} ms per Supabase round trip")
+run("one request per op", one_by_one)
+run("batch endpoint", batched)
+standin.shutdown()
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+# Benchmark: embedding a batch of documents one by one vs bulk_ingest.ingest_files, against the local
+# JamAI stand-in (each embed call sleeps `embed_delay_ms` to stand in for JamAI's parsing + embedding).
+# Half the documents are packed into a zip archive to exercise archive expansion.
+#   python for_self_checking_purpose/bench_bulk_ingest.py [files] [embed_delay_ms] [concurrency]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jamai_standin import start_standin
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+EMBED_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+server, api_base = start_standin(request_delay=EMBED_DELAY)
+os.environ.update(JAMAI_API_BASE=api_base, PUBLIC_API_KEY="bench", PUBLIC_PROJECT_ID="bench",
+                  PUBLIC_KNOWLEDGE_TABLE_ID="bench-knowledge", SUPABASE_URL="", SUPABASE_STAFF_URL="",
+                  CHAT_TABLE_POOL_PREWARM="", CHAT_TABLE_REAP_INTERVAL_SEC="0",
+                  KNOWLEDGE_MANIFEST_DB_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-ingest-"), "manifest.db"))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import utils
+from bulk_ingest import BotRateLimiter, expand_inputs, ingest_files
+
+workdir = tempfile.mkdtemp(prefix="bench-ingest-")
+docs = os.path.join(workdir, "docs")
+os.makedirs(docs)
+for i in range(FILES // 2):
+    with open(os.path.join(docs, f"policy_{i:03d}.txt"), "w") as f:
+        f.write(f"Clinic policy {i}.\n" * 200)
+with zipfile.ZipFile(os.path.join(workdir, "handbook.zip"), "w") as archive:
+    for i in range(FILES - FILES // 2):
+        archive.writestr(f"handbook/section_{i:03d}.md", f"# Section {i}\n" + "Some guidance.\n" * 200)
+
+
+def embed(path, bot_type, name):
+    return utils.embed_file_in_jamai(path, bot_type=bot_type, filename=name)
+
+
+def quiet(fn, *args, **kwargs):
+    # Swapped once around the whole run: redirect_stdout isn't safe to enter from the worker threads
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+try:
+    files, skipped = expand_inputs([docs, os.path.join(workdir, "handbook.zip")], workdir)
+    print(f"{len(files)} documents ({len(skipped)} skipped), embed stand-in delay {EMBED_DELAY * 1000:.0f} ms")
+
+    sequential = quiet(ingest_files, files, "Public", embed, limiter=BotRateLimiter(rate_per_min=1e9, concurrency=1),
+                       concurrency=1)
+    print(f"  one by one          {sequential['seconds']:6.2f} s  {sequential['files_per_sec']:6.2f} files/s  "
+          f"({sequential['failed']} failed)")
+
+    # Same files again: without forgetting them the manifest would skip every one as unchanged
+    utils.knowledge_manifest.forget("bench-knowledge")
+    limiter = BotRateLimiter(rate_per_min=1e9, concurrency=CONCURRENCY)
+    bulk = quiet(ingest_files, files, "Public", embed, limiter=limiter, concurrency=CONCURRENCY)
+    print(f"  bulk, {CONCURRENCY:2d} in flight   {bulk['seconds']:6.2f} s  {bulk['files_per_sec']:6.2f} files/s  "
+          f"({bulk['failed']} failed)")
+
+    # The per-minute limit still holds under bulk load: 60/min with a burst of CONCURRENCY
+    utils.knowledge_manifest.forget("bench-knowledge")
+    limited = BotRateLimiter(rate_per_min=60, concurrency=CONCURRENCY)
+    sample = files[:CONCURRENCY + 4]
+    capped = quiet(ingest_files, sample, "Public", embed, limiter=limited, concurrency=CONCURRENCY)
+    print(f"  rate-limited 60/min {capped['seconds']:6.2f} s for {len(sample)} files "
+          f"(expect >= ~4 s: burst of {CONCURRENCY}, then 1/s)")
+    print(f"  speed-up {bulk['files_per_sec'] / sequential['files_per_sec']:.1f}x")
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+    server.shutdown()
@@ -0,0 +1,64 @@
+import os
+import statistics
+import sys
+import time
+
+# Benchmark: cold history load (listing a whole JamAI table) with the old sequential
+# offset += limit loop vs the concurrent pager in jamai_pager.py.
+# Runs against a local stand-in that sleeps `page_delay_ms` per request, so no credentials are needed.
+#   python for_self_checking_purpose/bench_jamai_pager.py [rows] [page_delay_ms] [concurrency] [runs]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jamai_standin import start_standin
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+PAGE_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 80) / 1000
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+RUNS = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+
+server, api_base = start_standin(request_delay=PAGE_DELAY, total_rows=ROWS)
+os.environ["JAMAI_API_BASE"] = api_base
+
+from jamai_pool import JamAIClientRegistry
+from jamai_pager import iter_table_rows
+
+BOT_CONFIG = {"Staff": {"api_key": "bench", "project_id": "bench"}}
+registry = JamAIClientRegistry(BOT_CONFIG)
+
+
+def sequential_rows():
+    """The loop the history functions used before: one page per round trip, up to 30 pages."""
+    all_items = []
+    offset = 0
+    limit = 100
+    for _ in range(30):
+        with registry.client("Staff") as client:
+            response = client.table.list_table_rows(table_type="action", table_id="bench", limit=limit, offset=offset)
+        if not response.items:
+            break
+        all_items.extend(response.items)
+        if len(response.items) < limit:
+            break
+        offset += limit
+    return all_items
+
+
+def paged_rows():
+    return list(iter_table_rows(registry, "Staff", "action", "bench", concurrency=CONCURRENCY))
+
+
+def run(label, fetch):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        rows = fetch()
+        timings.append((time.perf_counter() - start) * 1000)
+    ids = [row["ID"] for row in rows]
+    assert ids == [str(i) for i in range(min(ROWS, 3000))], "rows out of order or missing"
+    print(f"{label:<28} {len(rows)} rows | mean {statistics.mean(timings):8.1f} ms | min {min(timings):8.1f} ms")
+
+
+print(f"{ROWS} rows, {PAGE_DELAY * 1000:.0f} ms per page request, concurrency {CONCURRENCY}, {RUNS} runs")
+run("sequential offset loop", sequential_rows)
+run("concurrent pager", paged_rows)
+server.shutdown()
@@ -0,0 +1,91 @@
+import os
+import statistics
+import sys
+import time
+
+# Benchmark: per-turn latency with a fresh JamAI client per call vs the shared registry client, then
+# `concurrent` slow turns (LLM delay `llm_delay_ms`) at once through the registry: they should all
+# finish in about one turn's time, not queue behind each other.
+# Runs against a local stand-in, so no credentials are needed.
+#   python for_self_checking_purpose/bench_jamai_registry.py [turns] [connect_delay_ms] [concurrent] [llm_delay_ms]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jamai_standin import start_standin
+
+TURNS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+CONNECT_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 40) / 1000
+CONCURRENT = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+LLM_DELAY = (float(sys.argv[4]) if len(sys.argv) > 4 else 300) / 1000
+
+server, api_base = start_standin(connect_delay=CONNECT_DELAY, request_delay=0.005)
+os.environ["JAMAI_API_BASE"] = api_base
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from jamaibase import JamAI, protocol
+from jamai_pool import JamAIClientRegistry
+
+BOT_CONFIG = {"Public": {"api_key": "bench", "project_id": "bench"}}
+
+
+def one_turn(client):
+    completion = client.table.add_table_rows(
+        table_type="action",
+        request=protocol.MultiRowAddRequest(table_id="FAQ", data=[{"usr_input": "hi"}], stream=False),
+    )
+    return completion.rows[0].columns["AI"].text
+
+
+def run(label, turn):
+    timings = []
+    for _ in range(TURNS):
+        start = time.perf_counter()
+        turn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{label:<22} mean {statistics.mean(timings):7.2f} ms | p50 {timings[len(timings) // 2]:7.2f} ms"
+          f" | p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms")
+
+
+def new_client_turn():
+    config = BOT_CONFIG["Public"]
+    client = JamAI(token=config["api_key"], project_id=config["project_id"])
+    one_turn(client)
+
+
+registry = JamAIClientRegistry(BOT_CONFIG)
+
+
+def registry_turn():
+    with registry.client("Public") as client:
+        one_turn(client)
+
+
+def concurrent_turns():
+    """CONCURRENT slow turns at once (more than the 4 the old per-bot checkout pool allowed)."""
+    slow_server, slow_base = start_standin(request_delay=LLM_DELAY)
+    slow = JamAIClientRegistry(BOT_CONFIG, client_factory=functools.partial(JamAI, api_base=slow_base))
+
+    def slow_turn():
+        with slow.client("Public") as client:
+            one_turn(client)
+
+    try:
+        slow_turn()  # warm up the connection
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CONCURRENT) as pool:
+            for future in [pool.submit(slow_turn) for _ in range(CONCURRENT)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        print(f"{CONCURRENT} concurrent turns    {elapsed * 1000:7.0f} ms total (one turn {LLM_DELAY * 1000:.0f} ms; "
+              f"an exclusive pool of 4 would take ~{-(-CONCURRENT // 4) * LLM_DELAY * 1000:.0f} ms)")
+    finally:
+        slow_server.shutdown()
+
+
+print(f"{TURNS} turns, simulated connection setup {CONNECT_DELAY * 1000:.0f} ms, stand-in at {api_base}")
+run("new client per turn", new_client_turn)
+run("shared registry", registry_turn)
+concurrent_turns()
+server.shutdown()
@@ -0,0 +1,74 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Benchmark: re-uploading knowledge files with the content-hash manifest, against the JamAI stand-in.
+# Uploads a handbook, uploads it again unchanged, then uploads an edited version (one paragraph changed,
+# one inserted), once as .md (chunked locally) and once as .pdf (chunked by the stand-in's embed_file).
+# Prints the rows in the knowledge table after each step next to what re-embedding everything would leave.
+#   python for_self_checking_purpose/bench_knowledge_manifest.py [paragraphs] [request_delay_ms]
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from jamai_standin import start_standin
+
+PARAGRAPHS = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+REQUEST_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+
+workdir = tempfile.mkdtemp(prefix="bench-manifest-")
+knowledge = []
+server, api_base = start_standin(request_delay=REQUEST_DELAY, knowledge=knowledge)
+os.environ.update(JAMAI_API_BASE=api_base, PUBLIC_API_KEY="bench", PUBLIC_PROJECT_ID="bench",
+                  PUBLIC_KNOWLEDGE_TABLE_ID="bench-knowledge", SUPABASE_URL="", SUPABASE_STAFF_URL="",
+                  CHAT_TABLE_POOL_PREWARM="", CHAT_TABLE_REAP_INTERVAL_SEC="0",
+                  KNOWLEDGE_MANIFEST_DB_PATH=os.path.join(workdir, "manifest.db"))
+
+import contextlib
+import io
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import utils
+
+random.seed(3)
+WORDS = "patient clinic doctor appointment policy consent record referral fee refund visit staff".split()
+
+
+def paragraph(i):
+    return f"Section {i}. " + " ".join(random.choice(WORDS) for _ in range(40)) + "."
+
+
+v1 = [paragraph(i) for i in range(PARAGRAPHS)]
+v2 = list(v1)
+v2[PARAGRAPHS // 2] = paragraph(PARAGRAPHS // 2) + " (amended)"
+v2.insert(5, "New section. " + " ".join(random.choice(WORDS) for _ in range(40)))
+
+
+def upload(name, paragraphs):
+    # Each format gets its own title line, so the .pdf isn't matched to the .md by content
+    path = os.path.join(workdir, "upload" + os.path.splitext(name)[1])
+    with open(path, "w") as f:
+        f.write("\n\n".join([name] + paragraphs))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outcome = utils.embed_file_in_jamai(path, bot_type="Public", filename=name)
+    return outcome, (time.perf_counter() - start) * 1000
+
+
+try:
+    for name in ("handbook.md", "handbook.pdf"):
+        rows_before = len(knowledge)
+        naive = 0
+        print(f"{name}: {PARAGRAPHS} paragraphs, request delay {REQUEST_DELAY * 1000:.0f} ms")
+        for label, paragraphs in (("first upload", v1), ("same file again", v1), ("edited version", v2)):
+            outcome, elapsed = upload(name, paragraphs)
+            rows = len(knowledge) - rows_before
+            naive += outcome["added"] + outcome["kept"]
+            print(f"  {label:<16} {outcome['status']:<9} +{outcome['added']:<3} -{outcome['removed']:<3} "
+                  f"kept {outcome['kept']:<3} rows in table {rows:4d}  {elapsed:7.1f} ms")
+        print(f"  re-embedding every upload would leave {naive} rows")
+    print(f"manifest: {utils.knowledge_manifest.stats()}")
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
+    server.shutdown()
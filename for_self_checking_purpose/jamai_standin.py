@@ -0,0 +1,171 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the JamAI API, used by the benchmark scripts in this folder.
+# Point the SDK at it with JAMAI_API_BASE=http://127.0.0.1:<port>/api before importing jamaibase.
+#   connect_delay: seconds slept once per new TCP connection (stands in for DNS + TLS handshake)
+#   request_delay: seconds slept per request (stands in for server / LLM time)
+#   knowledge: list that holds the rows of every knowledge table (embed_file stores one row per
+#              paragraph; rows/list honours `"File ID" LIKE '%name'`; rows/add and rows/delete work)
+
+
+def _completion(text):
+    return {
+        "id": str(uuid.uuid4()),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "stand-in",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+def _chunk(column, row_id, text):
+    return {
+        "id": row_id,
+        "object": "gen_table.completion.chunk",
+        "created": int(time.time()),
+        "model": "stand-in",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}],
+        "usage": None,
+        "output_column_name": column,
+        "row_id": row_id,
+    }
+
+
+def _multipart_file(raw):
+    """(filename, content) of the single file part of a multipart body."""
+    match = re.search(rb'filename="([^"]*)"[^\r]*\r\n(?:[^\r]+\r\n)*\r\n', raw)
+    if not match:
+        return None, b""
+    content = raw[match.end():]
+    return match.group(1).decode(), content[:content.rfind(b"\r\n--")]
+
+
+def make_handler(connect_delay=0.0, request_delay=0.0, reply="Hello from the stand-in.", total_rows=0, knowledge=None):
+    knowledge = knowledge if knowledge is not None else []
+    knowledge_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            time.sleep(connect_delay)
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.raw_body = self.rfile.read(length) if length else b""
+            try:
+                return json.loads(self.raw_body or b"{}")
+            except ValueError:
+                return {}
+
+        def _knowledge_rows(self):
+            query = parse_qs(urlparse(self.path).query)
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            match = re.search(r"LIKE '%(.*?)'( ESCAPE '.')?$", query.get("where", [""])[0])
+            suffix = match.group(1).replace("''", "'") if match else ""
+            if match and match.group(2):
+                suffix = re.sub(r"\\(.)", r"\1", suffix)
+            with knowledge_lock:
+                rows = [dict(row) for row in knowledge if row["File ID"].endswith(suffix)]
+            return self._send_json({"items": rows[offset:offset + limit], "offset": offset, "limit": limit,
+                                    "total": len(rows)})
+
+        def do_GET(self):
+            time.sleep(request_delay)
+            if self.path.endswith("/health"):
+                return self._send_json({"status": "ok"})
+            if "/knowledge/rows/list" in self.path:
+                return self._knowledge_rows()
+            if "/rows/list" in self.path:
+                # Fake table of `total_rows` rows; honours offset/limit query params
+                query = parse_qs(urlparse(self.path).query)
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", ["100"])[0])
+                items = [
+                    {"ID": str(i), "Updated at": f"2025-01-01T00:00:{i:06d}", "Session ID": f"staff_{i % 10}",
+                     "User": f"question {i}", "AI": f"answer {i}"}
+                    for i in range(offset, min(offset + limit, total_rows))
+                ]
+                return self._send_json({"items": items, "offset": offset, "limit": limit, "total": total_rows})
+            self._send_json({}, status=404)
+
+        def do_POST(self):
+            body = self._read_body()
+            time.sleep(request_delay)
+            if self.path.endswith("/rows/add") and body.get("stream"):
+                # Server-Sent Events, one chunk per word of the reply
+                row_id = str(uuid.uuid4())
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = reply.split(" ")
+                events = [_chunk("AI", row_id, (" " if i else "") + w) for i, w in enumerate(words)]
+                for event in [json.dumps(e) for e in events] + ["[DONE]"]:
+                    data = f"data: {event}\n\n".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            if self.path.endswith("/knowledge/embed_file"):
+                filename, content = _multipart_file(self.raw_body)
+                file_id = f"s3://stand-in/raw/{uuid.uuid4().hex}/{filename}"
+                paragraphs = [p.strip() for p in content.decode("utf-8", "replace").split("\n\n") if p.strip()]
+                with knowledge_lock:
+                    knowledge.extend({"ID": str(uuid.uuid4()), "Title": filename, "Text": text, "File ID": file_id}
+                                     for text in paragraphs)
+                return self._send_json({"ok": True})
+            if self.path.endswith("/knowledge/rows/add"):
+                added = [dict(row, ID=str(uuid.uuid4())) for row in body.get("data", [])]
+                with knowledge_lock:
+                    knowledge.extend(added)
+                rows = [{"object": "gen_table.completion.chunks", "row_id": row["ID"], "columns": {}} for row in added]
+                return self._send_json({"object": "gen_table.completion.rows", "rows": rows})
+            if self.path.endswith("/knowledge/rows/delete"):
+                row_ids = set(body.get("row_ids") or [])
+                with knowledge_lock:
+                    knowledge[:] = [row for row in knowledge if row["ID"] not in row_ids]
+                return self._send_json({"ok": True})
+            if self.path.endswith("/rows/add"):
+                rows = [
+                    {"object": "gen_table.completion.chunks", "row_id": str(uuid.uuid4()),
+                     "columns": {"AI": _completion(reply)}}
+                    for _ in body.get("data", [{}])
+                ]
+                return self._send_json({"object": "gen_table.completion.rows", "rows": rows})
+            self._send_json({"ok": True})
+
+    return Handler
+
+
+class StandinServer(ThreadingHTTPServer):
+    # The default listen backlog (5) resets connections under concurrent load tests
+    request_queue_size = 1024
+
+
+def start_standin(port=0, **kwargs):
+    """Starts the stand-in on a background thread and returns (server, api_base)."""
+    server = StandinServer(("127.0.0.1", port), make_handler(**kwargs))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
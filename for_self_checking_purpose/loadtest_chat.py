@@ -0,0 +1,133 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Load test: concurrent POST /api/chat against the Flask server (bounded thread pool, like a
+# threaded WSGI worker) vs the ASGI mode (uvicorn asgi_server:app), both talking to a local JamAI
+# stand-in that takes `llm_delay` seconds per row. Supabase is disabled so only the chat path is measured.
+#   python for_self_checking_purpose/loadtest_chat.py [concurrency] [requests] [llm_delay_sec] [flask_threads]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+
+def serve_flask(port, threads):
+    """Runs server.py's Flask app on a fixed-size thread pool (what a threaded WSGI worker gives you)."""
+    from werkzeug.serving import BaseWSGIServer
+    from server import app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.executor = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, app).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+async def fire(port, concurrency, total):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(client, i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(f"http://127.0.0.1:{port}/api/chat", json={
+                "message": f"load test {i}", "context": "Staff", "sessionId": f"staff_load_{i}"
+            })
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or "Error" in response.json().get("response", ""):
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(client, i) for i in range(total)])
+        elapsed = time.perf_counter() - start
+    return elapsed, sorted(latencies), errors
+
+
+def run_mode(label, command, port, env, concurrency, total):
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        elapsed, latencies, errors = asyncio.run(fire(port, concurrency, total))
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"{label:<26} {total / elapsed:7.1f} req/s | p50 {latencies[len(latencies) // 2]:6.2f} s"
+          f" | p95 {latencies[int(len(latencies) * 0.95) - 1]:6.2f} s | errors {errors}")
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    llm_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    flask_threads = int(sys.argv[4]) if len(sys.argv) > 4 else 16
+
+    from jamai_standin import start_standin
+    standin, api_base = start_standin(request_delay=llm_delay)
+
+    env = dict(os.environ)
+    env.update({
+        "JAMAI_API_BASE": api_base,
+        # Disable Supabase so the context providers return immediately
+        "SUPABASE_URL": "", "SUPABASE_STAFF_URL": "",
+        "STAFF_API_KEY": "load", "STAFF_PROJECT_ID": "load", "STAFF_TABLE_ID": "load",
+    })
+
+    print(f"{total} requests, {concurrency} concurrent, stand-in LLM delay {llm_delay}s")
+    port = free_port()
+    run_mode(f"flask ({flask_threads} threads)",
+             [sys.executable, os.path.abspath(__file__), "serve-flask", str(port), str(flask_threads)],
+             port, env, concurrency, total)
+    port = free_port()
+    run_mode("asgi (uvicorn)",
+             [sys.executable, "-m", "uvicorn", "asgi_server:app", "--port", str(port), "--log-level", "warning"],
+             port, env, concurrency, total)
+    standin.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve-flask":
+        serve_flask(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main()
@@ -0,0 +1,187 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+# Local stand-in for the Supabase REST API (PostgREST), used by the benchmark scripts in this folder.
+# Keeps each table as an in-memory list of rows with an auto-increment id. Supports the filters the
+# app uses (eq, gt, gte, lte, ilike, in, is.null, or/and groups), order=id, limit, insert, upsert on id,
+# update and delete, all returning the affected rows.
+#   request_delay: seconds slept per request (stands in for the network round trip to Supabase)
+
+
+def _split_top(text):
+    """Splits on commas that are not inside parentheses or double quotes."""
+    parts, depth, quoted, current, i = [], 0, False, "", 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and quoted and i + 1 < len(text):
+            current += text[i:i + 2]
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+        i += 1
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _compare(cell, op, value):
+    if op == "is":
+        return cell is None if value == "null" else str(cell).lower() == value
+    if op == "in":
+        return str(cell) in {_unquote(v) for v in _split_top(value.strip("()"))}
+    value = _unquote(value)
+    if isinstance(cell, int):
+        try:
+            value = int(value)
+        except ValueError:
+            cell = str(cell)
+    elif cell is not None:
+        cell = str(cell)
+    if cell is None:
+        return False
+    if op == "ilike":
+        pattern = ".*".join(re.escape(part) for part in value.lower().split("*"))
+        return re.fullmatch(pattern, cell.lower(), re.DOTALL) is not None
+    return {"eq": cell == value, "gt": cell > value, "gte": cell >= value, "lt": cell < value, "lte": cell <= value}[op]
+
+
+def _condition(expr):
+    """'and(a.eq.1,b.gt.2)' / 'a.eq.1' -> predicate."""
+    for group in ("and", "or"):
+        if expr.startswith(group + "("):
+            subs = [_condition(part) for part in _split_top(expr[len(group) + 1:-1])]
+            combine = all if group == "and" else any
+            return lambda row: combine(sub(row) for sub in subs)
+    column, op, value = expr.split(".", 2)
+    return lambda row: _compare(row.get(column), op, value)
+
+
+def _filters(params):
+    predicates = []
+    for key, value in params:
+        if key in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+            continue
+        if key in ("or", "and"):
+            predicates.append(_condition(f"{key}{value}"))
+        else:
+            predicates.append(_condition(f"{key}.{value}"))
+    return lambda row: all(p(row) for p in predicates)
+
+
+def make_handler(tables, lock, request_delay=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _parse(self):
+            url = urlparse(self.path)
+            table = url.path.rstrip("/").split("/")[-1]
+            params = parse_qsl(url.query, keep_blank_values=True)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"null") if length else None
+            time.sleep(request_delay)
+            with lock:
+                rows = tables.setdefault(table, {"rows": [], "next_id": 1})
+            return rows, params, body
+
+        @staticmethod
+        def _project(rows, params):
+            select = dict(params).get("select", "*")
+            if select == "*":
+                return [dict(row) for row in rows]
+            columns = [c.strip().strip('"') for c in select.split(",")]
+            return [{c: row.get(c) for c in columns} for row in rows]
+
+        def do_GET(self):
+            table, params, _ = self._parse()
+            match = _filters(params)
+            with lock:
+                rows = [row for row in table["rows"] if match(row)]
+            query = dict(params)
+            if query.get("order", "").startswith("id"):
+                rows.sort(key=lambda row: row["id"], reverse=query["order"].endswith(".desc"))
+            if "limit" in query:
+                rows = rows[int(query.get("offset", 0)):int(query.get("offset", 0)) + int(query["limit"])]
+            self._send_json(self._project(rows, params))
+
+        def do_POST(self):
+            table, params, body = self._parse()
+            items = body if isinstance(body, list) else [body]
+            upsert = "merge-duplicates" in (self.headers.get("Prefer") or "")
+            written = []
+            with lock:
+                by_id = {row["id"]: row for row in table["rows"]}
+                for item in items:
+                    if upsert and item.get("id") in by_id:
+                        by_id[item["id"]].update(item)
+                        written.append(dict(by_id[item["id"]]))
+                        continue
+                    row = dict(item, id=item.get("id") or table["next_id"])
+                    table["next_id"] = max(table["next_id"], row["id"]) + 1
+                    table["rows"].append(row)
+                    written.append(dict(row))
+            self._send_json(written, status=201)
+
+        def do_PATCH(self):
+            table, params, body = self._parse()
+            match = _filters(params)
+            with lock:
+                updated = []
+                for row in table["rows"]:
+                    if match(row):
+                        row.update(body or {})
+                        updated.append(dict(row))
+            self._send_json(updated)
+
+        def do_DELETE(self):
+            table, params, _ = self._parse()
+            match = _filters(params)
+            with lock:
+                deleted = [dict(row) for row in table["rows"] if match(row)]
+                table["rows"] = [row for row in table["rows"] if not match(row)]
+            self._send_json(deleted)
+
+    return Handler
+
+
+class StandinServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+
+def start_supabase_standin(port=0, request_delay=0.0):
+    """Starts the stand-in on a background thread and returns (server, url, tables)."""
+    tables, lock = {}, threading.Lock()
+    server = StandinServer(("127.0.0.1", port), make_handler(tables, lock, request_delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", tables
@@ -0,0 +1,241 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# --- Local Chat History Store ---
+# Every chat turn is also written here, indexed by (session_key, timestamp), so /api/history reads
+# only the rows of one session instead of paging through the whole JamAI table.
+# session_key is "session:<Session ID>" for Action Table sessions and "table:<table_id>" for the
+# per-session Chat Tables. Each JamAI source table is imported once ("backfilled") on first use.
+# Pages are ordered and filtered by comparing timestamps as strings, so every stored timestamp is
+# first normalised to one format (UTC ISO 8601 with microseconds), whichever source it came from.
+
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "chat_history.db")
+
+
+def normalize_timestamp(value):
+    """
+    `value` (datetime or ISO string, e.g. JamAI's "Updated at") as a UTC ISO timestamp with microseconds.
+    Naive values are taken as UTC. Returns None if it can't be parsed.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+class HistoryStore:
+    """
+    SQLite-backed message store. Safe to share between threads (one connection per thread).
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_key TEXT NOT NULL,
+                    row_id TEXT,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_key, timestamp, id)")
+            # The same JamAI row can arrive from a live turn and from the backfill; keep it once
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_row ON messages (session_key, row_id, role)")
+            # Last time each session was used (a turn, a history read, or handing out its table)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS activity (
+                    session_key TEXT PRIMARY KEY,
+                    last_active TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS backfills (
+                    source TEXT PRIMARY KEY,
+                    messages INTEGER NOT NULL,
+                    done_at TEXT NOT NULL
+                )
+            """)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # Rows stored before timestamps were normalised (unparseable ones sort as "now")
+                now = self.now()
+                rows = conn.execute("SELECT id, timestamp FROM messages").fetchall()
+                conn.executemany("UPDATE messages SET timestamp = ? WHERE id = ?",
+                                 [(normalize_timestamp(row["timestamp"]) or now, row["id"]) for row in rows])
+                conn.execute("PRAGMA user_version = 1")
+
+    @staticmethod
+    def now():
+        return normalize_timestamp(datetime.now(timezone.utc))
+
+    def record_turn(self, session_key, user_text, ai_text, row_id=None, timestamp=None):
+        """Stores one user/assistant exchange. Empty texts are skipped, as in the JamAI history."""
+        timestamp = normalize_timestamp(timestamp) or self.now()
+        messages = []
+        if user_text:
+            messages.append(("user", user_text))
+        if ai_text:
+            messages.append(("assistant", ai_text))
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO messages (session_key, row_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(session_key, row_id, role, content, timestamp) for role, content in messages]
+            )
+            self._touch(conn, session_key, self.now())
+
+    @staticmethod
+    def _touch(conn, session_key, at):
+        conn.execute(
+            "INSERT INTO activity (session_key, last_active) VALUES (?, ?) "
+            "ON CONFLICT(session_key) DO UPDATE SET last_active = MAX(last_active, excluded.last_active)",
+            (session_key, at)
+        )
+
+    def touch(self, session_key):
+        """Marks a session as in use now."""
+        conn = self._conn()
+        with conn:
+            self._touch(conn, session_key, self.now())
+
+    def last_active(self, prefix=""):
+        """Dict of session_key -> last activity (ISO timestamp) for keys starting with `prefix`."""
+        rows = self._conn().execute(
+            "SELECT session_key, last_active FROM activity WHERE substr(session_key, 1, ?) = ?",
+            (len(prefix), prefix)
+        ).fetchall()
+        return {row["session_key"]: row["last_active"] for row in rows}
+
+    def delete_session(self, session_key, source=None):
+        """Drops a session's messages and activity (and its backfill marker) once its JamAI table is gone."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE session_key = ?", (session_key,))
+            conn.execute("DELETE FROM activity WHERE session_key = ?", (session_key,))
+            if source:
+                conn.execute("DELETE FROM backfills WHERE source = ?", (source,))
+
+    def get_history(self, session_key):
+        """Messages of one session, oldest first, in the same shape as the JamAI history."""
+        rows = self._conn().execute(
+            "SELECT role, content, timestamp FROM messages WHERE session_key = ? ORDER BY timestamp, id",
+            (session_key,)
+        ).fetchall()
+        return [{"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]} for row in rows]
+
+    @staticmethod
+    def encode_cursor(timestamp, message_id):
+        return base64.urlsafe_b64encode(f"{timestamp}|{message_id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Returns (timestamp, id). Raises ValueError for a malformed cursor."""
+        try:
+            timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+            return timestamp, int(message_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def get_page(self, session_key, cursor=None, since=None, limit=None):
+        """
+        Messages of one session newer than `cursor` (a next_cursor from an earlier page) or `since`
+        (an ISO timestamp; raises ValueError if it isn't one), oldest first, at most `limit` of them.
+        Returns (messages, next_cursor, has_more, etag). next_cursor is the position after the last
+        returned message (the given cursor if nothing is newer); the etag changes whenever the
+        session gets new messages.
+        """
+        query = "SELECT id, role, content, timestamp FROM messages WHERE session_key = ?"
+        args = [session_key]
+        if cursor:
+            after_timestamp, after_id = self.decode_cursor(cursor)
+            query += " AND (timestamp > ? OR (timestamp = ? AND id > ?))"
+            args += [after_timestamp, after_timestamp, after_id]
+        elif since:
+            after = normalize_timestamp(since)
+            if after is None:
+                raise ValueError("Invalid since timestamp")
+            query += " AND timestamp > ?"
+            args.append(after)
+        query += " ORDER BY timestamp, id"
+        if limit:
+            # One extra row tells us whether there is more after this page
+            query += " LIMIT ?"
+            args.append(int(limit) + 1)
+
+        conn = self._conn()
+        rows = conn.execute(query, args).fetchall()
+        has_more = bool(limit) and len(rows) > int(limit)
+        if has_more:
+            rows = rows[:int(limit)]
+
+        next_cursor = cursor
+        if rows:
+            next_cursor = self.encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+
+        count, max_id = conn.execute(
+            "SELECT COUNT(*), MAX(id) FROM messages WHERE session_key = ?", (session_key,)
+        ).fetchone()
+        etag = hashlib.sha1(f"{session_key}|{count}|{max_id}|{cursor}|{since}|{limit}".encode()).hexdigest()[:20]
+
+        messages = [{"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]} for row in rows]
+        return messages, next_cursor, has_more, etag
+
+    def is_backfilled(self, source):
+        row = self._conn().execute("SELECT 1 FROM backfills WHERE source = ?", (source,)).fetchone()
+        return row is not None
+
+    def backfill(self, source, sessions, complete=True):
+        """
+        One-time import of a JamAI table.
+        sessions: dict of session_key -> list of (row_id, user_text, ai_text, timestamp).
+        complete: False if the listing missed rows; the messages are kept but the source isn't marked
+        as imported, so the next read imports it again (rows already stored are skipped).
+        Rows whose timestamp can't be parsed are stored with the import time.
+        """
+        count = 0
+        now = self.now()
+        conn = self._conn()
+        with conn:
+            for session_key, turns in sessions.items():
+                for row_id, user_text, ai_text, timestamp in turns:
+                    timestamp = normalize_timestamp(timestamp) or now
+                    for role, content in (("user", user_text), ("assistant", ai_text)):
+                        if content:
+                            conn.execute(
+                                "INSERT OR IGNORE INTO messages (session_key, row_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                                (session_key, row_id, role, content, timestamp)
+                            )
+                            count += 1
+            if complete:
+                conn.execute(
+                    "INSERT OR REPLACE INTO backfills (source, messages, done_at) VALUES (?, ?, ?)",
+                    (source, count, self.now())
+                )
+        return count
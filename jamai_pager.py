@@ -0,0 +1,82 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Paginated JamAI Table Listing ---
+# Listing a table page by page (offset += limit) costs one round trip per page in sequence.
+# The first page also tells us the row count, so the remaining pages can be requested together
+# with a bounded number in flight. Pages are still handed back in table order.
+
+JAMAI_LIST_PAGE_SIZE = int(os.getenv("JAMAI_LIST_PAGE_SIZE", "100"))
+JAMAI_LIST_MAX_ROWS = int(os.getenv("JAMAI_LIST_MAX_ROWS", "3000"))
+JAMAI_LIST_CONCURRENCY = int(os.getenv("JAMAI_LIST_CONCURRENCY", "4"))
+
+
+def _fetch_page(clients, bot_type, table_type, table_id, offset, limit):
+    with clients.client(bot_type) as client:
+        return client.table.list_table_rows(
+            table_type=table_type,
+            table_id=table_id,
+            limit=limit,
+            offset=offset
+        )
+
+
+def _row_pages(clients, bot_type, table_type, table_id, page_size, max_rows, concurrency):
+    """Yields (row count of the table, rows of one page) in table order; see iter_table_rows."""
+    first = _fetch_page(clients, bot_type, table_type, table_id, 0,
+                        page_size if max_rows is None else min(page_size, max_rows))
+    table_total = first.total or 0
+    yield table_total, first.items
+
+    total = table_total if max_rows is None else min(table_total, max_rows)
+    if len(first.items) < page_size or total <= len(first.items):
+        return
+
+    offsets = iter(range(page_size, total, page_size))
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        def submit_next():
+            offset = next(offsets, None)
+            if offset is not None:
+                limit = min(page_size, total - offset)
+                pending.append((limit, executor.submit(
+                    _fetch_page, clients, bot_type, table_type, table_id, offset, limit
+                )))
+
+        pending = deque()
+        for _ in range(max(1, concurrency)):
+            submit_next()
+
+        while pending:
+            limit, future = pending.popleft()
+            page = future.result()
+            submit_next()
+            yield table_total, page.items
+            # Rows deleted since the count was taken: the table ends here
+            if len(page.items) < limit:
+                for _, future in pending:
+                    future.cancel()
+                return
+
+
+def iter_table_rows(clients, bot_type, table_type, table_id, page_size=JAMAI_LIST_PAGE_SIZE,
+                    max_rows=JAMAI_LIST_MAX_ROWS, concurrency=JAMAI_LIST_CONCURRENCY):
+    """
+    Yields the rows of a JamAI table in order, up to `max_rows` (None: all of them), using clients
+    from `clients` (a JamAIClientRegistry). The first page is fetched alone to learn the row count; the
+    rest are fetched with at most `concurrency` requests in flight and yielded as soon as their turn comes.
+    """
+    for _, items in _row_pages(clients, bot_type, table_type, table_id, page_size, max_rows, concurrency):
+        yield from items
+
+
+def list_table_rows(clients, bot_type, table_type, table_id, page_size=JAMAI_LIST_PAGE_SIZE,
+                    max_rows=None, concurrency=JAMAI_LIST_CONCURRENCY):
+    """
+    All rows of a JamAI table (up to `max_rows`) and the row count the table reported, so a caller
+    can tell whether it got every row (fewer means the cap was hit or rows were deleted meanwhile).
+    """
+    rows, total = [], 0
+    for total, items in _row_pages(clients, bot_type, table_type, table_id, page_size, max_rows, concurrency):
+        rows.extend(items)
+    return rows, total
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from jamaibase import JamAI, JamAIAsync
+from metrics import instrument_jamai
+
+# --- JamAI Client Registry ---
+# Building a new JamAI client on every call means a new HTTP connection (and TLS handshake)
+# on every chat turn. Instead we keep one long-lived client per bot and share it between calls,
+# so its keep-alive connections get reused across requests.
+# Both SDK clients send through an httpx.AsyncClient (the sync JamAI runs it on a background event
+# loop), which is safe to share: concurrent calls each take a connection from its pool. The pool
+# size is set with httpx limits; a call never waits for another turn or stream to finish.
+
+JAMAI_MAX_CONNECTIONS = int(os.getenv("JAMAI_MAX_CONNECTIONS", "100"))
+JAMAI_MAX_KEEPALIVE = int(os.getenv("JAMAI_MAX_KEEPALIVE", "20"))
+JAMAI_HEALTH_CHECK_SEC = float(os.getenv("JAMAI_HEALTH_CHECK_SEC", "60"))
+
+
+def _apply_limits(client, limits):
+    """
+    Gives an SDK client an httpx.AsyncClient with `limits` (the SDK builds one with httpx's defaults
+    and passes it to each of its sub-clients, so all of them are switched over).
+    """
+    old = getattr(client, "http_client", None)
+    if not isinstance(old, httpx.AsyncClient):
+        return client
+    new = httpx.AsyncClient(timeout=old.timeout, transport=httpx.AsyncHTTPTransport(retries=3, limits=limits))
+    client.http_client = new
+    for part in vars(client).values():
+        if getattr(part, "http_client", None) is old:
+            part.http_client = new
+    return client
+
+
+class JamAIClientRegistry:
+    """
+    Thread-safe registry of shared JamAI clients keyed by bot name (Staff/Public/Booking).
+
+    - `client(bot_type)` yields the bot's sync client; calls run concurrently over its connection pool.
+    - `async_client(bot_type)` returns the bot's JamAIAsync client (ASGI mode).
+    - A client is health-checked in the background at most every `health_check_sec` and replaced if
+      the check fails; calls in flight finish on the old one.
+    """
+
+    def __init__(self, bot_config, max_connections=JAMAI_MAX_CONNECTIONS, max_keepalive=JAMAI_MAX_KEEPALIVE,
+                 health_check_sec=JAMAI_HEALTH_CHECK_SEC, client_factory=JamAI, async_client_factory=JamAIAsync):
+        self.bot_config = bot_config
+        self.limits = httpx.Limits(max_connections=max(1, int(max_connections)),
+                                   max_keepalive_connections=max(0, int(max_keepalive)))
+        self.health_check_sec = health_check_sec
+        self.client_factory = client_factory
+        self.async_client_factory = async_client_factory
+
+        self._lock = threading.Lock()
+        self._clients = {}        # bot_type -> JamAI
+        self._async_clients = {}  # bot_type -> JamAIAsync
+        self._last_checked = {}   # bot_type -> last successful health check
+        self._checking = set()
+        self.replaced = 0
+
+    def _get_config(self, bot_type):
+        config = self.bot_config.get(bot_type)
+        if not config:
+            raise ValueError(f"Invalid bot_type: {bot_type}")
+        return config
+
+    def _new_client(self, factory, bot_type):
+        config = self._get_config(bot_type)
+        client = factory(token=config["api_key"], project_id=config["project_id"])
+        return instrument_jamai(_apply_limits(client, self.limits), bot_type)
+
+    def _shared_client(self, bot_type):
+        client = self._clients.get(bot_type)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(bot_type)
+                if client is None:
+                    client = self._new_client(self.client_factory, bot_type)
+                    self._clients[bot_type] = client
+                    self._last_checked[bot_type] = time.monotonic()
+        return client
+
+    def _is_healthy(self, client):
+        try:
+            client.health()
+            return True
+        except Exception as e:
+            print(f"DEBUG: JamAI client failed health check: {e}")
+            return False
+
+    def _check(self, bot_type, client):
+        """Health-checks `client` and replaces it if it fails. Returns True if it was healthy."""
+        try:
+            healthy = self._is_healthy(client)
+            with self._lock:
+                if healthy:
+                    self._last_checked[bot_type] = time.monotonic()
+                elif self._clients.get(bot_type) is client:
+                    # New calls get a fresh client; calls in flight finish on the old one, left to GC
+                    del self._clients[bot_type]
+                    self.replaced += 1
+            return healthy
+        finally:
+            with self._lock:
+                self._checking.discard(bot_type)
+
+    def _check_in_background(self, bot_type, client):
+        if self.health_check_sec is None:
+            return
+        with self._lock:
+            due = time.monotonic() - self._last_checked.get(bot_type, 0) > self.health_check_sec
+            if not due or bot_type in self._checking:
+                return
+            self._checking.add(bot_type)
+        threading.Thread(target=self._check, args=(bot_type, client), daemon=True).start()
+
+    @contextmanager
+    def client(self, bot_type):
+        """Yields the shared client for `bot_type`. Nothing is checked out: any number of calls may run at once."""
+        client = self._shared_client(bot_type)
+        self._check_in_background(bot_type, client)
+        yield client
+
+    def async_client(self, bot_type):
+        """
+        Returns the shared async client for `bot_type` (ASGI mode). One client per bot is enough:
+        its connection pool is shared by every task on the event loop, so no checkout is needed.
+        """
+        client = self._async_clients.get(bot_type)
+        if client is None:
+            self._get_config(bot_type)
+            with self._lock:
+                client = self._async_clients.get(bot_type)
+                if client is None:
+                    client = self._new_client(self.async_client_factory, bot_type)
+                    self._async_clients[bot_type] = client
+        return client
+
+    def health_check(self):
+        """Health-checks each bot's client (replacing failed ones) and returns a status summary per bot."""
+        status = {}
+        for bot_type, client in list(self._clients.items()):
+            with self._lock:
+                self._checking.add(bot_type)
+            healthy = self._check(bot_type, client)
+            status[bot_type] = {
+                "healthy": healthy,
+                "replaced": not healthy,
+                "max_connections": self.limits.max_connections,
+                "max_keepalive": self.limits.max_keepalive_connections,
+            }
+        return status
+
+    def close_all(self):
+        """Drops every client, e.g. on shutdown (the sync client closes its connections on GC)."""
+        with self._lock:
+            self._clients.clear()
+            self._async_clients.clear()
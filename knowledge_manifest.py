@@ -0,0 +1,208 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- Knowledge File Manifest ---
+# Re-uploading a handbook used to embed it again, so the knowledge table collected a second copy of
+# every chunk and RAG retrieval got slower and noisier with each upload. This manifest records, per
+# knowledge table, the content hash of each file (keyed by its upload name) and of each of its chunks
+# with the JamAI row holding it:
+#   - a file whose bytes are already in the table (under any name) is skipped;
+#   - a new version of a known file only adds the chunks that are new and deletes the rows of the
+#     chunks that are gone; unchanged chunks keep their rows.
+# Plain text (.txt/.md) is chunked here, so only the new chunks are sent to be embedded. Other types
+# are parsed by JamAI (embed_file); their chunks are hashed afterwards to apply the same diff.
+
+KNOWLEDGE_MANIFEST_DB_PATH = os.getenv("KNOWLEDGE_MANIFEST_DB_PATH", "knowledge_manifest.db")
+KNOWLEDGE_CHUNK_SIZE = int(os.getenv("KNOWLEDGE_CHUNK_SIZE", "1000"))
+
+# Chunked locally; everything else goes through JamAI's document parsers
+TEXT_EXTENSIONS = {".txt", ".md"}
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_digest(text):
+    """Hash of a chunk's text with whitespace collapsed, so re-wrapped lines still match."""
+    return hashlib.sha256(_SPACE_RE.sub(" ", text or "").strip().encode("utf-8")).hexdigest()
+
+
+def _pieces(text, chunk_size):
+    """Paragraphs; those longer than a chunk are split into lines, then at spaces."""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= chunk_size:
+            if paragraph:
+                yield paragraph
+            continue
+        for line in paragraph.splitlines():
+            line = line.strip()
+            while len(line) > chunk_size:
+                cut = line.rfind(" ", chunk_size // 2, chunk_size)
+                cut = cut if cut > 0 else chunk_size
+                yield line[:cut].strip()
+                line = line[cut:].strip()
+            if line:
+                yield line
+
+
+def chunk_text(text, chunk_size=KNOWLEDGE_CHUNK_SIZE):
+    """
+    Splits text into chunks of up to `chunk_size` characters along paragraph boundaries.
+    Boundaries are content-defined: a chunk ends after any paragraph whose hash picks it (about one
+    in two; never a short one such as a heading), not at fixed offsets, so an edit only changes the
+    chunks around it and the rest of the file still hashes the same.
+    """
+    chunks, current, size = [], [], 0
+    for piece in _pieces(text, chunk_size):
+        if current and size + len(piece) > chunk_size:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if len(piece) >= chunk_size // 10 and chunk_digest(piece)[0] in "01234567":
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def diff_chunks(known, chunks):
+    """
+    known: {chunk hash: row id} of the current version; chunks: texts of the new version.
+    Returns ([(hash, text)] to add, [row ids] to delete, number of chunks kept).
+    """
+    new = {}
+    for text in chunks:
+        new.setdefault(chunk_digest(text), text)
+    to_add = [(digest, text) for digest, text in new.items() if digest not in known]
+    to_delete = [row_id for digest, row_id in known.items() if digest not in new and row_id]
+    return to_add, to_delete, len(new) - len(to_add)
+
+
+class KnowledgeManifest:
+    """
+    SQLite record of what each knowledge table holds. Safe to share between threads (one connection per thread).
+
+    - `find_content(table_id, file_hash)` returns the file already holding these bytes, if any.
+    - `chunks(table_id, file_key)` returns {chunk hash: row id} for a file's current version;
+      `record(...)` replaces it after an embed.
+    - `lock(table_id, file_key)` serialises updates to one file within this process.
+    """
+
+    def __init__(self, db_path=KNOWLEDGE_MANIFEST_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.skipped = 0
+        self.chunks_added = 0
+        self.chunks_removed = 0
+        self.chunks_kept = 0
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS knowledge_files (
+                    table_id TEXT NOT NULL,
+                    file_key TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (table_id, file_key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_files_hash ON knowledge_files (table_id, file_hash)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS knowledge_chunks (
+                    table_id TEXT NOT NULL,
+                    file_key TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    row_id TEXT,
+                    PRIMARY KEY (table_id, file_key, chunk_hash)
+                )
+            """)
+
+    @contextmanager
+    def lock(self, table_id, file_key):
+        with self._locks_lock:
+            lock = self._locks.setdefault((table_id, file_key), threading.Lock())
+        with lock:
+            yield
+
+    def find_content(self, table_id, file_hash):
+        row = self._conn().execute(
+            "SELECT * FROM knowledge_files WHERE table_id = ? AND file_hash = ? LIMIT 1", (table_id, file_hash)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def chunks(self, table_id, file_key):
+        rows = self._conn().execute(
+            "SELECT chunk_hash, row_id FROM knowledge_chunks WHERE table_id = ? AND file_key = ?", (table_id, file_key)
+        ).fetchall()
+        return {row["chunk_hash"]: row["row_id"] for row in rows}
+
+    def record(self, table_id, file_key, file_hash, size, chunks):
+        """Stores a file's new version; `chunks` is {chunk hash: row id}."""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM knowledge_chunks WHERE table_id = ? AND file_key = ?", (table_id, file_key))
+            conn.executemany(
+                "INSERT INTO knowledge_chunks (table_id, file_key, chunk_hash, row_id) VALUES (?, ?, ?, ?)",
+                [(table_id, file_key, digest, row_id) for digest, row_id in chunks.items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO knowledge_files (table_id, file_key, file_hash, size, chunk_count, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (table_id, file_key, file_hash, size, len(chunks), datetime.now(timezone.utc).isoformat())
+            )
+
+    def forget(self, table_id, file_key=None):
+        """Drops a file (or a whole table) from the manifest, e.g. after its rows were deleted in JamAI."""
+        conn = self._conn()
+        where, params = ("table_id = ?", (table_id,)) if file_key is None else \
+            ("table_id = ? AND file_key = ?", (table_id, file_key))
+        with conn:
+            conn.execute(f"DELETE FROM knowledge_chunks WHERE {where}", params)
+            conn.execute(f"DELETE FROM knowledge_files WHERE {where}", params)
+
+    def stats(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*) AS files, COALESCE(SUM(chunk_count), 0) AS chunks FROM knowledge_files"
+        ).fetchone()
+        return {
+            "files": row["files"],
+            "chunks": row["chunks"],
+            "skipped_files": self.skipped,
+            "chunks_added": self.chunks_added,
+            "chunks_removed": self.chunks_removed,
+            "chunks_kept": self.chunks_kept,
+        }
@@ -0,0 +1,135 @@
+import base64
+import json
+import os
+import re
+
+# --- List Endpoint Parameters ---
+# Shared by the data endpoints (doctors, appointments, patient_history, dashboard) so they all take
+# the same query string and push it down into the Supabase query:
+#   fields=a,b,c          column projection (id is always included, it drives the cursor)
+#   limit=N               page size (at most API_MAX_LIMIT)
+#   cursor=...            next_cursor from the previous page (keyset pagination on id)
+# Without limit or cursor, every row is returned as before: the portal pages don't follow next_cursor.
+# With only a cursor, pages are API_DEFAULT_LIMIT rows.
+#   from=YYYY-MM-DD, to=YYYY-MM-DD   date range on the table's date column
+
+API_DEFAULT_LIMIT = int(os.getenv("API_DEFAULT_LIMIT", "500"))
+API_MAX_LIMIT = int(os.getenv("API_MAX_LIMIT", "1000"))
+
+_COLUMN_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps(last_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ListQuery:
+    """Parsed list parameters. `from_args` raises ValueError with a message fit for a 400 response."""
+
+    def __init__(self, fields=None, limit=None, after_id=None, date_from=None, date_to=None):
+        self.fields = fields
+        self.limit = limit
+        self.after_id = after_id
+        self.date_from = date_from
+        self.date_to = date_to
+
+    @classmethod
+    def from_args(cls, args):
+        fields = None
+        if args.get('fields'):
+            fields = [f.strip() for f in args.get('fields').split(',') if f.strip()]
+            bad = [f for f in fields if not _COLUMN_RE.match(f)]
+            if bad:
+                raise ValueError(f"Invalid field name: {bad[0]}")
+
+        limit = API_DEFAULT_LIMIT if args.get('cursor') else None
+        if args.get('limit'):
+            try:
+                limit = int(args.get('limit'))
+            except ValueError:
+                raise ValueError("limit must be an integer")
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+            limit = min(limit, API_MAX_LIMIT)
+
+        after_id = decode_cursor(args.get('cursor')) if args.get('cursor') else None
+
+        date_from, date_to = args.get('from'), args.get('to')
+        for value in (date_from, date_to):
+            if value and not _DATE_RE.match(value):
+                raise ValueError("Dates must be YYYY-MM-DD")
+
+        return cls(fields, limit, after_id, date_from or None, date_to or None)
+
+    def select(self):
+        """Column list for `.select()`."""
+        if not self.fields:
+            return "*"
+        return ", ".join(self.fields if "id" in self.fields else ["id"] + self.fields)
+
+    def apply(self, query, date_column=None, include_undated=False):
+        """
+        Adds the date range, cursor, ordering and limit to a Supabase select query (sync or async).
+        With `include_undated`, rows whose date is empty (recurring roster entries) also match.
+        """
+        if date_column and (self.date_from or self.date_to):
+            conditions = []
+            if self.date_from:
+                conditions.append(f"{date_column}.gte.{self.date_from}")
+            if self.date_to:
+                conditions.append(f"{date_column}.lte.{self.date_to}")
+            if include_undated:
+                in_range = conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})"
+                query = query.or_(f"{in_range},{date_column}.is.null")
+            else:
+                if self.date_from:
+                    query = query.gte(date_column, self.date_from)
+                if self.date_to:
+                    query = query.lte(date_column, self.date_to)
+
+        if self.after_id is not None:
+            query = query.gt('id', self.after_id)
+        query = query.order('id')
+        if self.limit is None:
+            return query
+        # One extra row tells us whether there is a next page
+        return query.limit(self.limit + 1)
+
+    def page(self, rows):
+        """Trims the extra row. Returns (rows, next_cursor)."""
+        rows = rows or []
+        if self.limit is None or len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        return rows, encode_cursor(rows[-1]['id'])
+
+    def page_in_memory(self, rows, date_column=None):
+        """Same parameters applied to rows already in memory (ordered by id). Returns (rows, next_cursor)."""
+        def sort_key(row):
+            return (str(type(row.get('id'))), row.get('id'))
+
+        selected = []
+        for row in sorted(rows, key=sort_key):
+            if self.after_id is not None and sort_key(row) <= sort_key({'id': self.after_id}):
+                continue
+            if date_column:
+                day = str(row.get(date_column) or '')[:10]
+                if (self.date_from and day < self.date_from) or (self.date_to and day > self.date_to):
+                    continue
+            selected.append(row)
+            if self.limit is not None and len(selected) > self.limit:
+                break
+
+        rows, next_cursor = self.page(selected)
+        if self.fields:
+            keep = set(self.fields) | {'id'}
+            rows = [{k: v for k, v in row.items() if k in keep} for row in rows]
+        return rows, next_cursor
@@ -0,0 +1,251 @@
+import bisect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from request_profiler import add_span
+
+# --- Request & Upstream Metrics (Prometheus text format) ---
+# A slow /api/chat can come from the context queries, the JamAI row add or the follow-up chat table
+# call; the DEBUG prints don't say which. These histograms time each route, each context stage, every
+# Supabase request (by table) and every JamAI request (by bot and table type), record prompt sizes and
+# count errors by type. GET /metrics serves them in the Prometheus text format.
+# No client library: a histogram is a lock, a bisect and two additions per observation.
+#   Supabase: the clients in auth.py are built with `httpx_client()`, whose hooks time each request.
+#   JamAI: `instrument_jamai(client, bot_type)` adds hooks to a pooled client (see jamai_pool.py).
+# Upstream times are measured to the response headers, so a streamed reply counts its first byte.
+# Supabase requests are also recorded as spans of the current request (see request_profiler.py).
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+_JAMAI_PATH_RE = re.compile(r"/v\d/gen_tables/([a-z]+)/([a-z_/]+)$")
+_SUPABASE_PATH_RE = re.compile(r"/(rest|auth|storage)/v1/([^/?]+)")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {value}" for key, value in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [count per bucket (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "clinic_http_request_duration_seconds", "Time to produce a response, by route.", ("route", "method", "status"))
+stage_seconds = registry.histogram(
+    "clinic_stage_duration_seconds", "Time spent in a stage of a chat turn.", ("stage",))
+supabase_request_seconds = registry.histogram(
+    "clinic_supabase_request_duration_seconds", "Supabase request time to response headers, by table.",
+    ("table", "method", "status"))
+jamai_request_seconds = registry.histogram(
+    "clinic_jamai_request_duration_seconds", "JamAI request time to response headers, by bot and table type.",
+    ("bot", "table_type", "operation", "status"))
+prompt_chars = registry.histogram(
+    "clinic_prompt_chars", "Characters sent to the bot per chat turn (message plus context).", ("bot",),
+    buckets=SIZE_BUCKETS)
+errors_total = registry.counter(
+    "clinic_errors_total", "Errors by where they happened and their type.", ("source", "type"))
+
+
+def count_error(source, error):
+    """`error`: an exception, or a short type name such as "http_500" or "timeout"."""
+    if METRICS_ENABLED:
+        errors_total.inc(source=source, type=error if isinstance(error, str) else error.__class__.__name__)
+
+
+def observe_stage(stage, seconds):
+    if METRICS_ENABLED:
+        stage_seconds.observe(seconds, stage=stage)
+
+
+def observe_prompt(bot_type, chars):
+    if METRICS_ENABLED:
+        prompt_chars.observe(chars, bot=bot_type)
+
+
+def render():
+    return registry.render()
+
+
+# --- Upstream hooks ---
+
+def _mark_start(request):
+    request.extensions["metrics_started"] = time.perf_counter()
+
+
+def _elapsed(request):
+    started = request.extensions.get("metrics_started")
+    return time.perf_counter() - started if started is not None else None
+
+
+def jamai_operation(path):
+    """(table type, operation) of a JamAI API path: '/api/v2/gen_tables/chat/rows/add' -> ('chat', 'rows/add')."""
+    match = _JAMAI_PATH_RE.search(path)
+    if match:
+        return match.group(1), match.group(2)
+    return "-", path.rstrip("/").rsplit("/", 1)[-1] or "-"
+
+
+def supabase_table(path):
+    """Table (or service) of a Supabase API path: '/rest/v1/Booking' -> 'Booking', '/auth/v1/token' -> 'auth/token'."""
+    match = _SUPABASE_PATH_RE.search(path)
+    if not match:
+        return "-"
+    return match.group(2) if match.group(1) == "rest" else f"{match.group(1)}/{match.group(2)}"
+
+
+def _observe_supabase(response):
+    elapsed = _elapsed(response.request)
+    if elapsed is None:
+        return
+    table = supabase_table(response.request.url.path)
+    supabase_request_seconds.observe(elapsed, table=table, method=response.request.method,
+                                     status=str(response.status_code))
+    # Runs in the caller's context, so the call also shows up in a traced request's profile
+    add_span("supabase", f"{response.request.method} {table}", elapsed)
+    if response.status_code >= 400:
+        count_error("supabase", f"http_{response.status_code}")
+
+
+def _observe_jamai(response, bot_type):
+    elapsed = _elapsed(response.request)
+    if elapsed is None:
+        return
+    table_type, operation = jamai_operation(response.request.url.path)
+    jamai_request_seconds.observe(elapsed, bot=bot_type, table_type=table_type, operation=operation,
+                                  status=str(response.status_code))
+    if response.status_code >= 400:
+        count_error("jamai", f"http_{response.status_code}")
+
+
+def httpx_client(timeout=120.0):
+    """An httpx.Client for supabase-py (ClientOptions(httpx_client=...)) that times every request."""
+    import httpx
+    hooks = {"request": [_mark_start], "response": [_observe_supabase]} if METRICS_ENABLED else {}
+    return httpx.Client(timeout=timeout, follow_redirects=True, event_hooks=hooks)
+
+
+def async_httpx_client(timeout=120.0):
+    """The httpx.AsyncClient equivalent, for acreate_client (AsyncClientOptions(httpx_client=...))."""
+    import httpx
+
+    async def on_request(request):
+        _mark_start(request)
+
+    async def on_response(response):
+        _observe_supabase(response)
+
+    hooks = {"request": [on_request], "response": [on_response]} if METRICS_ENABLED else {}
+    return httpx.AsyncClient(timeout=timeout, follow_redirects=True, event_hooks=hooks)
+
+
+def instrument_jamai(client, bot_type):
+    """Adds timing hooks to a JamAI / JamAIAsync client (both send through an httpx.AsyncClient)."""
+    http = getattr(client, "http_client", None)
+    if not METRICS_ENABLED or http is None or not hasattr(http, "event_hooks"):
+        return client
+
+    async def on_request(request):
+        _mark_start(request)
+
+    async def on_response(response):
+        _observe_jamai(response, bot_type)
+
+    hooks = http.event_hooks
+    hooks["request"].append(on_request)
+    hooks["response"].append(on_response)
+    http.event_hooks = hooks
+    return client
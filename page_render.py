@@ -0,0 +1,170 @@
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+
+from static_assets import compress, content_type_for
+
+# --- Server-Side Rendered Pages ---
+# The portal pages used to load, then fetch /api/config, then patch in the clinic name, banner, hero
+# and value props. Instead the server fills those values into the HTML before sending it, and adds
+# the config as `window.SITE_CONFIG` so page scripts can use it without the extra round-trip.
+# Rendered pages are cached (with their gzip/brotli variants) per page and config ETag; a config
+# save clears the cache, and a change made by another worker shows up as a new ETag.
+
+
+def _element(attribute):
+    """Matches a whole element whose opening tag contains `attribute`: groups open, inner, close."""
+    return re.compile(r'(?P<open><(?P<tag>\w+)\b[^>]*' + attribute + r'[^>]*>)(?P<inner>.*?)(?P<close></(?P=tag)>)', re.DOTALL)
+
+
+def _set_inner(page, pattern, inner):
+    return pattern.sub(lambda m: m.group("open") + inner + m.group("close"), page)
+
+
+def _by_id(element_id):
+    return _element(r'\bid="' + re.escape(element_id) + '"')
+
+
+_CLINIC_NAME_RE = _element(r'\bclass="[^"]*\bclinic-name-target\b[^"]*"')
+_TITLE_RE = re.compile(r"(<title>)(.*?)(</title>)", re.DOTALL)
+_BANNER_OPEN_RE = re.compile(r'<div id="announcement-banner" class="hidden ')
+_HEAD_CLOSE_RE = re.compile(r"</head>", re.IGNORECASE)
+
+DEFAULT_CLINIC_NAME = "ClinicConnect"
+
+
+def _text(value):
+    # Config values are saved as JSON, so a stat may be a number (e.g. 4.9) rather than a string
+    return html.escape(str(value))
+
+
+def _section(config, key):
+    value = config.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _headline(text):
+    # Same as main_page.html did in the browser: the last word keeps the gradient
+    words = str(text).split(" ")
+    if len(words) < 2:
+        return _text(text)
+    return (f'{_text(" ".join(words[:-1]))} '
+            f'<span class="bg-gradient-to-r from-blue-600 to-indigo-600 bg-clip-text text-transparent">{_text(words[-1])}</span>')
+
+
+def render(page, config):
+    """Returns `page` (HTML text) with the site config filled in. Only non-empty values replace the defaults."""
+    clinic_name = config.get("clinic_name")
+    if clinic_name:
+        name = _text(clinic_name)
+        page = _TITLE_RE.sub(lambda m: m.group(1) + m.group(2).replace(DEFAULT_CLINIC_NAME, name) + m.group(3), page, count=1)
+        page = _set_inner(page, _CLINIC_NAME_RE, name)
+        page = _set_inner(page, _by_id("sidebar-clinic-name"), name)
+
+    banner = _section(config, "banner")
+    if banner.get("active") and banner.get("text") and 'id="announcement-banner"' in page:
+        page = _BANNER_OPEN_RE.sub('<div id="announcement-banner" class="', page, count=1)
+        page = _set_inner(page, _by_id("announcement-text"), _text(banner["text"]))
+
+    hero = _section(config, "hero")
+    if hero.get("headline"):
+        page = _set_inner(page, _by_id("hero-headline"), _headline(hero["headline"]))
+    if hero.get("subheadline"):
+        page = _set_inner(page, _by_id("hero-subheadline"), _text(hero["subheadline"]))
+    stats = _section(hero, "stats")
+    for key in ("clinics", "patients", "rating"):
+        if stats.get(key):
+            page = _set_inner(page, _by_id(f"stat-{key}"), _text(stats[key]))
+
+    value_props = _section(config, "value_props")
+    for key in ("prop1", "prop2", "prop3"):
+        prop = _section(value_props, key)
+        for field in ("title", "desc"):
+            if prop.get(field):
+                page = _set_inner(page, _by_id(f"{key}-{field}"), _text(prop[field]))
+
+    # "</" inside a string would end the script element early
+    payload = json.dumps(config).replace("</", "<\\/")
+    script = f"<script>window.SITE_CONFIG = {payload};</script>\n"
+    return _HEAD_CLOSE_RE.sub(lambda m: script + m.group(0), page, count=1)
+
+
+class PageRenderer:
+    """
+    Renders HTML pages with the site config and caches the result.
+
+    - `site_config` is a SiteConfig; `static_assets` a StaticAssets. Pages come from the static build
+      when it is available (so fingerprinted URLs are kept), otherwise straight from `src_dir`.
+    - `get(name)` returns an entry in the StaticAssets format (variants, etag, content_type), ready for
+      `StaticAssets.respond`, or None if there is no such page.
+    """
+
+    def __init__(self, site_config, static_assets, src_dir="static"):
+        self.site_config = site_config
+        self.static_assets = static_assets
+        self.src_dir = src_dir
+        self._lock = threading.Lock()
+        self._cache = {}  # name -> (key, entry)
+        self.hits = 0
+        self.renders = 0
+
+    def _source(self, name):
+        """(page text, source key) or (None, None)."""
+        if self.static_assets.available:
+            entry = self.static_assets.lookup(name)
+            if entry is None:
+                return None, None
+            return entry["variants"]["identity"].decode("utf-8"), entry["etag"]
+        path = os.path.join(self.src_dir, name)
+        if os.path.dirname(os.path.normpath(name)) or not os.path.isfile(path):
+            return None, None
+        mtime = os.path.getmtime(path)
+        cached = self._cache.get(name)
+        if cached and cached[0][1] == mtime:
+            return None, mtime  # unchanged: the cached render is still good, no need to read the file
+        with open(path, encoding="utf-8") as f:
+            return f.read(), mtime
+
+    def get(self, name):
+        config, config_etag = self.site_config.get()
+        page, source_key = self._source(name)
+        if source_key is None:
+            return None
+        key = (config_etag, source_key)
+
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached and cached[0] == key:
+                self.hits += 1
+                return cached[1]
+
+        if page is None:
+            with open(os.path.join(self.src_dir, name), encoding="utf-8") as f:
+                page = f.read()
+        data = render(page, config).encode("utf-8")
+        variants = {"identity": data}
+        variants.update(compress(data))
+        entry = {
+            "source": name,
+            "etag": hashlib.sha256(data).hexdigest()[:20],
+            "immutable": False,
+            "variants": variants,
+            "content_type": content_type_for(name),
+        }
+        with self._lock:
+            self._cache[name] = (key, entry)
+            self.renders += 1
+        return entry
+
+    def invalidate(self):
+        """Drops every rendered page (call after saving the config)."""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'pages': len(self._cache), 'hits': self.hits, 'renders': self.renders,
+                    'config_version': self.site_config.version}
@@ -0,0 +1,193 @@
+import os
+import re
+from datetime import date, timedelta
+
+from availability import WEEKDAYS, parse_date, parse_minutes
+
+# --- Relevance-Filtered Prompt Context ---
+# The duty list and booking list are appended to every chat message. Sending every row ever recorded
+# makes prompts (and LLM latency) grow with the clinic's history, so instead:
+#   - the Supabase queries only fetch the next CONTEXT_WINDOW_DAYS days (plus recurring shifts) and
+#     only the columns we print;
+#   - rows about the dates and doctors the message mentions go first, then the rest by date;
+#   - rows are printed one per line, pipe-separated, until the bot's token budget is used up.
+# Token counts are estimated at CHARS_PER_TOKEN characters per token (close enough for English).
+
+CONTEXT_WINDOW_DAYS = int(os.getenv("CONTEXT_WINDOW_DAYS", "7"))
+CONTEXT_MAX_MENTIONED_DATES = int(os.getenv("CONTEXT_MAX_MENTIONED_DATES", "7"))
+CONTEXT_TOKEN_BUDGET = {
+    "Staff": int(os.getenv("CONTEXT_TOKEN_BUDGET_STAFF", "1200")),
+    "Public": int(os.getenv("CONTEXT_TOKEN_BUDGET_PUBLIC", "500")),
+    "Booking": int(os.getenv("CONTEXT_TOKEN_BUDGET_BOOKING", "800")),
+}
+CHARS_PER_TOKEN = 4
+
+DUTY_COLUMNS = "doctor_name, date, time_start, time_end"
+BOOKING_COLUMNS = "id, Date, appoinment_time, doctor_name, patient_name"
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+_SLASH_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+_DAY_MONTH_RE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(" + "|".join(MONTHS) + r")[a-z]*\b")
+_MONTH_DAY_RE = re.compile(r"\b(" + "|".join(MONTHS) + r")[a-z]*\s+(\d{1,2})(?:st|nd|rd|th)?\b")
+_WORD_RE = re.compile(r"[a-z]+")
+_NAME_NOISE_RE = re.compile(r"\(.*?\)|\bdr\b\.?|\bdoctor\b")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _safe_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(month, day, today):
+    """The next `day`/`month` on or after today (this year or next)."""
+    found = _safe_date(today.year, month, day)
+    if found and found < today:
+        found = _safe_date(today.year + 1, month, day)
+    return found
+
+
+def find_dates(message, today):
+    """Dates a message refers to: ISO or D/M[/Y] dates, '18 Oct', 'today', 'tomorrow', weekday names."""
+    text = message.lower()
+    found = set()
+    for y, m, d in _ISO_DATE_RE.findall(text):
+        found.add(_safe_date(int(y), int(m), int(d)))
+    for d, m, y in _SLASH_DATE_RE.findall(text):
+        if y:
+            year = int(y) + (2000 if len(y) == 2 else 0)
+            found.add(_safe_date(year, int(m), int(d)))
+        else:
+            found.add(_upcoming(int(m), int(d), today))
+    for d, month in _DAY_MONTH_RE.findall(text):
+        found.add(_upcoming(MONTHS.index(month) + 1, int(d), today))
+    for month, d in _MONTH_DAY_RE.findall(text):
+        found.add(_upcoming(MONTHS.index(month) + 1, int(d), today))
+
+    words = set(_WORD_RE.findall(text))
+    if "today" in words or "tonight" in words:
+        found.add(today)
+    if "tomorrow" in words:
+        found.add(today + timedelta(days=1))
+    for i, weekday in enumerate(WEEKDAYS):
+        if weekday in words:
+            found.add(today + timedelta(days=(i - today.weekday()) % 7))
+
+    found.discard(None)
+    return sorted(found)[:CONTEXT_MAX_MENTIONED_DATES]
+
+
+def _name_words(name):
+    return {word for word in _WORD_RE.findall(_NAME_NOISE_RE.sub(" ", name.lower())) if len(word) >= 3}
+
+
+def find_doctors(message, doctor_names):
+    """Doctor names (as stored) whose name words appear in the message ('Dr. Tan Wei Ming (GP)' matches 'tan')."""
+    words = set(_WORD_RE.findall(message.lower()))
+    return {name for name in doctor_names if name and _name_words(name) & words}
+
+
+class MessageFocus:
+    """What a message is about: the dates and doctors it mentions."""
+
+    def __init__(self, dates=(), doctors=()):
+        self.dates = set(dates)
+        self.doctors = set(doctors)
+        self.weekdays = {day.weekday() for day in self.dates}
+
+
+def _row_day(value):
+    """(date or None, weekday index or None) for a DutyList `date` / Booking `Date` value."""
+    text = str(value or "").strip()
+    if text.lower() in WEEKDAYS:
+        return None, WEEKDAYS.index(text.lower())
+    try:
+        return parse_date(text), None
+    except ValueError:
+        return None, None
+
+
+def _is_relevant(day, weekday, doctor, focus):
+    if doctor in focus.doctors:
+        return True
+    if day is not None:
+        return day in focus.dates
+    # Recurring shift: relevant to every mentioned date (daily) or to mentioned dates on its weekday
+    return bool(focus.dates) and (weekday is None or weekday in focus.weekdays)
+
+
+def _hhmm(value):
+    minutes = parse_minutes(value)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}" if minutes is not None else str(value or "?")
+
+
+def _label(day, weekday, value):
+    if day is not None:
+        return f"{day.isoformat()} {WEEKDAYS[day.weekday()][:3].title()}"
+    if weekday is not None:
+        return f"every {WEEKDAYS[weekday].title()}"
+    return "every day" if not str(value or "").strip() else str(value)
+
+
+def _ordered(rows, date_key, time_key, focus, today):
+    """Rows about the message first, then the rest; each group by date (recurring last) and time."""
+    keyed = []
+    for row in rows:
+        day, weekday = _row_day(row.get(date_key))
+        if day is not None and day < today:
+            continue
+        relevant = _is_relevant(day, weekday, row.get("doctor_name"), focus)
+        sort_day = day.isoformat() if day is not None else "9999"
+        keyed.append(((not relevant, sort_day, parse_minutes(row.get(time_key)) or 0), row, day, weekday))
+    keyed.sort(key=lambda item: item[0])
+    return [(row, day, weekday) for _, row, day, weekday in keyed]
+
+
+def _render(title, lines, budget_tokens):
+    """Header plus as many lines as fit in `budget_tokens`. Returns (text, tokens used)."""
+    if not lines:
+        return "", 0
+    header = f"\n\n--- {title} ---"
+    footer = "-" * (len(title) + 8) + "\n"
+    used = estimate_tokens(header) + estimate_tokens(footer)
+    kept = []
+    for line in lines:
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget_tokens:
+            break
+        kept.append(line)
+        used += cost
+    if not kept:
+        return "", 0
+    if len(kept) < len(lines):
+        kept.append(f"(+{len(lines) - len(kept)} more not shown)")
+    text = "\n".join([header] + kept + [footer])
+    return text, estimate_tokens(text)
+
+
+def render_duty_list(rows, focus, today, budget_tokens):
+    """Compact duty list context. Returns (text, tokens used)."""
+    lines = [
+        f"{row.get('doctor_name')} | {_label(day, weekday, row.get('date'))} | {_hhmm(row.get('time_start'))}-{_hhmm(row.get('time_end'))}"
+        for row, day, weekday in _ordered(rows, "date", "time_start", focus, today)
+    ]
+    return _render(f"CLINIC DUTY LIST (today is {today.isoformat()}; doctor | date | hours)", lines, budget_tokens)
+
+
+def render_booking_list(rows, focus, today, budget_tokens, include_patient=False):
+    """Compact upcoming bookings context. Returns (text, tokens used)."""
+    lines = []
+    for row, day, weekday in _ordered(rows, "Date", "appoinment_time", focus, today):
+        line = f"{_label(day, weekday, row.get('Date'))} | {row.get('appoinment_time')} | {row.get('doctor_name')}"
+        if include_patient:
+            line += f" | {row.get('patient_name')}"
+        lines.append(line)
+    columns = "date | time | doctor | patient" if include_patient else "date | time | doctor"
+    return _render(f"UPCOMING BOOKINGS ({columns})", lines, budget_tokens)
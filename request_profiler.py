@@ -0,0 +1,232 @@
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- Slow Request Profiles ---
+# Latency histograms (metrics.py) say that chat turns are slow, not why a particular one was. For the
+# routes in PROFILE_ROUTES every request collects wall-clock spans: each JamAI call (made in utils.py),
+# each Supabase request (timed by the httpx hooks in metrics.py) and each context stage. A sampled
+# fraction (PROFILE_SAMPLE_RATE) also runs under cProfile. When a request takes PROFILE_SLOW_MS or
+# longer, its record is written to PROFILE_DIR once the response has been sent:
+#   <time>-<route>-<ms>ms-<id>.json   route, status, duration, spans and totals per upstream, top functions
+#   <time>-<route>-<ms>ms-<id>.prof   the cProfile data, if sampled (python -m pstats <file>, or snakeviz)
+# Only the newest PROFILE_MAX_FILES records are kept. Spans may overlap: context providers run
+# concurrently and a context stage includes its Supabase queries.
+# Cost when not sampled: a few list appends per request. cProfile roughly doubles the CPU time of the
+# requests it samples, so keep PROFILE_SAMPLE_RATE low in production.
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "1") != "0"
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+# Route rules to trace, comma-separated ("*" for every route)
+PROFILE_ROUTES = [route.strip() for route in
+                  os.getenv("PROFILE_ROUTES", "/api/chat,/api/chat/stream,/api/history").split(",") if route.strip()]
+PROFILE_TOP_FUNCTIONS = 25
+
+_current = contextvars.ContextVar("request_trace", default=None)
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+
+
+class RequestTrace:
+    def __init__(self, route, method, path, profile=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.route = route
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.spans = []  # (kind, name, offset sec, duration sec); appended from worker threads too
+        self.profile = profile
+        self.meta = {}
+
+    def add_span(self, kind, name, seconds, ended=None):
+        ended = time.perf_counter() if ended is None else ended
+        self.spans.append((kind, name, ended - seconds - self.started, seconds))
+
+
+def current_trace():
+    return _current.get()
+
+
+def add_span(kind, name, seconds):
+    """Records an upstream call of `seconds` that just ended, if the current request is traced."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(kind, name, seconds)
+
+
+def annotate(**values):
+    """Adds fields (bot type, prompt size, ...) to the current request's record, if it is traced."""
+    trace = _current.get()
+    if trace is not None:
+        trace.meta.update(values)
+
+
+@contextmanager
+def span(kind, name):
+    """Times the block as a span of the current request (does nothing if it isn't traced)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(kind, name, time.perf_counter() - started)
+
+
+class RequestProfiler:
+    """
+    Traces requests to the configured routes and writes the slow ones to `directory`.
+
+    - `start(route, method, path, profile=True)` begins a trace in the current context (None if the
+      route isn't traced); `profile=False` never runs cProfile (used for the event loop in ASGI mode).
+    - `finish(trace, status)` ends it and writes the record if the request was slow.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, slow_ms=PROFILE_SLOW_MS, sample_rate=PROFILE_SAMPLE_RATE,
+                 max_files=PROFILE_MAX_FILES, routes=PROFILE_ROUTES, enabled=PROFILE_ENABLED):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.routes = set(routes)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.traced = 0
+        self.sampled = 0
+        self.profiler_busy = 0
+        self.written = 0
+
+    def traces(self, route):
+        return self.enabled and ("*" in self.routes or route in self.routes)
+
+    def start(self, route, method, path, profile=True):
+        if not self.traces(route):
+            return None
+        profiler = None
+        if profile and self.sample_rate > 0 and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process; this request only gets spans
+                profiler = None
+                with self._lock:
+                    self.profiler_busy += 1
+        trace = RequestTrace(route, method, path, profiler)
+        _current.set(trace)
+        with self._lock:
+            self.traced += 1
+            self.sampled += profiler is not None
+        return trace
+
+    def finish(self, trace, status=None):
+        """Ends `trace`; writes its record if it took at least `slow_ms`. Returns the record path or None."""
+        if trace is None:
+            return None
+        duration = time.perf_counter() - trace.started
+        if trace.profile is not None:
+            trace.profile.disable()
+        if _current.get() is trace:
+            _current.set(None)
+        if duration * 1000 < self.slow_ms:
+            return None
+        try:
+            return self._write(trace, status, duration)
+        except Exception as e:
+            print(f"DEBUG: Could not write request profile: {e}")
+            return None
+
+    def _write(self, trace, status, duration):
+        os.makedirs(self.directory, exist_ok=True)
+        route = _SLUG_RE.sub("_", trace.route).strip("_") or "root"
+        base = os.path.join(self.directory, f"{trace.started_at:%Y%m%d-%H%M%S.%f}-{route}-{duration * 1000:.0f}ms-{trace.id}")
+
+        by_kind = {}
+        for kind, _, _, seconds in trace.spans:
+            by_kind[kind] = by_kind.get(kind, 0.0) + seconds
+        record = {
+            "id": trace.id,
+            "route": trace.route,
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "started_at": trace.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 1),
+            "upstream_ms": {kind: round(seconds * 1000, 1) for kind, seconds in sorted(by_kind.items())},
+            "spans": [
+                {"kind": kind, "name": name, "start_ms": round(offset * 1000, 1), "ms": round(seconds * 1000, 1)}
+                for kind, name, offset, seconds in sorted(list(trace.spans), key=lambda s: s[2])
+            ],
+            "sampled": trace.profile is not None,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        record.update(trace.meta)
+        if trace.profile is not None:
+            trace.profile.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(trace.profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            record["top_functions"] = [line for line in out.getvalue().splitlines() if line.strip()]
+        with open(base + ".json", "w") as f:
+            json.dump(record, f, indent=1)
+        with self._lock:
+            self.written += 1
+        self._rotate()
+        print(f"DEBUG: Slow request {trace.method} {trace.route} took {record['duration_ms']} ms; profile in {base}.json")
+        return base + ".json"
+
+    def _rotate(self):
+        records = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in records[:max(0, len(records) - self.max_files)]:
+            for path in (name, name[:-5] + ".prof"):
+                try:
+                    os.unlink(os.path.join(self.directory, path))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, limit=20):
+        """Summaries of the newest records (without spans and functions)."""
+        if not os.path.isdir(self.directory):
+            return []
+        records = []
+        for name in sorted((n for n in os.listdir(self.directory) if n.endswith(".json")), reverse=True)[:limit]:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            records.append({key: record.get(key) for key in
+                            ("id", "route", "method", "status", "started_at", "duration_ms", "upstream_ms", "sampled")}
+                           | {"file": name})
+        return records
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "routes": sorted(self.routes),
+                "slow_ms": self.slow_ms,
+                "sample_rate": self.sample_rate,
+                "traced": self.traced,
+                "sampled": self.sampled,
+                "profiler_busy": self.profiler_busy,
+                "written": self.written,
+            }
+
+
+request_profiler = RequestProfiler()
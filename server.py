@@ -1,32 +1,109 @@
-from flask import Flask, request, jsonify, send_from_directory
-from utils import delete_table, create_new_chat_table, post_chat_table, get_jam_ai_response, get_chat_history, get_public_chat_history, embed_file_in_jamai, JAMAI_PROJECT_ID, JAMAI_KNOWLEDGE_TABLE_ID
+from flask import Flask, Request, Response, request, jsonify, send_from_directory, stream_with_context, g
+from utils import delete_table, create_new_chat_table, post_chat_table, get_jam_ai_response, stream_jam_ai_response, get_history_page, get_availability, find_earliest_slot, run_booking_batch, BOOKING_BATCH_MAX_OPERATIONS, upload_jobs, knowledge_manifest, BOT_CONFIG, invalidate_duty_list_context, invalidate_booking_context, invalidate_booking_context_for_rows, duty_list_cache, booking_context_cache, answer_cache, booking_stats, chat_table_pool, chat_table_reaper, jamai_clients, JAMAI_PROJECT_ID, JAMAI_KNOWLEDGE_TABLE_ID
 from auth import login_user, sign_up_user, supabase_staff
+from availability import parse_date, AVAILABILITY_MAX_DAYS
+from list_query import ListQuery
+from site_config import SiteConfig
+from static_assets import StaticAssets
+from bulk_ingest import expand_inputs, IngestLimitError
+from upload_jobs import INCOMING_PREFIX
+from page_render import PageRenderer
+from request_profiler import request_profiler
+import metrics
 import os
 import json
+import shutil
 import tempfile
+import uuid
+import time
 from datetime import datetime, timedelta
 
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Files posted to /api/upload are written straight into the upload directory as the form is
+        # parsed, in chunks, instead of being held in memory first
+        if self.path in ('/api/upload', '/api/upload/bulk'):
+            return upload_jobs.spool_file()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
 app = Flask(__name__, static_url_path='', static_folder='static')
+app.request_class = UploadRequest
 
 CONFIG_FILE = 'site_config.json'
 
+# Deletes per-session chat tables left behind by closed tabs (see chat_table_reaper.py)
+chat_table_reaper.start()
+
+# Pre-duplicated chat tables for new sessions (see chat_table_pool.py). `python server.py` runs the
+# debug reloader, which also executes this file in its watcher process; that one never serves requests.
+if not (__name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+    chat_table_pool.start()
+
+# Embeds uploaded knowledge files in the background (see upload_jobs.py)
+upload_jobs.start()
+
+# Route latency and errors for /metrics (see metrics.py), and profiles of slow requests (see request_profiler.py)
+@app.before_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.request_trace = request_profiler.start(request.url_rule.rule if request.url_rule else 'unmatched',
+                                             request.method, request.path)
+
+@app.after_request
+def observe_request(response):
+    trace = g.pop('request_trace', None)
+    if trace is not None:
+        # Finished once the body has been sent, so a streamed reply is profiled to its last chunk
+        status = response.status_code
+        response.call_on_close(lambda: request_profiler.finish(trace, status))
+    started = g.pop('metrics_started', None)
+    if started is not None and metrics.METRICS_ENABLED:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_request_seconds.observe(time.perf_counter() - started, route=route,
+                                             method=request.method, status=str(response.status_code))
+        if response.status_code >= 500:
+            metrics.count_error('http', f'http_{response.status_code}')
+    return response
+
+@app.teardown_request
+def count_request_exception(exc):
+    if exc is not None:
+        metrics.count_error('exception', exc)
+
+# Parsed once and kept in memory; re-read only when the file changes (see site_config.py)
+site_config = SiteConfig(CONFIG_FILE)
+
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {"banner": {"text": "", "active": False}, "clinic_info": {}}
+    """Current site config (shared, do not mutate)."""
+    return site_config.get()[0]
+
+# Precompressed, fingerprinted copy of static/ built by `python static_assets.py build`
+static_assets = StaticAssets()
 
-def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=4)
+# HTML pages are sent with the site config already filled in (see page_render.py)
+page_renderer = PageRenderer(site_config, static_assets)
+
+def send_static(path):
+    if path.endswith('.html'):
+        entry = page_renderer.get(path)
+    else:
+        entry = static_assets.lookup(path) if static_assets.available else None
+    if entry is None:
+        return send_from_directory('static', path)
+    return static_assets.respond(entry, request, Response)
 
 @app.route('/')
 def root():
-    return send_from_directory('static', 'main_page.html')
+    return send_static('main_page.html')
 
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('static', path)
+    return send_static(path)
+
+# Flask's own static route (static_url_path='') matches before serve_static, so route it the same way
+@app.endpoint('static')
+def static_file(filename):
+    return send_static(filename)
 
 @app.route('/api/login', methods=['POST'])
 def login_endpoint():
@@ -93,37 +170,79 @@ def chat_endpoint():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/history', methods=['POST'])
-def history_endpoint():
-    # Changed from request.args.get('sessionId') to POST body
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream_endpoint():
+    # Same request body as /api/chat, but the reply is sent as Server-Sent Events:
+    #   data: {"token": "..."}                 while the reply is generated
+    #   data: {"done": true, "response": "..."} once, with the same text /api/chat would return
+    #   data: {"error": "..."}                  if the JamAI call fails
     data = request.json
-    current_session = data.get("session") 
-
-    if not current_session:
-        # Fallback to GET param for backward compatibility if needed, or just error
-        session_id = request.args.get('sessionId')
-        if session_id:
-             # Legacy fetch
-             try:
-                history = get_chat_history(session_id)
-                return jsonify({'history': history})
-             except Exception as e:
-                return jsonify({'error': str(e)}), 500
+    user_message = data.get('message')
+    table_id = data.get('table_id')
+    context = data.get('context', 'General Knowledge')
+    user_email = data.get('userEmail')
+
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    session_id = data.get('sessionId', 'flask_session')
+
+    def generate():
+        for event in stream_jam_ai_response(user_message, context, session_id=session_id, user_email=user_email, table_id=table_id):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/history', methods=['GET', 'POST'])
+def history_endpoint():
+    # Session from the POST body ({"session": {...}}) or the query string (?sessionId= / ?table_id=).
+    # Incremental: pass the last next_cursor as `cursor` (or a timestamp as `since`) to get only newer
+    # messages, and `limit` to page. Send If-None-Match with the last ETag to get 304 when nothing changed.
+    data = request.get_json(silent=True) or {}
+    current_session = data.get("session") or {}
+    params = {**request.args.to_dict(), **data}
+
+    table_id = current_session.get('table_id') or request.args.get('table_id')
+    session_id = current_session.get('id') or request.args.get('sessionId')
+    if not table_id and not session_id:
         return jsonify({'error': 'Session is required'}), 400
 
     try:
-        table_id = current_session.get('table_id')
-        session_id = current_session.get('id')
-        
-        if table_id:
-            history = get_public_chat_history(table_id)
-        else:
-            history = get_chat_history(session_id)
-            
-        return jsonify({'history': history})
+        limit = int(params['limit']) if params.get('limit') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        page = get_history_page(
+            session_id=session_id,
+            table_id=table_id,
+            cursor=params.get('cursor'),
+            since=params.get('since'),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    etag = page['etag']
+    if etag and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'history': page['history'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
+        })
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route("/api/newChatTable", methods=["POST"])
 def new_chat_table_endpoint():
     data = request.json
@@ -162,29 +281,77 @@ def delete_chat_endpoint():
     except Exception as e:
         return jsonify({"error": f"Exception occurred: {str(e)}"}), 500
 
+@app.route('/api/health/jamai', methods=['GET'])
+def jamai_health_endpoint():
+    # Health-checks the idle pooled JamAI clients and reports pool usage per bot
+    try:
+        return jsonify({'success': True, 'bots': jamai_clients.health_check()})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Route, stage, Supabase and JamAI latency histograms, prompt sizes and error counts (Prometheus text format)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiles', methods=['GET'])
+def profiles_endpoint():
+    # Profiler settings and counters, and the newest slow request records (full records are in PROFILE_DIR)
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit must be an integer'}), 400
+    return jsonify({'success': True, 'profiler': request_profiler.stats(), 'recent': request_profiler.recent(limit)})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats_endpoint():
+    # Hit/miss counters for the prompt context and answer caches, and the pre-warmed chat table pool
+    return jsonify({
+        'success': True,
+        'duty_list': duty_list_cache.stats(),
+        'booking_context': booking_context_cache.stats(),
+        'chat_table_pool': chat_table_pool.stats(),
+        'public_answers': answer_cache.stats(),
+        'dashboard': booking_stats.stats(),
+        'rendered_pages': page_renderer.stats(),
+        'knowledge_manifest': knowledge_manifest.stats()
+    })
+
+@app.route('/api/chat_tables/reaper', methods=['GET', 'POST'])
+def chat_table_reaper_endpoint():
+    # GET: how many idle chat tables have been reclaimed so far. POST: run a reap pass now.
+    if request.method == 'POST':
+        try:
+            return jsonify({'success': True, 'run': chat_table_reaper.reap_once(), 'reaper': chat_table_reaper.stats()})
+        except Exception as e:
+            return jsonify({'success': False, 'message': str(e)}), 500
+    return jsonify({'success': True, 'reaper': chat_table_reaper.stats()})
+
 @app.route('/api/config', methods=['GET', 'POST'])
 def config_endpoint():
     if request.method == 'GET':
-        return jsonify(load_config())
+        config, etag = site_config.get()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = jsonify(config)
+        response.set_etag(etag)
+        # Cached by the browser, but revalidated (cheaply, via If-None-Match) on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     
     elif request.method == 'POST':
-        new_config = request.json
-        current_config = load_config()
+        new_config = request.get_json(silent=True) or {}
         
         # Update only provided keys
-        if 'clinic_name' in new_config:
-            current_config['clinic_name'] = new_config['clinic_name']
-        if 'banner' in new_config:
-            current_config['banner'] = new_config['banner']
-        if 'clinic_info' in new_config:
-            current_config['clinic_info'] = new_config['clinic_info']
-        if 'hero' in new_config:
-            current_config['hero'] = new_config['hero']
-        if 'value_props' in new_config:
-            current_config['value_props'] = new_config['value_props']
+        allowed = ('clinic_name', 'banner', 'clinic_info', 'hero', 'value_props')
+        changes = {key: new_config[key] for key in allowed if key in new_config}
             
-        save_config(current_config)
-        return jsonify({'success': True, 'config': current_config})
+        current_config, etag = site_config.update(changes)
+        page_renderer.invalidate()
+        response = jsonify({'success': True, 'config': current_config})
+        response.set_etag(etag)
+        return response
 
 @app.route('/api/bookings', methods=['GET'])
 def get_bookings_endpoint():
@@ -204,6 +371,58 @@ def get_bookings_endpoint():
         print(f"Fetch Bookings Error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _availability_range():
+    """Reads start/end (YYYY-MM-DD, end defaults to start) from the query string. Returns (start, end, error)."""
+    try:
+        start = parse_date(request.args.get('start') or datetime.now().strftime('%Y-%m-%d'))
+        end = parse_date(request.args.get('end')) if request.args.get('end') else None
+    except ValueError:
+        return None, None, 'Dates must be YYYY-MM-DD'
+    if end is None:
+        end = start
+    if end < start:
+        return None, None, 'end must not be before start'
+    if (end - start).days + 1 > AVAILABILITY_MAX_DAYS:
+        return None, None, f'Date range is limited to {AVAILABILITY_MAX_DAYS} days'
+    return start, end, None
+
+@app.route('/api/availability', methods=['GET'])
+def availability_endpoint():
+    # Free slots per doctor per day: ?start=YYYY-MM-DD&end=YYYY-MM-DD[&doctor=<doctor_name>]
+    if not supabase_staff:
+        return jsonify({'success': False, 'message': 'Database not configured'}), 500
+    start, end, error = _availability_range()
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+    try:
+        availability = get_availability(start, end, request.args.get('doctor'))
+        return jsonify({'success': True, 'availability': availability})
+    except Exception as e:
+        print(f"Availability Error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/availability/earliest', methods=['GET'])
+def earliest_slot_endpoint():
+    # Earliest free slot from ?start= (default today) within ?end= (default start + AVAILABILITY_MAX_DAYS - 1)
+    if not supabase_staff:
+        return jsonify({'success': False, 'message': 'Database not configured'}), 500
+    if not request.args.get('end'):
+        try:
+            start = parse_date(request.args.get('start') or datetime.now().strftime('%Y-%m-%d'))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+        end = start + timedelta(days=AVAILABILITY_MAX_DAYS - 1)
+    else:
+        start, end, error = _availability_range()
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
+    try:
+        earliest = find_earliest_slot(start, end, request.args.get('doctor'))
+        return jsonify({'success': True, 'earliest': earliest})
+    except Exception as e:
+        print(f"Availability Error: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/book', methods=['POST'])
 def book_endpoint():
     data = request.json
@@ -229,6 +448,8 @@ def book_endpoint():
         # Try to insert
         if supabase_staff:
             response = supabase_staff.table('Booking').insert(booking_data).execute()
+            invalidate_booking_context(patient_email)
+            booking_stats.record_upserted(response.data)
             return jsonify({'success': True, 'data': response.data})
         else:
             return jsonify({'success': False, 'message': 'Database not configured'}), 500
@@ -239,39 +460,120 @@ def book_endpoint():
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    
-    file = request.files['file']
-    bot_type = request.form.get('botType', 'Public') # Default to Public
-    
-    if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
-        
-    if file:
-        try:
-            # Create a temporary file to save the uploaded content
-            # We need to preserve the extension for JamAI to know the file type
-            suffix = os.path.splitext(file.filename)[1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-                
-            # Embed the file
-            # Note: You might want to use different tables for staff vs patient if needed
-            # We use the 'Uploaded' Knowledge Table for file storage
-            response = embed_file_in_jamai(tmp_path, bot_type=bot_type)
-            
-            # Clean up the temp file
-            os.unlink(tmp_path)
-            
-            return jsonify({'success': True, 'message': f'File {file.filename} uploaded and embedded successfully.'})
-            
-        except Exception as e:
-            # Clean up if something fails
-            if 'tmp_path' in locals() and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            return jsonify({'error': str(e)}), 500
+    """
+    Queues a file for embedding into the bot's knowledge table and returns 202 with the job id
+    right away; poll GET /api/upload/<job_id> for the outcome (see upload_jobs.py).
+    Takes multipart form data ('file', 'botType'), or the raw file as the request body with
+    Content-Type: application/octet-stream and ?filename=...&botType=...
+    """
+    bot_type = request.args.get('botType') or request.form.get('botType', 'Public') # Default to Public
+    if not BOT_CONFIG.get(bot_type, {}).get('knowledge_table_id'):
+        _discard_spooled_uploads()
+        return jsonify({'error': f'No knowledge table configured for bot_type: {bot_type}'}), 400
+
+    try:
+        if request.mimetype == 'application/octet-stream':
+            filename = request.args.get('filename') or request.headers.get('X-Filename', '')
+            if not filename:
+                return jsonify({'error': 'filename is required'}), 400
+            # Body goes to disk chunk by chunk, never whole into memory
+            path = upload_jobs.save_stream(request.stream)
+        else:
+            if 'file' not in request.files:
+                _discard_spooled_uploads()
+                return jsonify({'error': 'No file part'}), 400
+            file = request.files['file']
+            filename = file.filename
+            if filename == '':
+                _discard_spooled_uploads()
+                return jsonify({'error': 'No selected file'}), 400
+            # Already written to the upload directory while the form was parsed (UploadRequest)
+            file.stream.close()
+            path = file.stream.name
+            _discard_spooled_uploads(keep=file)
+
+        job_id = upload_jobs.enqueue(path, filename, bot_type)
+    except Exception as e:
+        _discard_spooled_uploads()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/upload/{job_id}',
+        'message': f'File {filename} received and queued for embedding.'
+    }), 202
+
+def _discard_spooled_uploads(keep=None):
+    for _, storage in request.files.items(multi=True):
+        path = getattr(storage.stream, 'name', None)
+        if storage is not keep and isinstance(path, str) and os.path.exists(path):
+            storage.stream.close()
+            os.unlink(path)
+
+@app.route('/api/upload/bulk', methods=['POST'])
+def bulk_upload():
+    """
+    Queues many files at once for one bot's knowledge table: every 'files' (or 'file') part of a
+    multipart form, with .zip/.tar archives expanded into the documents they contain. Returns 202
+    with a batch_id; GET /api/upload/batch/<batch_id> reports progress.
+    """
+    bot_type = request.form.get('botType', 'Public')
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    if not BOT_CONFIG.get(bot_type, {}).get('knowledge_table_id'):
+        _discard_spooled_uploads()
+        return jsonify({'error': f'No knowledge table configured for bot_type: {bot_type}'}), 400
+    if not uploads:
+        return jsonify({'error': 'No files'}), 400
+
+    batch_id = uuid.uuid4().hex
+    workdir = tempfile.mkdtemp(dir=upload_jobs.upload_dir, prefix=INCOMING_PREFIX)
+    try:
+        # Spooled parts have random names; give each its upload name so archives and types are recognised
+        inputs = []
+        for i, storage in enumerate(uploads):
+            storage.stream.close()
+            named = os.path.join(workdir, str(i), os.path.basename(storage.filename or f'file{i}'))
+            os.makedirs(os.path.dirname(named))
+            os.replace(storage.stream.name, named)
+            inputs.append(named)
+
+        # Archive size and entry limits are checked as they are read, before anything is extracted past them
+        files, skipped = expand_inputs(inputs, workdir)
+        if not files:
+            return jsonify({'error': 'No supported documents', 'skipped': skipped}), 400
+
+        jobs = [upload_jobs.enqueue(path, name, bot_type, batch_id=batch_id) for path, name in files]
+    except IngestLimitError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        _discard_spooled_uploads()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return jsonify({
+        'success': True,
+        'batch_id': batch_id,
+        'queued': len(jobs),
+        'skipped': skipped,
+        'status_url': f'/api/upload/batch/{batch_id}'
+    }), 202
+
+@app.route('/api/upload/batch/<batch_id>', methods=['GET'])
+def bulk_upload_status(batch_id):
+    batch = upload_jobs.batch(batch_id)
+    if batch is None:
+        return jsonify({'success': False, 'message': 'Unknown upload batch'}), 404
+    return jsonify({'success': True, 'batch': batch})
+
+@app.route('/api/upload/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Unknown upload job'}), 404
+    return jsonify({'success': True, 'job': job})
 
 @app.route('/api/doctors', methods=['GET', 'POST'])
 def doctors_endpoint():
@@ -279,8 +581,15 @@ def doctors_endpoint():
         if not supabase_staff:
             return jsonify({'success': False, 'message': 'Database not configured'}), 500
         try:
-            response = supabase_staff.table('DutyList').select("*").execute()
-            return jsonify({'success': True, 'doctors': response.data})
+            list_query = ListQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        try:
+            # from/to limit the roster to shifts in that range (undated, recurring shifts always match)
+            query = supabase_staff.table('DutyList').select(list_query.select())
+            response = list_query.apply(query, date_column='date', include_undated=True).execute()
+            doctors, next_cursor = list_query.page(response.data)
+            return jsonify({'success': True, 'doctors': doctors, 'next_cursor': next_cursor})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -313,6 +622,8 @@ def doctors_endpoint():
             
             if supabase_staff:
                 response = supabase_staff.table('DutyList').insert(new_doctor).execute()
+                # New roster entry: make the chat bots pick it up on their next turn
+                invalidate_duty_list_context()
                 return jsonify({'success': True, 'data': response.data})
             else:
                 return jsonify({'success': False, 'message': 'Database not configured'}), 500
@@ -326,34 +637,16 @@ def dashboard_endpoint():
         return jsonify({'success': False, 'message': 'Database not configured'}), 500
     
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
-        
-        # 1. Fetch Today's Appointments
-        # We need full details for the list
-        response_today = supabase_staff.table('Booking').select("*").eq('Date', today).execute()
-        today_appointments = response_today.data
-        
-        # 2. Calculate Stats
-        
-        # Stat: Today's Appointments Count
-        count_today = len(today_appointments)
-        
-        # Stat: Patients This Week
-        # Calculate start of week (Monday)
-        dt_today = datetime.now()
-        start_of_week = (dt_today - timedelta(days=dt_today.weekday())).strftime('%Y-%m-%d')
-        end_of_week = (dt_today + timedelta(days=6-dt_today.weekday())).strftime('%Y-%m-%d')
-        
-        # Fetch bookings for this week to count unique patients
-        # Note: Supabase 'gte' and 'lte' for date range
-        response_week = supabase_staff.table('Booking').select("patient_name").gte('Date', start_of_week).lte('Date', end_of_week).execute()
-        
-        unique_patients = set()
-        for booking in response_week.data:
-            if booking.get('patient_name'):
-                unique_patients.add(booking['patient_name'])
-        
-        count_patients_week = len(unique_patients)
+        list_query = ListQuery.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    try:
+        # Today's appointments and this week's distinct patients are kept up to date in memory
+        # as bookings are written (see booking_stats.py), so this does not query the database.
+        # fields/limit/cursor apply to today's appointment list.
+        snapshot = booking_stats.snapshot()
+        appointments, next_cursor = list_query.page_in_memory(snapshot['appointments'])
         
         # Stat: Average Wait Time (Mocked for now as we don't have arrival times)
         # In a real app, you'd diff 'arrival_time' and 'appointment_time'
@@ -362,11 +655,12 @@ def dashboard_endpoint():
         return jsonify({
             'success': True,
             'stats': {
-                'todayAppointments': count_today,
-                'patientsThisWeek': count_patients_week,
+                'todayAppointments': snapshot['todayAppointments'],
+                'patientsThisWeek': snapshot['patientsThisWeek'],
                 'avgWaitTime': avg_wait_time
             },
-            'appointments': today_appointments
+            'appointments': appointments,
+            'next_cursor': next_cursor
         })
 
     except Exception as e:
@@ -379,13 +673,22 @@ def appointments_endpoint():
         return jsonify({'success': False, 'message': 'Database not configured'}), 500
 
     if request.method == 'GET':
+        # Either a single ?date= or a ?from=&to= range
         date = request.args.get('date')
-        if not date:
+        if not date and not (request.args.get('from') or request.args.get('to')):
             return jsonify({'success': False, 'message': 'Date is required'}), 400
+        try:
+            list_query = ListQuery.from_args(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         try:
-            response = supabase_staff.table('Booking').select("*").eq('Date', date).execute()
-            return jsonify({'success': True, 'appointments': response.data})
+            query = supabase_staff.table('Booking').select(list_query.select())
+            if date:
+                query = query.eq('Date', date)
+            response = list_query.apply(query, date_column='Date').execute()
+            appointments, next_cursor = list_query.page(response.data)
+            return jsonify({'success': True, 'appointments': appointments, 'next_cursor': next_cursor})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -408,6 +711,9 @@ def appointments_endpoint():
                 
                 response = supabase_staff.table('Booking').delete().eq('doctor_name', doctor_name).eq('Date', date).eq('appoinment_time', time).execute()
             
+            # Deleted rows come back in response.data, so we know whose context to drop
+            invalidate_booking_context_for_rows(response.data)
+            booking_stats.record_deleted(response.data)
             return jsonify({'success': True, 'data': response.data})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
@@ -427,10 +733,34 @@ def appointments_endpoint():
                 'appoinment_time': new_time
             }).eq('id', booking_id).execute()
             
+            invalidate_booking_context_for_rows(response.data)
+            booking_stats.record_upserted(response.data)
             return jsonify({'success': True, 'data': response.data})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/appointments/batch', methods=['POST'])
+def appointments_batch_endpoint():
+    # {"operations": [{"op": "create" | "update" | "delete", ...}, ...]}, see run_booking_batch
+    if not supabase_staff:
+        return jsonify({'success': False, 'message': 'Database not configured'}), 500
+
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'success': False, 'message': 'operations must be a non-empty list'}), 400
+    if len(operations) > BOOKING_BATCH_MAX_OPERATIONS:
+        return jsonify({'success': False, 'message': f'At most {BOOKING_BATCH_MAX_OPERATIONS} operations per batch'}), 400
+
+    results = run_booking_batch(operations)
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': succeeded == len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
+
 @app.route('/api/patient_history', methods=['GET'])
 def patient_history_endpoint():
     email = request.args.get('email')
@@ -440,11 +770,18 @@ def patient_history_endpoint():
     if not supabase_staff:
         return jsonify({'success': False, 'message': 'Database not configured'}), 500
 
+    try:
+        list_query = ListQuery.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
     try:
         # Fetch bookings for the specific patient
         # Assuming 'patient_name' column stores the email as per book_endpoint logic
-        response = supabase_staff.table('Booking').select("*").eq('patient_name', email).execute()
-        return jsonify({'success': True, 'appointments': response.data})
+        query = supabase_staff.table('Booking').select(list_query.select()).eq('patient_name', email)
+        response = list_query.apply(query, date_column='Date').execute()
+        appointments, next_cursor = list_query.page(response.data)
+        return jsonify({'success': True, 'appointments': appointments, 'next_cursor': next_cursor})
     except Exception as e:
         print(f"Patient History Error: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
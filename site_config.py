@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, writes are still atomic renames
+    fcntl = None
+
+# --- Site Configuration ---
+# site_config.json is read on every landing page view. Keep it in memory and only re-parse it when
+# the file changes on disk (another worker saved it, or it was edited by hand). Writes go to a temp
+# file that is renamed over the original, so readers never see a half-written file, and a lock
+# file serialises read-modify-write between workers.
+
+CONFIG_STAT_INTERVAL_SEC = float(os.getenv("CONFIG_STAT_INTERVAL_SEC", "1"))
+
+DEFAULT_CONFIG = {"banner": {"text": "", "active": False}, "clinic_info": {}}
+
+
+class SiteConfig:
+    """
+    Cached view of a JSON config file.
+
+    - `get()` returns (config, etag); the file is stat()ed at most every `stat_interval_sec`
+      and re-parsed only when its mtime or size changed.
+    - `update(changes)` merges top-level keys into the latest config on disk and writes it atomically.
+    - `version` increases every time a different config is loaded or written.
+    """
+
+    def __init__(self, path, stat_interval_sec=CONFIG_STAT_INTERVAL_SEC):
+        self.path = path
+        self.stat_interval_sec = stat_interval_sec
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._config = None
+        self._etag = None
+        self._signature = None  # (mtime_ns, size) of the file we parsed
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _etag_for(config):
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:20]
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _set(self, config, signature):
+        etag = self._etag_for(config)
+        if etag != self._etag:
+            self.version += 1
+        self._config, self._etag, self._signature = config, etag, signature
+        self._checked_at = time.monotonic()
+
+    def _read_file(self):
+        signature = self._stat()
+        if signature is None:
+            return json.loads(json.dumps(DEFAULT_CONFIG)), None
+        with open(self.path, 'r') as f:
+            return json.load(f), signature
+
+    def get(self):
+        with self._lock:
+            if self._config is not None and time.monotonic() - self._checked_at < self.stat_interval_sec:
+                return self._config, self._etag
+            signature = self._stat()
+            if self._config is None or signature != self._signature:
+                config, signature = self._read_file()
+                self._set(config, signature)
+            else:
+                self._checked_at = time.monotonic()
+            return self._config, self._etag
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_atomic(self, config):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".site_config.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file as 0600; keep the mode the config file had
+            try:
+                mode = stat.S_IMODE(os.stat(self.path).st_mode)
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def update(self, changes):
+        """Applies `changes` (top-level keys) to the current config on disk. Returns (config, etag)."""
+        with self._lock, self._file_lock():
+            # Re-read under the lock: another worker may have saved since we last looked
+            config, _ = self._read_file()
+            config.update(changes)
+            self._write_atomic(config)
+            self._set(config, self._stat())
+            return self._config, self._etag
@@ -0,0 +1,224 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+# --- Static Asset Pipeline ---
+# Build step:  python static_assets.py build
+#   Copies static/ to static_dist/, renames CSS, JS and images to content-hashed names
+#   (syncure_logo.png -> syncure_logo.1a2b3c4d.png), rewrites references to them in HTML/CSS, and
+#   writes .gz and .br variants next to every compressible file, plus manifest.json.
+# Serving: StaticAssets loads static_dist/ into memory and answers each request with the best
+#   encoding the browser accepts. Fingerprinted files never change, so they are cached for a year
+#   (immutable); HTML keeps its name and is revalidated with an ETag on every load.
+# If static_dist/ is missing or older than static/, the server keeps serving static/ directly.
+
+STATIC_DIR = "static"
+STATIC_DIST_DIR = os.getenv("STATIC_DIST_DIR", "static_dist")
+HTML_MAX_AGE_SEC = int(os.getenv("HTML_MAX_AGE_SEC", "0"))
+
+FINGERPRINT_EXTENSIONS = {".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".woff", ".woff2"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".ico"}
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# src="x", href='x' and CSS url(x) pointing at local files
+_REFERENCE_RE = re.compile(r"""(?P<prefix>(?:src|href)\s*=\s*["']|url\(\s*["']?)(?P<path>[^"')\s?#]+)""")
+
+
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def compress(data):
+    """{encoding: bytes} for gzip and (if installed) brotli, keeping only variants that save at least 10%."""
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: compressed for encoding, compressed in variants.items() if len(compressed) < len(data) * 0.9}
+
+
+def content_type_for(name):
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _source_mtime(src_dir):
+    return max((os.path.getmtime(os.path.join(src_dir, name)) for name in os.listdir(src_dir)), default=0)
+
+
+def _rewrite_references(text, fingerprinted):
+    def replace(match):
+        path = match.group("path")
+        if "://" in path or path.startswith("//"):
+            return match.group(0)
+        name = path.lstrip("./").lstrip("/")
+        if name not in fingerprinted:
+            return match.group(0)
+        new = path[:len(path) - len(name)] + fingerprinted[name]
+        return match.group("prefix") + new
+    return _REFERENCE_RE.sub(replace, text)
+
+
+def build(src_dir=STATIC_DIR, dist_dir=STATIC_DIST_DIR):
+    """Builds the fingerprinted, precompressed copy of `src_dir`. Returns the manifest."""
+    names = sorted(
+        name for name in os.listdir(src_dir)
+        if os.path.isfile(os.path.join(src_dir, name)) and not name.startswith(".")
+    )
+    contents = {}
+    for name in names:
+        with open(os.path.join(src_dir, name), "rb") as f:
+            contents[name] = f.read()
+
+    # CSS may reference images, so fingerprint images first, then CSS/JS with rewritten references
+    fingerprinted = {}
+    ordered = sorted(
+        (name for name in names if os.path.splitext(name)[1].lower() in FINGERPRINT_EXTENSIONS),
+        key=lambda name: os.path.splitext(name)[1].lower() in (".css", ".js")
+    )
+    for name in ordered:
+        base, ext = os.path.splitext(name)
+        if ext.lower() in (".css", ".js"):
+            contents[name] = _rewrite_references(contents[name].decode("utf-8"), fingerprinted).encode("utf-8")
+        fingerprinted[name] = f"{base}.{_hash(contents[name])[:8]}{ext}"
+
+    for name in names:
+        if name.endswith(".html"):
+            contents[name] = _rewrite_references(contents[name].decode("utf-8"), fingerprinted).encode("utf-8")
+
+    tmp_dir = dist_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    files = {}
+    for name in names:
+        out_name = fingerprinted.get(name, name)
+        data = contents[name]
+        with open(os.path.join(tmp_dir, out_name), "wb") as f:
+            f.write(data)
+        encodings = []
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            for encoding, compressed in compress(data).items():
+                with open(os.path.join(tmp_dir, out_name + ENCODING_SUFFIXES[encoding]), "wb") as f:
+                    f.write(compressed)
+                encodings.append(encoding)
+        files[out_name] = {"source": name, "etag": _hash(data)[:20], "encodings": encodings,
+                           "immutable": name in fingerprinted}
+
+    manifest = {"source_mtime": _source_mtime(src_dir), "assets": fingerprinted, "files": files}
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished build in, so a running server never sees a half-built directory
+    old_dir = dist_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(dist_dir):
+        os.rename(dist_dir, old_dir)
+    os.rename(tmp_dir, dist_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def _encoding_preferences(accept_encoding):
+    """Encodings the client accepts, from Accept-Encoding, ignoring q=0."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """In-memory view of a static_dist/ build. `available` is False when there is no usable build."""
+
+    def __init__(self, dist_dir=STATIC_DIST_DIR, src_dir=STATIC_DIR):
+        self.dist_dir = dist_dir
+        self.src_dir = src_dir
+        self.files = {}
+        self.assets = {}
+        self.available = False
+        self.load()
+
+    def load(self):
+        manifest_path = os.path.join(self.dist_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            print(f"DEBUG: No static build in '{self.dist_dir}', serving '{self.src_dir}' as is (run: python static_assets.py build).")
+            return
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if os.path.isdir(self.src_dir) and _source_mtime(self.src_dir) > manifest["source_mtime"]:
+            print(f"DEBUG: Static build in '{self.dist_dir}' is older than '{self.src_dir}', serving '{self.src_dir}' as is.")
+            return
+
+        files = {}
+        for name, meta in manifest["files"].items():
+            variants = {}
+            for encoding, suffix in [("identity", "")] + [(e, ENCODING_SUFFIXES[e]) for e in meta["encodings"]]:
+                with open(os.path.join(self.dist_dir, name + suffix), "rb") as f:
+                    variants[encoding] = f.read()
+            files[name] = dict(meta, variants=variants, content_type=content_type_for(name))
+
+        self.files = files
+        self.assets = manifest["assets"]
+        self.available = True
+        print(f"DEBUG: Serving {len(files)} static files from '{self.dist_dir}'.")
+
+    def url_for(self, name):
+        """Fingerprinted name of an asset, or the name itself if it isn't fingerprinted."""
+        return self.assets.get(name, name)
+
+    def lookup(self, path):
+        """The build entry for a request path, or None. Old (unhashed) names of fingerprinted files still work."""
+        path = path.lstrip("/")
+        return self.files.get(path) or self.files.get(self.assets.get(path, ""))
+
+    def respond(self, entry, request, response_class):
+        """Builds the response for `entry`, honouring If-None-Match and Accept-Encoding."""
+        immutable = entry["immutable"] and request.path.lstrip("/") != entry["source"]
+        if immutable:
+            cache_control = IMMUTABLE_CACHE
+        elif HTML_MAX_AGE_SEC:
+            cache_control = f"public, max-age={HTML_MAX_AGE_SEC}, must-revalidate"
+        else:
+            cache_control = "no-cache"
+
+        headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        accepted = _encoding_preferences(request.headers.get("Accept-Encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in entry["variants"]), "identity")
+        # Each encoding is a different byte stream, so it gets its own ETag
+        etag = entry["etag"] if encoding == "identity" else f"{entry['etag']}-{encoding}"
+
+        if request.if_none_match.contains(etag):
+            response = response_class(status=304, headers=headers)
+        else:
+            response = response_class(entry["variants"][encoding], headers=headers, content_type=entry["content_type"])
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        return response
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python static_assets.py build")
+        sys.exit(1)
+    manifest = build()
+    before = sum(os.path.getsize(os.path.join(STATIC_DIR, m["source"])) for m in manifest["files"].values())
+    print(f"Built {len(manifest['files'])} files into {STATIC_DIST_DIR}/ ({len(manifest['assets'])} fingerprinted, "
+          f"brotli {'on' if brotli else 'off: pip install brotli'}), {before / 1024:.0f} KB of sources.")
@@ -0,0 +1,332 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# --- Knowledge Upload Jobs ---
+# Embedding a large PDF in JamAI can take minutes, so /api/upload no longer does it in the request.
+# The upload is written to UPLOAD_DIR in chunks, a job row is added to a SQLite queue, and the
+# request returns right away with the job id. Background workers (UPLOAD_WORKERS per process) claim
+# queued jobs, embed the file, and record the outcome; GET /api/upload/<job_id> reports it.
+# The queue lives on disk, so jobs survive a restart. While a worker embeds a file it refreshes the
+# job's heartbeat every UPLOAD_JOB_HEARTBEAT_SEC; a job left "running" by a process that died stops
+# getting heartbeats and is queued again once the last one is older than UPLOAD_JOB_STALE_SEC (a long
+# embed in a live process is never taken over). Failed jobs are retried with a growing delay, up to
+# UPLOAD_JOB_MAX_ATTEMPTS times.
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_JOBS_DB_PATH = os.getenv("UPLOAD_JOBS_DB_PATH", "upload_jobs.db")
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_JOB_MAX_ATTEMPTS = int(os.getenv("UPLOAD_JOB_MAX_ATTEMPTS", "3"))
+UPLOAD_JOB_STALE_SEC = float(os.getenv("UPLOAD_JOB_STALE_SEC", "1800"))
+UPLOAD_JOB_HEARTBEAT_SEC = float(os.getenv("UPLOAD_JOB_HEARTBEAT_SEC", "30"))
+UPLOAD_JOB_RETENTION_SEC = float(os.getenv("UPLOAD_JOB_RETENTION_SEC", str(7 * 86400)))
+UPLOAD_POLL_INTERVAL_SEC = float(os.getenv("UPLOAD_POLL_INTERVAL_SEC", "2"))
+
+RETRY_BASE_DELAY_SEC = 5
+INCOMING_PREFIX = ".incoming-"
+
+JOB_FIELDS = ("id", "batch_id", "bot_type", "filename", "size", "status", "attempts", "error",
+              "created_at", "started_at", "finished_at")
+
+
+def _now():
+    return time.time()
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat() if timestamp else None
+
+
+class UploadJobQueue:
+    """
+    Persistent queue of files to embed into a knowledge table.
+
+    - `process(path, bot_type, filename)` does the work for one job; an exception fails (or retries) the job.
+    - `spool_file()` / `save_stream(stream)` write an upload into `upload_dir`;
+      `enqueue(path, filename, bot_type)` takes ownership of the file and returns the job id.
+    - `start()` runs `workers` background threads; `get(job_id)` returns a job's status and
+      `batch(batch_id)` the progress of jobs enqueued together.
+    """
+
+    def __init__(self, process, db_path=UPLOAD_JOBS_DB_PATH, upload_dir=UPLOAD_DIR, workers=UPLOAD_WORKERS,
+                 max_attempts=UPLOAD_JOB_MAX_ATTEMPTS, stale_sec=UPLOAD_JOB_STALE_SEC,
+                 retention_sec=UPLOAD_JOB_RETENTION_SEC, poll_interval_sec=UPLOAD_POLL_INTERVAL_SEC,
+                 heartbeat_sec=UPLOAD_JOB_HEARTBEAT_SEC):
+        self.process = process
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.stale_sec = stale_sec
+        self.retention_sec = retention_sec
+        self.poll_interval_sec = poll_interval_sec
+        # Several heartbeats per stale period, so one slow write doesn't get a live job requeued
+        self.heartbeat_sec = min(heartbeat_sec, stale_sec / 3)
+
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._started_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+        os.makedirs(upload_dir, exist_ok=True)
+        self._init_schema()
+
+    # --- Storage ---
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS upload_jobs (
+                id TEXT PRIMARY KEY,
+                bot_type TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                available_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(upload_jobs)")}
+        if "batch_id" not in columns:
+            # Added for bulk uploads; older databases get the column on first start
+            conn.execute("ALTER TABLE upload_jobs ADD COLUMN batch_id TEXT")
+        if "heartbeat_at" not in columns:
+            conn.execute("ALTER TABLE upload_jobs ADD COLUMN heartbeat_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_queue ON upload_jobs (status, available_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_batch ON upload_jobs (batch_id)")
+
+    # --- Receiving uploads ---
+
+    def spool_file(self):
+        """An open binary file in the upload directory for an incoming upload (see `enqueue`)."""
+        return tempfile.NamedTemporaryFile(dir=self.upload_dir, prefix=INCOMING_PREFIX, delete=False)
+
+    def save_stream(self, stream, chunk_size=UPLOAD_CHUNK_SIZE):
+        """Copies a request body to the upload directory chunk by chunk. Returns the path."""
+        with self.spool_file() as f:
+            try:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            except Exception:
+                f.close()
+                os.unlink(f.name)
+                raise
+            return f.name
+
+    def enqueue(self, path, filename, bot_type, batch_id=None):
+        """Moves the spooled file at `path` into place and queues it (as part of `batch_id`). Returns the job id."""
+        job_id = uuid.uuid4().hex
+        # Keep the extension: JamAI uses it to tell the file type
+        final_path = os.path.join(self.upload_dir, job_id + os.path.splitext(filename)[1].lower())
+        os.replace(path, final_path)
+        now = _now()
+        self._conn().execute(
+            "INSERT INTO upload_jobs (id, batch_id, bot_type, filename, path, size, status, available_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, batch_id, bot_type, filename, final_path, os.path.getsize(final_path), now, now)
+        )
+        self._wake.set()
+        return job_id
+
+    # --- Status ---
+
+    def get(self, job_id):
+        """The job as a dict (timestamps in ISO format, plus its place in the queue), or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM upload_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {field: row[field] for field in JOB_FIELDS}
+        for field in ("created_at", "started_at", "finished_at"):
+            job[field] = _iso(job[field])
+        if row["status"] == "queued":
+            job["queue_position"] = conn.execute(
+                "SELECT COUNT(*) FROM upload_jobs WHERE status = 'queued' AND created_at <= ?", (row["created_at"],)
+            ).fetchone()[0]
+        return job
+
+    def batch(self, batch_id):
+        """Progress of a bulk upload: counts per status, bytes done and each job's outcome. None if unknown."""
+        rows = self._conn().execute(
+            "SELECT * FROM upload_jobs WHERE batch_id = ? ORDER BY created_at, filename", (batch_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+        finished = [row for row in rows if row["status"] in ("done", "failed")]
+        started = min((row["started_at"] for row in rows if row["started_at"]), default=None)
+        ended = max((row["finished_at"] for row in finished), default=None)
+        elapsed = (ended or _now()) - started if started else 0
+        return {
+            "batch_id": batch_id,
+            "bot_type": rows[0]["bot_type"],
+            "total": len(rows),
+            "counts": counts,
+            "complete": len(finished) == len(rows),
+            "percent": round(100 * len(finished) / len(rows), 1),
+            "bytes_total": sum(row["size"] for row in rows),
+            "bytes_done": sum(row["size"] for row in rows if row["status"] == "done"),
+            "files_per_sec": round(counts["done"] / elapsed, 2) if elapsed else None,
+            "jobs": [{"id": row["id"], "filename": row["filename"], "status": row["status"], "error": row["error"]}
+                     for row in rows],
+        }
+
+    def stats(self):
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM upload_jobs GROUP BY status").fetchall())
+        return {"jobs": counts, "workers": self.workers, "processed": self.processed, "failed": self.failed}
+
+    # --- Workers ---
+
+    def _claim(self):
+        """Marks the oldest runnable job as running and returns it, or None."""
+        conn = self._conn()
+        now = _now()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM upload_jobs WHERE status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at, created_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE upload_jobs SET status = 'running', started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ?", (now, now, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, row, error=None):
+        conn = self._conn()
+        attempts = row["attempts"] + 1
+        if error is None:
+            conn.execute("UPDATE upload_jobs SET status = 'done', error = NULL, finished_at = ? WHERE id = ?",
+                         (_now(), row["id"]))
+        elif attempts < self.max_attempts:
+            delay = RETRY_BASE_DELAY_SEC * 2 ** (attempts - 1)
+            conn.execute("UPDATE upload_jobs SET status = 'queued', error = ?, available_at = ? WHERE id = ?",
+                         (error, _now() + delay, row["id"]))
+            return
+        else:
+            conn.execute("UPDATE upload_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                         (error, _now(), row["id"]))
+        if os.path.exists(row["path"]):
+            os.unlink(row["path"])
+
+    def _heartbeat(self, job_id, done):
+        """Refreshes the job's heartbeat until `done` is set, so recover() knows it is still being worked on."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            while not done.wait(self.heartbeat_sec):
+                try:
+                    conn.execute("UPDATE upload_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                                 (_now(), job_id))
+                except Exception as e:
+                    print(f"DEBUG: Upload job {job_id}: heartbeat failed: {e}")
+        finally:
+            conn.close()
+
+    def run_one(self):
+        """Processes one queued job if there is one. Returns True if a job was processed."""
+        row = self._claim()
+        if row is None:
+            return False
+        print(f"DEBUG: Upload job {row['id']}: embedding '{row['filename']}' for {row['bot_type']} (attempt {row['attempts'] + 1})")
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(row["id"], done), name=f"upload-heartbeat-{row['id'][:8]}",
+                         daemon=True).start()
+        try:
+            self.process(row["path"], row["bot_type"], row["filename"])
+        except Exception as e:
+            print(f"DEBUG: Upload job {row['id']} failed: {e}")
+            self.failed += 1
+            self._finish(row, error=str(e) or e.__class__.__name__)
+            return True
+        finally:
+            done.set()
+        self.processed += 1
+        self._finish(row)
+        return True
+
+    def recover(self):
+        """Requeues jobs abandoned by a dead process and drops old finished jobs and stray spool files."""
+        conn = self._conn()
+        now = _now()
+        # Jobs from before heartbeats were recorded only have started_at
+        requeued = conn.execute(
+            "UPDATE upload_jobs SET status = 'queued', available_at = ? "
+            "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+            (now, now - self.stale_sec)
+        ).rowcount
+        conn.execute("DELETE FROM upload_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                     (now - self.retention_sec,))
+        for name in os.listdir(self.upload_dir):
+            path = os.path.join(self.upload_dir, name)
+            if name.startswith(INCOMING_PREFIX) and os.path.getmtime(path) < now - self.stale_sec:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)  # bulk upload work dir
+                else:
+                    os.unlink(path)
+        if requeued:
+            print(f"DEBUG: Requeued {requeued} upload job(s) left running by a stopped process.")
+        return requeued
+
+    def _worker(self):
+        last_recover = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_recover > min(self.stale_sec, 600):
+                    self.recover()
+                    last_recover = time.monotonic()
+                if self.run_one():
+                    continue
+            except Exception as e:
+                print(f"DEBUG: Upload worker error: {e}")
+            # Nothing to do: sleep until an upload arrives (or poll, for jobs queued by other processes)
+            self._wake.wait(self.poll_interval_sec)
+            self._wake.clear()
+
+    def start(self):
+        """Starts the worker threads (once). UPLOAD_WORKERS=0 leaves jobs for another process."""
+        with self._started_lock:
+            if self._threads or self.workers <= 0:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"upload-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
@@ -2,10 +2,32 @@ import streamlit as st
 import requests
 from jamaibase import JamAI, protocol
 from auth import supabase_staff
+from jamai_pool import JamAIClientRegistry
+from jamai_pager import list_table_rows
+from chat_table_pool import ChatTablePool, CHAT_TABLE_POOL_PREWARM
+from chat_table_reaper import ChatTableReaper
+from history_store import HistoryStore
+from availability import AvailabilityEngine, parse_date, parse_minutes
+from booking_stats import BookingStats
+from prompt_context import CONTEXT_WINDOW_DAYS, CONTEXT_TOKEN_BUDGET, DUTY_COLUMNS, BOOKING_COLUMNS, MessageFocus, find_dates, find_doctors, render_duty_list, render_booking_list
+from answer_cache import AnswerCache
+import metrics
+from request_profiler import span, add_span, annotate
+from upload_jobs import UploadJobQueue
+from bulk_ingest import BotRateLimiter
+from knowledge_manifest import KnowledgeManifest, TEXT_EXTENSIONS, chunk_digest, chunk_text, diff_chunks, file_digest
+from context_cache import VersionedCache, KeyedCache, DUTY_LIST_CACHE_TTL_SEC, BOOKING_CACHE_TTL_SEC, BOOKING_CACHE_MAX_ENTRIES
 import os
 import tempfile
 import json, uuid
+import hashlib
 import re
+import time
+import threading
+import asyncio
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
 
 # --- Configuration & Mock JAM AI Integration ---
@@ -54,67 +76,259 @@ BOT_CONFIG = {
 # jamai_client = JamAI(token=JAMAI_API_KEY, project_id=JAMAI_PROJECT_ID) 
 jamai_client = None # Force error if used globally
 
-def get_duty_list_context():
-    """Fetches and formats the duty list from Supabase."""
-    if not supabase_staff:
-        return ""
-    try:
-        response = supabase_staff.table('DutyList').select("*").execute()
-        if not response.data:
-            return ""
-        
-        context = "\n\n--- CURRENT CLINIC DUTY LIST ---\n"
-        for row in response.data:
-            # Format each row as a readable string
-            # e.g. {'doctor_name': 'Dr. Smith', 'day': 'Monday'} -> "doctor_name: Dr. Smith, day: Monday"
-            row_str = ", ".join([f"{k}: {v}" for k, v in row.items()])
-            context += f"- {row_str}\n"
-        context += "--------------------------------\n"
-        return context
-    except Exception as e:
-        print(f"Error fetching duty list: {e}")
-        return ""
+# One long-lived, shared client per bot. Use `with jamai_clients.client("Public") as client:`
+# instead of building a new JamAI(...) per call, so connections are kept alive between turns.
+jamai_clients = JamAIClientRegistry(BOT_CONFIG)
+
+def _rows_digest(rows):
+    """Short content hash of a list of rows, used to tag cached answers with the data they saw."""
+    return hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+def _duty_in_range(start, end):
+    """
+    PostgREST `or` filter for the DutyList rows that can fall in [start, end]: shifts dated in the range
+    plus the recurring ones, whose `date` is a weekday name (every weekday name ends in "day", no
+    YYYY-MM-DD date does) or empty / null (every day). See availability.ShiftIndex.
+    """
+    return f'and(date.gte.{start.isoformat()},date.lte.{end.isoformat()}),date.ilike.*day*,date.is.null,date.eq.""'
+
+def _load_duty_window():
+    """(today, rows, digest): DutyList rows for the context window (plus recurring shifts), only the printed columns."""
+    today = datetime.now().date()
+    end = today + timedelta(days=CONTEXT_WINDOW_DAYS)
+    response = supabase_staff.table('DutyList').select(DUTY_COLUMNS).or_(_duty_in_range(today, end)).execute()
+    rows = response.data or []
+    return today, rows, _rows_digest(rows)
+
+# The roster changes a few times a day but is read on every message, so keep the window's rows
+# in memory. Writes to DutyList must call invalidate_duty_list_context().
+duty_list_cache = VersionedCache(_load_duty_window, DUTY_LIST_CACHE_TTL_SEC, name="duty list context")
+
+def invalidate_duty_list_context():
+    """Bumps the duty list version so the next chat turn sees the new roster."""
+    return duty_list_cache.bump()
+
+def _outside_window(dates, today):
+    end = today + timedelta(days=CONTEXT_WINDOW_DAYS)
+    return [day.isoformat() for day in dates if day < today or day > end]
+
+# The day the duty list cache was last invalidated for moving on to, so it is bumped once per day
+_duty_window_day = None
+_duty_window_lock = threading.Lock()
+
+def _roll_duty_window(today):
+    global _duty_window_day
+    with _duty_window_lock:
+        if _duty_window_day == today:
+            return
+        _duty_window_day = today
+    duty_list_cache.bump()
+
+def _duty_rows_versioned(today, dates=()):
+    """Cached window rows, plus rows for mentioned dates outside the window: (rows, digest). Raises on failure."""
+    loaded_for, rows, digest = duty_list_cache.get()
+    if loaded_for != today:
+        # The window moved on at midnight
+        _roll_duty_window(today)
+        loaded_for, rows, digest = duty_list_cache.get()
+    if loaded_for != today:
+        # Another caller is still loading the new window; don't answer from yesterday's
+        try:
+            loaded_for, rows, digest = _load_duty_window()
+        except Exception as e:
+            print(f"DEBUG: Loading today's duty list failed, using the previous day's window: {e}")
+    extra_dates = _outside_window(dates, today)
+    if extra_dates:
+        extra = supabase_staff.table('DutyList').select(DUTY_COLUMNS).in_('date', extra_dates).execute().data or []
+        rows, digest = rows + extra, f"{digest}+{_rows_digest(extra)}"
+    return rows, digest
+
+def _load_booking_rows(role, user_email, today):
+    """Upcoming Booking rows for a view, only the printed columns. Raises on failure."""
+    query = supabase_staff.table('Booking').select(BOOKING_COLUMNS)
+
+    # Filter for upcoming bookings (today onwards)
+    query = query.gte('Date', today)
+
+    if role == "Public":
+        # Filter by patient email/name: a patient's own upcoming bookings are few, send them all
+        # Note: The column is 'patient_name' but we store email there in book_endpoint
+        query = query.eq('patient_name', user_email)
+    else:
+        # Staff see the whole clinic, so only the next few days
+        end = (datetime.strptime(today, '%Y-%m-%d') + timedelta(days=CONTEXT_WINDOW_DAYS)).strftime('%Y-%m-%d')
+        query = query.lte('Date', end)
+
+    return query.execute().data or []
+
+# Booking rows per view: one shared ("Staff",) entry and one ("Public", email) entry per
+# patient. The query date is part of the key so entries roll over at midnight.
+# Writes to Booking must call invalidate_booking_context() with the affected patient(s).
+booking_context_cache = KeyedCache(BOOKING_CACHE_TTL_SEC, BOOKING_CACHE_MAX_ENTRIES, name="booking context")
+
+def _booking_cache_key(role, user_email, today):
+    if role == "Staff":
+        return ("Staff", today)
+    return (role, user_email, today)
 
-def get_booking_list_context(role="Public", user_email=None):
-    """Fetches and formats the booking list from Supabase."""
+def invalidate_booking_context(*patient_emails):
+    """Drops the Staff view and the Public view of each given patient from the booking context cache."""
+    emails = {email for email in patient_emails if email}
+    return booking_context_cache.invalidate(
+        lambda key: key[0] == "Staff" or key[1] in emails
+    )
+
+def invalidate_booking_context_for_rows(rows):
+    """Invalidates the booking context for the patients of the given Booking rows (e.g. response.data)."""
+    return invalidate_booking_context(*[row.get('patient_name') for row in rows or []])
+
+def _booking_rows(role, user_email, today, dates=()):
+    """Cached rows for the view, plus (Staff) rows for mentioned dates past the window. Raises on failure."""
+    if role == "Public" and not user_email:
+        # If public and no email, return nothing to avoid leaking info
+        return []
+    rows = booking_context_cache.get(
+        _booking_cache_key(role, user_email, today.isoformat()),
+        lambda: _load_booking_rows(role, user_email, today.isoformat())
+    )
+    extra_dates = _outside_window(dates, today) if role == "Staff" else []
+    if extra_dates:
+        rows = rows + (supabase_staff.table('Booking').select(BOOKING_COLUMNS).in_('Date', extra_dates).execute().data or [])
+    return rows
+
+# --- Concurrent Context Gathering ---
+# Context providers are independent Supabase reads, so we run them side by side on a small
+# shared pool. A provider that misses its deadline is left out of the prompt rather than
+# stalling the turn (its thread finishes in the background and still fills the cache).
+CONTEXT_MAX_WORKERS = int(os.getenv("CONTEXT_MAX_WORKERS", "8"))
+CONTEXT_PROVIDER_TIMEOUT_SEC = float(os.getenv("CONTEXT_PROVIDER_TIMEOUT_SEC", "3"))
+context_executor = ThreadPoolExecutor(max_workers=CONTEXT_MAX_WORKERS, thread_name_prefix="context")
+
+def _timed_provider(provider):
+    start = time.perf_counter()
+    result = provider()
+    return result, time.perf_counter() - start
+
+def gather_prompt_context(providers, timeout=CONTEXT_PROVIDER_TIMEOUT_SEC):
+    """
+    Runs context providers concurrently.
+    providers: list of (name, callable) pairs.
+    Returns (results, timings): a dict of name -> result for the providers that finished in time
+    (failed or timed out ones are left out) and a dict of name -> seconds taken, or "timeout" / "error".
+    """
+    started = time.perf_counter()
+    # Each provider runs in a copy of this context, so its Supabase calls are traced with the request
+    futures = [(name, context_executor.submit(contextvars.copy_context().run, _timed_provider, provider))
+               for name, provider in providers]
+
+    results = {}
+    timings = {}
+    for name, future in futures:
+        remaining = max(0.0, timeout - (time.perf_counter() - started))
+        try:
+            result, elapsed = future.result(timeout=remaining)
+        except FuturesTimeoutError:
+            print(f"DEBUG: Context provider '{name}' missed its {timeout}s deadline, skipping it.")
+            timings[name] = "timeout"
+            metrics.count_error(f"context_{name}", "timeout")
+            continue
+        except Exception as e:
+            print(f"DEBUG: Context provider '{name}' failed: {e}")
+            timings[name] = "error"
+            metrics.count_error(f"context_{name}", e)
+            continue
+        timings[name] = round(elapsed, 4)
+        results[name] = result
+        metrics.observe_stage(f"context_{name}", elapsed)
+        add_span("context", name, elapsed)
+
+    timings["total"] = round(time.perf_counter() - started, 4)
+    metrics.observe_stage("context_total", timings["total"])
+    print(f"DEBUG: Context timings (s): {timings}")
+    return results, timings
+
+def _prompt_context(user_message, user_role, user_email=None, bot_type=None):
+    """
+    The duty list and booking list context relevant to the user's message, within the bot's token
+    budget (the bookings get up to half of it; the duty list gets the rest).
+    Returns (context text, data tag): the tag identifies the data the context was built from, for
+    the answer cache, and is None if part of the context could not be loaded.
+    """
+    bot_type = bot_type or ("Staff" if user_role == "Staff" else "Public")
+    today = datetime.now().date()
     if not supabase_staff:
-        return ""
-    try:
-        # Fetch bookings
-        # For Staff: Fetch all upcoming bookings
-        # For Public: Fetch only their bookings if email is provided
-        
-        query = supabase_staff.table('Booking').select("*")
-        
-        # Filter for upcoming bookings (today onwards)
-        today = datetime.now().strftime('%Y-%m-%d')
-        query = query.gte('Date', today)
-        
-        if role == "Public" and user_email:
-            # Filter by patient email/name
-            # Note: The column is 'patient_name' but we store email there in book_endpoint
-            query = query.eq('patient_name', user_email)
-        elif role == "Public" and not user_email:
-            # If public and no email, return nothing to avoid leaking info
-            return ""
-            
-        response = query.execute()
-        
-        if not response.data:
-            return ""
-        
-        context = "\n\n--- UPCOMING BOOKINGS ---\n"
-        for row in response.data:
-            # Format: Date: YYYY-MM-DD, Time: HH:MM, Doctor: Name, Patient: Name (if staff)
-            row_str = f"Date: {row.get('Date')}, Time: {row.get('appoinment_time')}, Doctor: {row.get('doctor_name')}"
-            if role == "Staff":
-                row_str += f", Patient: {row.get('patient_name')}"
-            context += f"- {row_str}\n"
-        context += "-------------------------\n"
-        return context
-    except Exception as e:
-        print(f"Error fetching booking list: {e}")
-        return ""
+        metrics.observe_prompt(bot_type, len(user_message))
+        return "", (today.isoformat(),)
+    budget = CONTEXT_TOKEN_BUDGET.get(bot_type, CONTEXT_TOKEN_BUDGET["Public"])
+    dates = find_dates(user_message, today)
+
+    rows, _ = gather_prompt_context([
+        ("duty_list", lambda: _duty_rows_versioned(today, dates)),
+        ("booking_list", lambda: _booking_rows(user_role, user_email, today, dates)),
+    ])
+    duty_rows, duty_digest = rows.get("duty_list") or ([], None)
+    booking_rows = rows.get("booking_list") or []
+    doctor_names = {row.get('doctor_name') for row in duty_rows + booking_rows}
+    focus = MessageFocus(dates, find_doctors(user_message, doctor_names))
+
+    booking_text, booking_tokens = render_booking_list(
+        booking_rows, focus, today, budget // 2, include_patient=(user_role == "Staff"))
+    duty_text, duty_tokens = render_duty_list(duty_rows, focus, today, budget - booking_tokens)
+    print(f"DEBUG: Prompt context for {bot_type}: {duty_tokens + booking_tokens}/{budget} tokens "
+          f"({len(duty_rows)} duty rows, {len(booking_rows)} bookings, focus: {sorted(map(str, focus.dates))} {sorted(focus.doctors)})")
+
+    tag = None
+    if "duty_list" in rows and "booking_list" in rows:
+        # Answers that used the patient's own bookings are theirs alone, and change with them
+        personal = (user_email, _rows_digest(booking_rows)) if booking_text else None
+        tag = (today.isoformat(), duty_digest, tuple(sorted(focus.dates)), tuple(sorted(focus.doctors)), personal)
+    metrics.observe_prompt(bot_type, len(user_message) + len(duty_text) + len(booking_text))
+    annotate(bot=bot_type, prompt_chars=len(user_message) + len(duty_text) + len(booking_text),
+             context_tokens=duty_tokens + booking_tokens)
+    return duty_text + booking_text, tag
+
+def build_full_message(user_message, user_role, user_email=None, bot_type=None):
+    """Appends the duty list and booking list context relevant to the user's message."""
+    return user_message + _prompt_context(user_message, user_role, user_email, bot_type)[0]
+
+# --- Dashboard Aggregates ---
+
+def _load_week_bookings(start, end):
+    return supabase_staff.table('Booking').select("*").gte('Date', start).lte('Date', end).execute().data
+
+# Kept up to date by every Booking write below and in server.py; reconciled periodically
+booking_stats = BookingStats(_load_week_bookings)
+
+# --- Availability ---
+
+def _availability_engine(start, end, doctor=None):
+    """Loads the shifts and the bookings in [start, end] (concurrently) into an AvailabilityEngine."""
+    def load_duty():
+        # Shifts dated in the range, plus the weekly and daily (recurring) ones
+        query = supabase_staff.table('DutyList').select("doctor_name, date, time_start, time_end") \
+            .or_(_duty_in_range(start, end))
+        if doctor:
+            query = query.eq('doctor_name', doctor)
+        return query.execute().data or []
+
+    def load_bookings():
+        query = supabase_staff.table('Booking').select("doctor_name, Date, appoinment_time") \
+            .gte('Date', start.isoformat()).lte('Date', end.isoformat())
+        if doctor:
+            query = query.eq('doctor_name', doctor)
+        return query.execute().data or []
+
+    duty_future = context_executor.submit(contextvars.copy_context().run, load_duty)
+    booking_rows = load_bookings()
+    return AvailabilityEngine(duty_future.result(), booking_rows)
+
+def get_availability(start, end, doctor=None):
+    """Free slots per doctor per day in [start, end] (dates). Raises on database errors."""
+    return _availability_engine(start, end, doctor).range(start, end, doctor)
+
+def find_earliest_slot(start, end, doctor=None):
+    """Earliest free {date, time, doctor_name} in [start, end], or None. Raises on database errors."""
+    return _availability_engine(start, end, doctor).earliest(start, end, doctor)
 
 def create_booking(doctor_name, date, time, patient_email):
     """Creates a new booking in the Supabase database."""
@@ -133,6 +347,8 @@ def create_booking(doctor_name, date, time, patient_email):
             "Date": date
         }
         response = supabase_staff.table('Booking').insert(booking_data).execute()
+        invalidate_booking_context(booking_data["patient_name"])
+        booking_stats.record_upserted(response.data)
         return {'success': True, 'data': response.data}
     except Exception as e:
         print(f"Create Booking Error: {e}")
@@ -159,6 +375,8 @@ def cancel_booking(doctor_name, date, time, patient_email):
         
         # Check if any row was actually deleted
         if response.data and len(response.data) > 0:
+            invalidate_booking_context_for_rows(response.data)
+            booking_stats.record_deleted(response.data)
             return {'success': True, 'data': response.data}
         else:
             return {'success': False, 'message': 'No matching booking found to cancel.'}
@@ -167,233 +385,542 @@ def cancel_booking(doctor_name, date, time, patient_email):
         print(f"Cancel Booking Error: {e}")
         return {'success': False, 'message': str(e)}
 
-def create_new_chat_table(table_id_src):
+# --- Batch Booking Operations ---
+# Staff rescheduling a whole day would otherwise make one HTTP call and one Supabase round trip
+# per booking. A batch groups its operations by kind and runs each group as a few bulk calls:
+# deletes by id as one `in` filter, deletes by slot as one `or` filter, updates as one read plus
+# one upsert, and creates as one insert. Groups run in the order delete, update, create, so a batch
+# can free a slot and rebook it.
+
+BOOKING_BATCH_MAX_OPERATIONS = int(os.getenv("BOOKING_BATCH_MAX_OPERATIONS", "1000"))
+BOOKING_BATCH_CHUNK_SIZE = int(os.getenv("BOOKING_BATCH_CHUNK_SIZE", "200"))
+
+def _chunks(items, size=None):
+    size = size or BOOKING_BATCH_CHUNK_SIZE
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _quote_filter_value(value):
+    """Quotes a value for a PostgREST or/and filter (names like 'Dr. A (GP)' contain reserved characters)."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def _slot_key(doctor_name, date_value, time_value):
+    """(doctor, date, minutes) with the date and time normalised, so '09:00' matches the stored '09:00:00'."""
+    try:
+        day = parse_date(date_value).isoformat()
+    except ValueError:
+        day = str(date_value or '')[:10]
+    minutes = parse_minutes(time_value)
+    return (doctor_name, day, minutes if minutes is not None else str(time_value or ''))
+
+def _row_slot_key(row):
+    return _slot_key(row.get('doctor_name'), row.get('Date'), row.get('appoinment_time'))
+
+def _batch_target(kind, op):
+    """What an operation acts on; two operations on the same target in one batch are rejected."""
+    if kind == 'create':
+        return None
+    if op.get('id') is not None:
+        return ('id', str(op['id']))
+    return ('slot',) + _slot_key(op['doctor_name'], op['date'], op['time'])
+
+def _batch_deletes(items, results, changed):
+    by_id = [(i, op) for i, op in items if op.get('id') is not None]
+    by_slot = [(i, op) for i, op in items if op.get('id') is None]
+
+    for chunk in _chunks(by_id):
+        response = supabase_staff.table('Booking').delete().in_('id', [op['id'] for _, op in chunk]).execute()
+        deleted = {str(row.get('id')): row for row in response.data or []}
+        for i, op in chunk:
+            row = deleted.get(str(op['id']))
+            results[i] = {'success': True, 'data': [row]} if row else {'success': False, 'message': 'Booking not found'}
+        changed["deleted"].extend(deleted.values())
+
+    for chunk in _chunks(by_slot, 50):
+        conditions = [
+            f"and(doctor_name.eq.{_quote_filter_value(op['doctor_name'])},"
+            f"Date.eq.{_quote_filter_value(op['date'])},"
+            f"appoinment_time.eq.{_quote_filter_value(op['time'])})"
+            for _, op in chunk
+        ]
+        response = supabase_staff.table('Booking').delete().or_(",".join(conditions)).execute()
+        deleted = {}
+        for row in response.data or []:
+            deleted.setdefault(_row_slot_key(row), []).append(row)
+        for i, op in chunk:
+            rows = deleted.get(_slot_key(op['doctor_name'], op['date'], op['time']))
+            results[i] = {'success': True, 'data': rows} if rows else {'success': False, 'message': 'Booking not found'}
+        changed["deleted"].extend(row for rows in deleted.values() for row in rows)
+
+def _batch_updates(items, results, changed):
+    for chunk in _chunks(items):
+        ids = list({op['id'] for _, op in chunk})
+        existing = supabase_staff.table('Booking').select("*").in_('id', ids).execute().data or []
+        merged = {str(row.get('id')): dict(row) for row in existing}
+        changed["deleted"].extend(existing)  # the old slots, for cache invalidation
+
+        for i, op in chunk:
+            row = merged.get(str(op['id']))
+            if row is None:
+                results[i] = {'success': False, 'message': 'Booking not found'}
+                continue
+            row['Date'] = op['newDate']
+            row['appoinment_time'] = op['newTime']
+
+        targets = [i for i, op in chunk if str(op['id']) in merged]
+        if not targets:
+            continue
+        response = supabase_staff.table('Booking').upsert(list(merged.values())).execute()
+        updated = {str(row.get('id')): row for row in response.data or []}
+        for i, op in chunk:
+            if i in targets:
+                row = updated.get(str(op['id']))
+                results[i] = {'success': True, 'data': [row]} if row else {'success': False, 'message': 'Update not applied'}
+        changed["upserted"].extend(updated.values())
+
+def _batch_creates(items, results, changed):
+    for chunk in _chunks(items):
+        rows = [{
+            "doctor_name": op['doctorName'],
+            "patient_name": op.get('patientEmail') or "Guest",
+            "appoinment_time": op['time'],
+            "Date": op['date']
+        } for _, op in chunk]
+        try:
+            response = supabase_staff.table('Booking').insert(rows).execute()
+        except Exception as e:
+            # The insert is all-or-nothing; retry one by one so only the bad rows fail
+            print(f"DEBUG: Bulk insert of {len(rows)} bookings failed ({e}), retrying individually.")
+            for (i, _), row in zip(chunk, rows):
+                try:
+                    created = supabase_staff.table('Booking').insert(row).execute().data
+                    results[i] = {'success': True, 'data': created}
+                    changed["upserted"].extend(created or [])
+                except Exception as item_error:
+                    results[i] = {'success': False, 'message': str(item_error)}
+            continue
+        for (i, _), created in zip(chunk, response.data or []):
+            results[i] = {'success': True, 'data': [created]}
+        changed["upserted"].extend(response.data or [])
+
+def _validate_batch_operation(op):
+    if not isinstance(op, dict):
+        return None, 'Operation must be an object'
+    kind = op.get('op')
+    if kind == 'create':
+        if not op.get('doctorName') or not op.get('date') or not op.get('time'):
+            return None, 'Missing booking details'
+    elif kind == 'update':
+        if not op.get('id') or not op.get('newDate') or not op.get('newTime'):
+            return None, 'Missing required fields'
+    elif kind == 'delete':
+        if op.get('id') is None and not (op.get('doctor_name') and op.get('date') and op.get('time')):
+            return None, 'Missing booking identifier'
+    else:
+        return None, "op must be 'create', 'update' or 'delete'"
+    return kind, None
+
+def run_booking_batch(operations):
+    """
+    Runs a list of booking operations with bulk Supabase calls. Each operation is one of
+      {"op": "create", "doctorName", "date", "time", "patientEmail"}
+      {"op": "update", "id", "newDate", "newTime"}
+      {"op": "delete", "id"}  or  {"op": "delete", "doctor_name", "date", "time"}
+    (the same fields as /api/book and /api/appointments PUT/DELETE).
+    Only the first update or delete of a booking (by id, or by slot) runs; later ones fail as duplicates.
+    Returns one {index, op, success, data | message} per operation, in request order.
+    """
+    results = [None] * len(operations)
+    groups = {'delete': [], 'update': [], 'create': []}
+    targets = set()
+    for i, op in enumerate(operations):
+        kind, error = _validate_batch_operation(op)
+        if error:
+            results[i] = {'success': False, 'message': error}
+            continue
+        # A bulk upsert applies only the last of several updates to one row, so a second operation
+        # on the same booking is rejected instead of being reported as applied
+        target = _batch_target(kind, op)
+        if target is not None and target in targets:
+            results[i] = {'success': False, 'message': 'Duplicate operation on this booking in the batch'}
+            continue
+        targets.add(target)
+        groups[kind].append((i, op))
+
+    changed = {"upserted": [], "deleted": []}
+    for kind, run in (('delete', _batch_deletes), ('update', _batch_updates), ('create', _batch_creates)):
+        if not groups[kind]:
+            continue
+        try:
+            run(groups[kind], results, changed)
+        except Exception as e:
+            print(f"Batch {kind} Error: {e}")
+            for i, _ in groups[kind]:
+                if results[i] is None:
+                    results[i] = {'success': False, 'message': str(e)}
+
+    invalidate_booking_context_for_rows(changed["deleted"] + changed["upserted"])
+    booking_stats.record_deleted(changed["deleted"])
+    booking_stats.record_upserted(changed["upserted"])
+
+    return [
+        dict(result or {'success': False, 'message': 'Not processed'}, index=i, op=(op.get('op') if isinstance(op, dict) else None))
+        for i, (op, result) in enumerate(zip(operations, results))
+    ]
+
+def _duplicate_chat_table(table_id_src):
     new_table_id = f"chat_{str(uuid.uuid4())[:8]}"
-    config = BOT_CONFIG["Public"]
-    client = JamAI(token=config["api_key"], project_id=config["project_id"])
 
     try:
-        client.table.duplicate_table(
-            table_type="chat",
-            table_id_src=table_id_src,  # Your base agent ID
-            table_id_dst=new_table_id,
-            include_data=True,
-            create_as_child=True
-        )
+        with span("jamai", "Public chat duplicate_table"), jamai_clients.client("Public") as client:
+            client.table.duplicate_table(
+                table_type="chat",
+                table_id_src=table_id_src,  # Your base agent ID
+                table_id_dst=new_table_id,
+                include_data=True,
+                create_as_child=True
+            )
         return new_table_id
     except Exception as e:
         print(f"Error creating new chat: {str(e)}")
         return None
 
 def delete_table(table_type, table_id):
-    config = BOT_CONFIG["Public"]
-    client = JamAI(token=config["api_key"], project_id=config["project_id"])
     try:
-        client.table.delete_table(
-            table_type=table_type,
-            table_id=table_id,
-        )
+        with span("jamai", f"Public {table_type} delete_table"), jamai_clients.client("Public") as client:
+            client.table.delete_table(
+                table_type=table_type,
+                table_id=table_id,
+            )
+        if table_type == "chat":
+            _forget_chat_table(table_id)
         return True
     except Exception as e:
         print(f"Error deleting chat: {str(e)}")
         return False
 
-def post_chat_table(user_message, table_id):
-    config = BOT_CONFIG["Public"]
-    client = JamAI(token=config["api_key"], project_id=config["project_id"])
+# Filled once server.py calls chat_table_pool.start()
+chat_table_pool = ChatTablePool(_duplicate_chat_table, delete_table=lambda table_id: delete_table("chat", table_id),
+                                base_tables=CHAT_TABLE_POOL_PREWARM)
+
+def create_new_chat_table(table_id_src):
+    """Hands out a pre-duplicated Chat Table for a new session, duplicating one on demand if the pool is empty."""
+    new_table_id = chat_table_pool.acquire(table_id_src) or _duplicate_chat_table(table_id_src)
+    if new_table_id:
+        _touch_chat_table(new_table_id)
+    return new_table_id
+
+def _resolve_session_id(session_id):
+    # Retrieve session_id from Streamlit state if available and not provided
+    if session_id is None:
+        try:
+            return st.session_state.get('session_id', 'unknown_session')
+        except:
+            return 'external_session'
+    return session_id
+
+def _prepare_bot_turn(bot_type, user_message, session_id=None, user_email=None):
+    """
+    Builds the row to add for one chat turn of the given bot.
+    Returns (table_type, table_id, row_data, output_column, answer_scope).
+    Shared by the blocking and streaming paths so both write exactly the same rows.
+    `answer_scope` is the answer cache scope for Public turns (None: don't use the cache).
+    """
+    session_id = _resolve_session_id(session_id)
+
+    if bot_type == "Public":
+        # Public bot uses the "FAQ" Action Table, not BOT_CONFIG["Public"]["table_id"]
+        context, tag = _prompt_context(user_message, "Public", user_email, bot_type="Public")
+        answer_scope = ("FAQ", tag, knowledge_versions["Public"]) if tag else None
+        return "action", "FAQ", {"usr_input": user_message + context}, "user_output", answer_scope
+
+    if bot_type == "Staff":
+        user_role = "Staff"
+        full_message = build_full_message(user_message, user_role, user_email, bot_type="Staff")
+
+        # Prepare row data with metadata for logging
+        row_data = {
+            "User": full_message,
+            "Session ID": session_id,
+            "User Role": user_role
+        }
+
+        # Add User Email if provided
+        if user_email:
+            row_data["User Email"] = user_email
 
-    try:
         # Debugging: Print data being sent
-        print(f"DEBUG chat: Sending row data to JamAI: {user_message}")
+        print(f"DEBUG: Sending row data to JamAI (Staff): {row_data}")
+        return "action", BOT_CONFIG["Staff"]["table_id"], row_data, "AI", None
+
+    if bot_type == "Booking":
+        # Booking bot uses the Chat Table, and only sees the patient's own bookings
+        full_message = build_full_message(user_message, "Public", user_email, bot_type="Booking")
+
+        # Debugging: Print data being sent
+        print(f"DEBUG: Sending row data to JamAI (Booking): {full_message}")
+        return "chat", BOT_CONFIG["Booking"]["table_id"], {"User": full_message}, "AI", None
 
+    raise ValueError(f"Invalid bot_type: {bot_type}")
+
+def _add_row(bot_type, table_type, table_id, row_data, history=None):
+    """
+    Adds one row (non-streaming) and returns a dict of output column name -> text,
+    or None if no row came back. `history` is the (session_key, user_text) to record the turn under.
+    """
+    with span("jamai", f"{bot_type} {table_type} add_table_rows"), jamai_clients.client(bot_type) as client:
         completion = client.table.add_table_rows(
-            table_type="chat",
+            table_type=table_type,
             request=protocol.MultiRowAddRequest(
                 table_id=table_id,
-                data=[{"User": user_message}],
+                data=[row_data],
                 stream=False
             )
         )
 
-        if completion.rows and len(completion.rows) > 0:
-            row_columns = completion.rows[0].columns
+    columns = _completion_columns(completion)
+    if columns:
+        _record_turn(history, completion.rows[0].row_id, columns)
+    return columns
+
+def _completion_columns(completion):
+    """Output column name -> text for the first row of a non-streaming completion (None if no rows)."""
+    if not completion.rows or len(completion.rows) == 0:
+        return None
 
-            print(f"DEBUG: Received columns from JamAI: {list(row_columns.keys())}")
+    # Get the first row's columns
+    row_columns = completion.rows[0].columns
 
-            if "user_output" in row_columns:
-                return f"User: {user_message}\n Action Table: {row_columns['user_output'].text}"
-            else:
-                return list(row_columns.values())[-1].text
-        else:
+    # Debugging: Print received columns to console
+    print(f"DEBUG: Received columns from JamAI: {list(row_columns.keys())}")
+    return {name: column.text for name, column in row_columns.items()}
+
+def _stream_row(bot_type, table_type, table_id, row_data, stream_column, history=None):
+    """
+    Adds one row with streaming on. Yields a {"token": ...} event for each text delta of
+    `stream_column` (None forwards nothing), and returns a dict of column name -> full text
+    in the order the columns first appeared. The finished turn is recorded under `history`.
+    """
+    columns = {}
+    row_id = None
+    with span("jamai", f"{bot_type} {table_type} add_table_rows (stream)"), jamai_clients.client(bot_type) as client:
+        chunks = client.table.add_table_rows(
+            table_type=table_type,
+            request=protocol.MultiRowAddRequest(
+                table_id=table_id,
+                data=[row_data],
+                stream=True
+            )
+        )
+        for chunk in chunks:
+            row_id = getattr(chunk, "row_id", None) or row_id
+            event = _collect_chunk(columns, chunk, stream_column)
+            if event:
+                yield event
+
+    _record_turn(history, row_id, columns)
+    print(f"DEBUG: Streamed columns from JamAI: {list(columns.keys())}")
+    return columns
+
+def _collect_chunk(columns, chunk, stream_column):
+    """Adds a streamed chunk's text to `columns`; returns a token event if it belongs to `stream_column`."""
+    # Reference chunks carry no text
+    column = getattr(chunk, "output_column_name", None)
+    text = getattr(chunk, "text", None)
+    if column is None or text is None:
+        return None
+    columns[column] = columns.get(column, "") + text
+    if column == stream_column and text:
+        return {"token": text}
+    return None
+
+def _pick_output(columns, output_column):
+    """Same column choice as the non-streaming path: `output_column` if present, else the last column."""
+    if output_column in columns:
+        return columns[output_column]
+    if columns:
+        return list(columns.values())[-1]
+    return None
+
+def _chat_table_output(user_message, columns):
+    # A chat table with a 'user_output' column is echoed back like the Action Table output,
+    # otherwise the last column (normally 'AI') is the reply
+    if "user_output" in columns:
+        return f"User: {user_message}\n Action Table: {columns['user_output']}"
+    return _pick_output(columns, "user_output")
+
+def post_chat_table(user_message, table_id):
+    try:
+        # Debugging: Print data being sent
+        print(f"DEBUG chat: Sending row data to JamAI: {user_message}")
+
+        columns = _add_row("Public", "chat", table_id, {"User": user_message}, _chat_table_history(table_id, user_message))
+        if not columns:
             return "Error: No response received from JamAI Table."
+        return _chat_table_output(user_message, columns)
 
     except Exception as e:
         return f"Error connecting to JamAI: {str(e)}"
 
+# --- Public FAQ Answer Cache ---
+# Public (FAQ) answers are cached under the question and the data they were built from (see
+# answer_cache.py). Knowledge uploads bump knowledge_versions, which changes the scope of new turns.
+answer_cache = AnswerCache(name="public answers")
+knowledge_versions = Counter()
+
+def _cached_answer(user_message, answer_scope):
+    """Cached output columns for the turn, or None (also when the turn must not use the cache)."""
+    if answer_scope is None:
+        return None
+    return answer_cache.lookup(user_message, answer_scope)
+
+def _store_answer(user_message, answer_scope, columns, started):
+    if answer_scope is not None and columns:
+        answer_cache.store(user_message, answer_scope, dict(columns), time.perf_counter() - started)
+
 def get_public_jam_ai_response(user_message, session_id=None, user_email=None):
     """
     Dedicated function for Public context interactions with JamAI.
     """
     try:
-        config = BOT_CONFIG["Public"]
-        
-        # Initialize a specific client for this request
-        client = JamAI(token=config["api_key"], project_id=config["project_id"])
-        # target_table_id = config["table_id"] # Not used, we use "staff FAQ"
-
-        # Retrieve session_id from Streamlit state if available and not provided
-        if session_id is None:
-            try:
-                session_id = st.session_state.get('session_id', 'unknown_session')
-            except:
-                session_id = 'external_session'
-        
-        user_role = "Public"
-        
-        # Fetch Duty List Context
-        duty_context = get_duty_list_context()
-        
-        # Fetch Booking List Context
-        booking_context = get_booking_list_context(user_role, user_email)
-        
-        # Combine User Message with Context
-        full_message = user_message
-        if duty_context:
-            full_message += duty_context
-        if booking_context:
-            full_message += booking_context
+        table_type, table_id, row_data, output_column, answer_scope = _prepare_bot_turn("Public", user_message, session_id, user_email)
 
         # Debugging: Print data being sent
         # print(f"DEBUG: Sending row data to JamAI (Public): {row_data}")
 
-        completion = client.table.add_table_rows(
-            table_type="action",
-            request=protocol.MultiRowAddRequest(
-                table_id="FAQ",
-                data=[{"usr_input": full_message}], 
-                stream=False 
-            )
-        )
-        
-        if completion.rows and len(completion.rows) > 0:
-            # Get the first row's columns
-            row_columns = completion.rows[0].columns
-            
-            # Debugging: Print received columns to console
-            print(f"DEBUG: Received columns from JamAI: {list(row_columns.keys())}")
-            
-            # Find the 'user_output' column or the last column which usually contains the response
-            if "user_output" in row_columns:
-                ai_response = row_columns["user_output"].text
-            else:
-                # Fallback: return the text of the last column
-                ai_response = list(row_columns.values())[-1].text
-            
-            return f"User: {user_message}\n Action Table: {ai_response}"
-
-        else:
-            return "Error: No response received from JamAI Table."
+        columns = _cached_answer(user_message, answer_scope)
+        if columns is None:
+            started = time.perf_counter()
+            columns = _add_row("Public", table_type, table_id, row_data, _turn_history(row_data))
+            _store_answer(user_message, answer_scope, columns, started)
+        # Find the 'user_output' column or the last column which usually contains the response
+        return _bot_output("Public", user_message, columns, output_column)
 
     except Exception as e:
         return f"Error connecting to JamAI: {str(e)}"
 
+# --- Chat History ---
+# History is served from the local store (history_store.py). Turns are recorded there as they
+# happen; each JamAI table is scanned once, on first use, to import what was there before.
+history_store = HistoryStore()
+
+def _row_text(row, col_name):
+    # Handle row being a dict (newer SDK) or object (older SDK)
+    if isinstance(row, dict):
+        if col_name in row:
+            col_data = row[col_name]
+            if isinstance(col_data, dict) and 'value' in col_data:
+                return col_data['value']
+            return str(col_data)
+        return ""
+    if col_name in row.columns:
+        return row.columns[col_name].text
+    return ""
+
+def _row_has_column(row, col_name):
+    return col_name in (row if isinstance(row, dict) else row.columns)
+
+def _row_timestamp(row):
+    # Safe timestamp extraction for dict / object rows
+    if isinstance(row, dict):
+        if 'Updated at' in row:
+            return str(row['Updated at'])
+        if 'Created at' in row:
+            return str(row['Created at'])
+        return "Unknown Time"
+    if hasattr(row, 'updated_at') and row.updated_at:
+        return str(row.updated_at)
+    if hasattr(row, 'created_at') and row.created_at:
+        return str(row.created_at)
+    return "Unknown Time"
+
+def _row_id(row):
+    if isinstance(row, dict):
+        row_id = row.get('ID')
+    else:
+        row_id = getattr(row, 'id', None) or getattr(row, 'ID', None)
+    return str(row_id) if row_id is not None else None
+
+def _extract_user_message(text):
+    match = re.search(r'User:\s*(.*?)\s*Action Table:', text, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    return text
+
+def _chat_table_history_key(table_id):
+    return f"table:{table_id}"
+
+def _session_history_key(session_id):
+    return f"session:{str(session_id).strip()}"
+
+def _turn_history(row_data):
+    """History entry (session_key, user_text) for a bot turn; only rows with a Session ID show up in history."""
+    if "Session ID" in row_data:
+        return _session_history_key(row_data["Session ID"]), row_data.get("User", "")
+    return None
+
+def _chat_table_history(table_id, user_message):
+    return _chat_table_history_key(table_id), _extract_user_message(user_message)
+
+def _touch_chat_table(table_id):
+    try:
+        history_store.touch(_chat_table_history_key(table_id))
+    except Exception as e:
+        print(f"Error recording chat table activity: {e}")
+
+def _forget_chat_table(table_id):
+    try:
+        history_store.delete_session(_chat_table_history_key(table_id), source=f"chat:{table_id}")
+    except Exception as e:
+        print(f"Error forgetting chat table history: {e}")
+
+def _record_turn(history, row_id, columns):
+    if not history or not columns:
+        return
+    try:
+        session_key, user_text = history
+        history_store.record_turn(session_key, user_text, columns.get("AI", ""), row_id=row_id)
+    except Exception as e:
+        # History is best effort; never fail the chat turn because of it
+        print(f"Error recording chat history: {e}")
+
+def _traced_rows(bot_type, table_type, table_id):
+    """
+    Every row of a JamAI table (see jamai_pager.py, no row cap) and whether the listing got all of
+    them, listed as one span of the current request.
+    """
+    with span("jamai", f"{bot_type} {table_type} list_table_rows"):
+        rows, total = list_table_rows(jamai_clients, bot_type, table_type, table_id, max_rows=None)
+    complete = len(rows) >= total
+    if not complete:
+        print(f"Warning: Listed {len(rows)} of {total} rows of {table_type} table '{table_id}'; "
+              f"its history will be imported again on the next read.")
+    return rows, complete
+
+def _backfill_public_chat_history(table_id):
+    rows, complete = _traced_rows("Public", "chat", table_id)
+    turns = [
+        (_row_id(row), _extract_user_message(_row_text(row, "User")), _row_text(row, "AI"), _row_timestamp(row))
+        for row in rows
+    ]
+    print(f"DEBUG: Backfilling {len(turns)} rows from chat table '{table_id}'.")
+    history_store.backfill(f"chat:{table_id}", {_chat_table_history_key(table_id): turns}, complete=complete)
+
+def _ensure_public_chat_history(table_id):
+    _touch_chat_table(table_id)
+    if not history_store.is_backfilled(f"chat:{table_id}"):
+        _backfill_public_chat_history(table_id)
+
 def get_public_chat_history(table_id):
     """
-    Fetches chat history for a specific session from the JamAI Table.
+    Fetches chat history for a specific session (its own Chat Table) from the local history store.
     """
-    config = BOT_CONFIG["Public"]
-    client = JamAI(token=config["api_key"], project_id=config["project_id"])
-    
     try:
         print(f"DEBUG: Fetching history for table_id: '{table_id}'")
-        
-        all_items = []
-        offset = 0
-        limit = 100
-        max_pages = 30 
-        
-        for _ in range(max_pages):
-            response = client.table.list_table_rows(
-                table_type="chat", 
-                table_id=table_id,
-                limit=limit,
-                offset=offset
-            )
-            
-            if not response.items:
-                break
-                
-            all_items.extend(response.items)
-            
-            if len(response.items) < limit:
-                break
-                
-            offset += limit
-        
-        history = []
-        if all_items:
-            print(f"DEBUG: Found {len(all_items)} total rows in table.")
-            
-            for row in all_items:
-                if isinstance(row, dict):
-                    columns = row
-                    def get_text(col_name):
-                        if col_name in columns:
-                            col_data = columns[col_name]
-                            if isinstance(col_data, dict) and 'value' in col_data:
-                                return col_data['value']
-                            return str(col_data)
-                        return ""
-                    def extract_user_message(text): 
-                        match = re.search(r'User:\s*(.*?)\s*Action Table:', text, re.DOTALL)
-                        if match:
-                            return match.group(1).strip()
-                        return text
-                    def get_timestamp():
-                        if 'Updated at' in row:
-                            return str(row['Updated at'])
-                        if 'Created at' in row:
-                            return str(row['Created at'])
-                        return "Unknown Time"
-                else:
-                    columns = row.columns
-                    def get_text(col_name):
-                        if col_name in columns:
-                            return columns[col_name].text
-                        return ""
-                    def extract_user_message(text): 
-                        match = re.search(r'User:\s*(.*?)\s*Action Table:', text, re.DOTALL)
-                        if match:
-                            return match.group(1).strip()
-                        return text
-                    def get_timestamp():
-                        if hasattr(row, 'updated_at') and row.updated_at:
-                            return str(row.updated_at)
-                        if hasattr(row, 'created_at') and row.created_at:
-                            return str(row.created_at)
-                        return "Unknown Time"
-
-                raw_text = get_text("User")
-                user_text = extract_user_message(raw_text) 
-                ai_text = get_text("AI")
-                timestamp = get_timestamp()
-
-                if user_text:
-                    history.append({
-                        "role": "user",
-                        "content": user_text,
-                        "timestamp": timestamp
-                    })
-                if ai_text:
-                    history.append({
-                        "role": "assistant",
-                        "content": ai_text,
-                        "timestamp": timestamp
-                    })
-            
-            history.sort(key=lambda x: x['timestamp'])
-            print(f"DEBUG: Found {len(history)} messages for this session.")
-            
+
+        _ensure_public_chat_history(table_id)
+
+        history = history_store.get_history(_chat_table_history_key(table_id))
+        print(f"DEBUG: Found {len(history)} messages for this session.")
         return history
 
     except Exception as e:
@@ -410,75 +937,11 @@ def get_staff_jam_ai_response(user_message, session_id=None, user_email=None):
     Uses Action Table only.
     """
     try:
-        config = BOT_CONFIG["Staff"]
-        
-        # Initialize a specific client for this request
-        client = JamAI(token=config["api_key"], project_id=config["project_id"])
-        target_table_id = config["table_id"]
-
-        # Retrieve session_id from Streamlit state if available and not provided
-        if session_id is None:
-            try:
-                session_id = st.session_state.get('session_id', 'unknown_session')
-            except:
-                session_id = 'external_session'
-        
-        user_role = "Staff"
-        
-        # Fetch Duty List Context
-        duty_context = get_duty_list_context()
-        
-        # Fetch Booking List Context
-        booking_context = get_booking_list_context(user_role, user_email)
-        
-        # Combine User Message with Context
-        full_message = user_message
-        if duty_context:
-            full_message += duty_context
-        if booking_context:
-            full_message += booking_context
-
-        # Prepare row data with metadata for logging
-        row_data = {
-            "User": full_message,
-            "Session ID": session_id,
-            "User Role": user_role
-        }
-
-        # Add User Email if provided
-        if user_email:
-            row_data["User Email"] = user_email
-        
-        # Debugging: Print data being sent
-        print(f"DEBUG: Sending row data to JamAI (Staff): {row_data}")
-
-        completion = client.table.add_table_rows(
-            table_type="action",
-            request=protocol.MultiRowAddRequest(
-                table_id=target_table_id,
-                data=[row_data], 
-                stream=False 
-            )
-        )
-        
-        if completion.rows and len(completion.rows) > 0:
-            # Get the first row's columns
-            row_columns = completion.rows[0].columns
-            
-            # Debugging: Print received columns to console
-            print(f"DEBUG: Received columns from JamAI: {list(row_columns.keys())}")
-            
-            # Find the 'AI' column or the last column which usually contains the response
-            if "AI" in row_columns:
-                ai_response = row_columns["AI"].text
-            else:
-                # Fallback: return the text of the last column
-                ai_response = list(row_columns.values())[-1].text
-            
-            return ai_response
+        table_type, table_id, row_data, output_column, _ = _prepare_bot_turn("Staff", user_message, session_id, user_email)
 
-        else:
-            return "Error: No response received from JamAI Table."
+        columns = _add_row("Staff", table_type, table_id, row_data, _turn_history(row_data))
+        # Find the 'AI' column or the last column which usually contains the response
+        return _bot_output("Staff", user_message, columns, output_column)
 
     except Exception as e:
         return f"Error connecting to JamAI: {str(e)}"
@@ -489,68 +952,24 @@ def get_booking_jam_ai_response(user_message, session_id=None, user_email=None):
     Uses Chat Table only.
     """
     try:
-        config = BOT_CONFIG["Booking"]
-        
-        # Initialize a specific client for this request
-        client = JamAI(token=config["api_key"], project_id=config["project_id"])
-        target_table_id = config["table_id"]
-
-        # Retrieve session_id from Streamlit state if available and not provided
-        if session_id is None:
-            try:
-                session_id = st.session_state.get('session_id', 'unknown_session')
-            except:
-                session_id = 'external_session'
-        
-        user_role = "Public"
-        
-        # Fetch Duty List Context
-        duty_context = get_duty_list_context()
-        
-        # Fetch Booking List Context
-        booking_context = get_booking_list_context(user_role, user_email)
-        
-        # Combine User Message with Context
-        full_message = user_message
-        if duty_context:
-            full_message += duty_context
-        if booking_context:
-            full_message += booking_context
+        table_type, table_id, row_data, output_column, _ = _prepare_bot_turn("Booking", user_message, session_id, user_email)
 
-        # Debugging: Print data being sent
-        print(f"DEBUG: Sending row data to JamAI (Booking): {full_message}")
-
-        completion = client.table.add_table_rows(
-            table_type="chat",
-            request=protocol.MultiRowAddRequest(
-                table_id=target_table_id,
-                data=[{"User": full_message}],
-                stream=False 
-            )
-        )
-        
-        if completion.rows and len(completion.rows) > 0:
-            # Get the first row's columns
-            row_columns = completion.rows[0].columns
-            
-            # Debugging: Print received columns to console
-            print(f"DEBUG: Received columns from JamAI: {list(row_columns.keys())}")
-            
-            # Find the 'AI' column or the last column which usually contains the response
-            if "AI" in row_columns:
-                ai_response = row_columns["AI"].text
-            else:
-                # Fallback: return the text of the last column
-                ai_response = list(row_columns.values())[-1].text
-            
-            return ai_response
-
-        else:
-            return "Error: No response received from JamAI Table."
+        columns = _add_row("Booking", table_type, table_id, row_data, _turn_history(row_data))
+        # Find the 'AI' column or the last column which usually contains the response
+        return _bot_output("Booking", user_message, columns, output_column)
 
     except Exception as e:
         return f"Error connecting to JamAI: {str(e)}"
 
+def _bot_type_for_context(model_context):
+    # Determine which bot config to use based on context
+    bot_type = "Public" # Default
+    if "staff" in model_context.lower():
+        bot_type = "Staff"
+    elif "booking" in model_context.lower():
+        bot_type = "Booking"
+    return bot_type
+
 def get_jam_ai_response(project_id, user_message, model_context, session_id=None, user_email=None):
     """
     Function to call the JAM AI API using the Table interface.
@@ -559,12 +978,7 @@ def get_jam_ai_response(project_id, user_message, model_context, session_id=None
     
     try:
         # --- DYNAMIC BOT SELECTION ---
-        # Determine which bot config to use based on context
-        bot_type = "Public" # Default
-        if "staff" in model_context.lower():
-            bot_type = "Staff"
-        elif "booking" in model_context.lower():
-            bot_type = "Booking"
+        bot_type = _bot_type_for_context(model_context)
         
         # Dispatch to dedicated functions
         if bot_type == "Public":
@@ -579,6 +993,175 @@ def get_jam_ai_response(project_id, user_message, model_context, session_id=None
     except Exception as e:
         return f"Error connecting to JamAI: {str(e)}"
 
+def _bot_output(bot_type, user_message, columns, output_column):
+    """The reply text of a bot turn, exactly as the get_*_jam_ai_response functions return it."""
+    if not columns:
+        return "Error: No response received from JamAI Table."
+    ai_response = _pick_output(columns, output_column)
+    if bot_type == "Public":
+        return f"User: {user_message}\n Action Table: {ai_response}"
+    return ai_response
+
+def stream_jam_ai_response(user_message, model_context, session_id=None, user_email=None, table_id=None):
+    """
+    Streaming counterpart of get_jam_ai_response (+ post_chat_table when `table_id` is given).
+    Yields {"token": "..."} events while the reply is generated, then one {"done": True, "response": ...}
+    event whose response is exactly what the non-streaming /api/chat would have returned.
+    Errors are reported as a final {"error": ...} event.
+    """
+    try:
+        bot_type = _bot_type_for_context(model_context)
+        table_type, target_table_id, row_data, output_column, answer_scope = _prepare_bot_turn(bot_type, user_message, session_id, user_email)
+        cached = _cached_answer(user_message, answer_scope)
+
+        if table_id:
+            # Step 1: the Action Table output is only an intermediate result here, so it isn't forwarded
+            columns = cached
+            if columns is None:
+                started = time.perf_counter()
+                columns = yield from _stream_row(bot_type, table_type, target_table_id, row_data, None, _turn_history(row_data))
+                _store_answer(user_message, answer_scope, columns, started)
+            action_response = _bot_output(bot_type, user_message, columns, output_column)
+
+            # Step 2: post it to the session's Chat Table and stream that reply
+            print(f"DEBUG chat: Sending row data to JamAI: {action_response}")
+            columns = yield from _stream_row("Public", "chat", table_id, {"User": action_response}, "AI",
+                                             _chat_table_history(table_id, action_response))
+            if not columns:
+                yield {"done": True, "response": "Error: No response received from JamAI Table."}
+                return
+            yield {"done": True, "response": _chat_table_output(action_response, columns)}
+            return
+
+        if bot_type == "Public":
+            # Same "User: ... Action Table: ..." framing as the non-streaming response
+            yield {"token": f"User: {user_message}\n Action Table: "}
+        if cached is not None:
+            # Answered from the cache: no LLM call, the whole reply arrives as one token
+            yield {"token": _pick_output(cached, output_column) or ""}
+            yield {"done": True, "response": _bot_output(bot_type, user_message, cached, output_column)}
+            return
+        started = time.perf_counter()
+        columns = yield from _stream_row(bot_type, table_type, target_table_id, row_data, output_column, _turn_history(row_data))
+        _store_answer(user_message, answer_scope, columns, started)
+        yield {"done": True, "response": _bot_output(bot_type, user_message, columns, output_column)}
+
+    except Exception as e:
+        print(f"Streaming chat error: {e}")
+        yield {"error": f"Error connecting to JamAI: {str(e)}"}
+
+# --- Async variants (ASGI mode, see asgi_server.py) ---
+# Same rows and same response text as the blocking functions above, but the JamAI calls are
+# awaited on the shared async clients instead of holding a thread for the whole generation.
+# Prompt context still comes from the (mostly in-memory) caches via a worker thread.
+
+async def _add_row_async(bot_type, table_type, table_id, row_data, history=None):
+    client = jamai_clients.async_client(bot_type)
+    with span("jamai", f"{bot_type} {table_type} add_table_rows"):
+        completion = await client.table.add_table_rows(
+            table_type=table_type,
+            request=protocol.MultiRowAddRequest(
+                table_id=table_id,
+                data=[row_data],
+                stream=False
+            )
+        )
+    columns = _completion_columns(completion)
+    if columns:
+        await asyncio.to_thread(_record_turn, history, completion.rows[0].row_id, columns)
+    return columns
+
+async def _stream_row_async(bot_type, table_type, table_id, row_data, stream_column, columns, history=None):
+    """Async _stream_row: yields token events and fills `columns` (async generators can't return values)."""
+    row_id = None
+    client = jamai_clients.async_client(bot_type)
+    with span("jamai", f"{bot_type} {table_type} add_table_rows (stream)"):
+        chunks = await client.table.add_table_rows(
+            table_type=table_type,
+            request=protocol.MultiRowAddRequest(
+                table_id=table_id,
+                data=[row_data],
+                stream=True
+            )
+        )
+        async for chunk in chunks:
+            row_id = getattr(chunk, "row_id", None) or row_id
+            event = _collect_chunk(columns, chunk, stream_column)
+            if event:
+                yield event
+    await asyncio.to_thread(_record_turn, history, row_id, columns)
+
+async def post_chat_table_async(user_message, table_id):
+    try:
+        print(f"DEBUG chat: Sending row data to JamAI: {user_message}")
+        columns = await _add_row_async("Public", "chat", table_id, {"User": user_message}, _chat_table_history(table_id, user_message))
+        if not columns:
+            return "Error: No response received from JamAI Table."
+        return _chat_table_output(user_message, columns)
+    except Exception as e:
+        return f"Error connecting to JamAI: {str(e)}"
+
+async def get_jam_ai_response_async(user_message, model_context, session_id=None, user_email=None):
+    """Async counterpart of get_jam_ai_response."""
+    try:
+        bot_type = _bot_type_for_context(model_context)
+        table_type, table_id, row_data, output_column, answer_scope = await asyncio.to_thread(
+            _prepare_bot_turn, bot_type, user_message, session_id, user_email
+        )
+        columns = _cached_answer(user_message, answer_scope)
+        if columns is None:
+            started = time.perf_counter()
+            columns = await _add_row_async(bot_type, table_type, table_id, row_data, _turn_history(row_data))
+            _store_answer(user_message, answer_scope, columns, started)
+        return _bot_output(bot_type, user_message, columns, output_column)
+    except Exception as e:
+        return f"Error connecting to JamAI: {str(e)}"
+
+async def stream_jam_ai_response_async(user_message, model_context, session_id=None, user_email=None, table_id=None):
+    """Async counterpart of stream_jam_ai_response; yields the same events."""
+    try:
+        bot_type = _bot_type_for_context(model_context)
+        table_type, target_table_id, row_data, output_column, answer_scope = await asyncio.to_thread(
+            _prepare_bot_turn, bot_type, user_message, session_id, user_email
+        )
+        cached = _cached_answer(user_message, answer_scope)
+
+        if table_id:
+            columns = cached
+            if columns is None:
+                columns, started = {}, time.perf_counter()
+                async for _ in _stream_row_async(bot_type, table_type, target_table_id, row_data, None, columns, _turn_history(row_data)):
+                    pass
+                _store_answer(user_message, answer_scope, columns, started)
+            action_response = _bot_output(bot_type, user_message, columns, output_column)
+
+            print(f"DEBUG chat: Sending row data to JamAI: {action_response}")
+            columns = {}
+            async for event in _stream_row_async("Public", "chat", table_id, {"User": action_response}, "AI", columns,
+                                                 _chat_table_history(table_id, action_response)):
+                yield event
+            if not columns:
+                yield {"done": True, "response": "Error: No response received from JamAI Table."}
+                return
+            yield {"done": True, "response": _chat_table_output(action_response, columns)}
+            return
+
+        if bot_type == "Public":
+            yield {"token": f"User: {user_message}\n Action Table: "}
+        if cached is not None:
+            yield {"token": _pick_output(cached, output_column) or ""}
+            yield {"done": True, "response": _bot_output(bot_type, user_message, cached, output_column)}
+            return
+        columns, started = {}, time.perf_counter()
+        async for event in _stream_row_async(bot_type, table_type, target_table_id, row_data, output_column, columns, _turn_history(row_data)):
+            yield event
+        _store_answer(user_message, answer_scope, columns, started)
+        yield {"done": True, "response": _bot_output(bot_type, user_message, columns, output_column)}
+
+    except Exception as e:
+        print(f"Streaming chat error: {e}")
+        yield {"error": f"Error connecting to JamAI: {str(e)}"}
+
 def check_staff_login():
     """Checks if the user is logged in as staff and redirects if not."""
     if 'is_staff' not in st.session_state or not st.session_state['is_staff']:
@@ -587,126 +1170,55 @@ def check_staff_login():
         # and stopping the rest of the page from executing.
         st.stop()
 
+def _chat_history_source(session_id):
+    # Determine which bot to use based on session_id prefix
+    # session_id format: 'staff_...', 'patient_...', 'booking_...'
+    bot_type = "Public"
+    table_type = "action" # Default to action table
+
+    if str(session_id).startswith("staff_"):
+        bot_type = "Staff"
+        table_type = "action"
+    elif str(session_id).startswith("booking_"):
+        bot_type = "Booking"
+        table_type = "chat" # Booking bot uses Chat Table
+
+    config = BOT_CONFIG.get(bot_type, BOT_CONFIG["Public"])
+    return bot_type, table_type, config["table_id"]
+
+def _backfill_chat_history(bot_type, table_type, table_id):
+    """Imports every session of a shared Action/Chat Table into the history store, grouped by Session ID."""
+    sessions = {}
+    rows, complete = _traced_rows(bot_type, table_type, table_id)
+    for row in rows:
+        # Only rows with a 'Session ID' column belong to a session
+        if not _row_has_column(row, "Session ID"):
+            continue
+        row_session_id = _row_text(row, "Session ID")
+        if not row_session_id:
+            continue
+        sessions.setdefault(_session_history_key(row_session_id), []).append(
+            (_row_id(row), _row_text(row, "User"), _row_text(row, "AI"), _row_timestamp(row))
+        )
+    print(f"DEBUG: Backfilling {len(rows)} rows from {table_type} table '{table_id}'.")
+    history_store.backfill(f"{table_type}:{table_id}", sessions, complete=complete)
+
+def _ensure_chat_history(session_id):
+    bot_type, table_type, target_table_id = _chat_history_source(session_id)
+    if not history_store.is_backfilled(f"{table_type}:{target_table_id}"):
+        _backfill_chat_history(bot_type, table_type, target_table_id)
+
 def get_chat_history(session_id):
     """
-    Fetches chat history for a specific session from the JamAI Table.
+    Fetches chat history for a specific session from the local history store.
     """
     try:
         print(f"DEBUG: Fetching history for session_id: '{session_id}'")
-        
-        # Determine which bot to use based on session_id prefix
-        # session_id format: 'staff_...', 'patient_...', 'booking_...'
-        bot_type = "Public"
-        table_type = "action" # Default to action table
-
-        if str(session_id).startswith("staff_"):
-            bot_type = "Staff"
-            table_type = "action"
-        elif str(session_id).startswith("booking_"):
-            bot_type = "Booking"
-            table_type = "chat" # Booking bot uses Chat Table
-            
-        config = BOT_CONFIG.get(bot_type, BOT_CONFIG["Public"])
-        
-        # Initialize client specifically for this history fetch
-        client = JamAI(token=config["api_key"], project_id=config["project_id"])
-        target_table_id = config["table_id"]
-        
-        all_items = []
-        offset = 0
-        limit = 100
-        max_pages = 30 # Fetch up to 3000 rows
-        
-        for _ in range(max_pages):
-            response = client.table.list_table_rows(
-                table_type=table_type,
-                table_id=target_table_id,
-                limit=limit,
-                offset=offset
-            )
-            
-            if not response.items:
-                break
-                
-            all_items.extend(response.items)
-            
-            if len(response.items) < limit:
-                break
-                
-            offset += limit
-        
-        history = []
-        if all_items:
-            print(f"DEBUG: Found {len(all_items)} total rows in table.")
-            
-            for row in all_items:
-                # Handle row being a dict (newer SDK) or object (older SDK)
-                if isinstance(row, dict):
-                    columns = row
-                    # Helper to get text value from column dict
-                    def get_text(col_name):
-                        if col_name in columns:
-                            col_data = columns[col_name]
-                            if isinstance(col_data, dict) and 'value' in col_data:
-                                return col_data['value']
-                            return str(col_data)
-                        return ""
-                    
-                    # Safe timestamp extraction for dict
-                    def get_timestamp():
-                        if 'Updated at' in row:
-                            return str(row['Updated at'])
-                        if 'Created at' in row:
-                            return str(row['Created at'])
-                        return "Unknown Time"
 
-                else:
-                    columns = row.columns
-                    def get_text(col_name):
-                        if col_name in columns:
-                            return columns[col_name].text
-                        return ""
-                    
-                    # Safe timestamp extraction for object
-                    def get_timestamp():
-                        if hasattr(row, 'updated_at') and row.updated_at:
-                            return str(row.updated_at)
-                        if hasattr(row, 'created_at') and row.created_at:
-                            return str(row.created_at)
-                        return "Unknown Time"
-
-                # Check if 'Session ID' column exists
-                # For dicts, we check keys. For objects, we check .columns keys
-                has_session_id = "Session ID" in columns if isinstance(columns, dict) else "Session ID" in columns
-                
-                if has_session_id:
-                    row_session_id = get_text("Session ID")
-                    
-                    # Strict string comparison with stripping
-                    if row_session_id and str(row_session_id).strip() == str(session_id).strip():
-                        user_text = get_text("User")
-                        ai_text = get_text("AI")
-                        timestamp = get_timestamp()
-                        
-                        # Add User Message
-                        if user_text:
-                            history.append({
-                                "role": "user",
-                                "content": user_text,
-                                "timestamp": timestamp
-                            })
-                        # Add AI Message
-                        if ai_text:
-                            history.append({
-                                "role": "assistant",
-                                "content": ai_text,
-                                "timestamp": timestamp
-                            })
-            
-            # Sort by timestamp to ensure correct order (oldest first)
-            history.sort(key=lambda x: x['timestamp'])
-            print(f"DEBUG: Found {len(history)} messages for this session.")
-            
+        _ensure_chat_history(session_id)
+
+        history = history_store.get_history(_session_history_key(session_id))
+        print(f"DEBUG: Found {len(history)} messages for this session.")
         return history
 
     except Exception as e:
@@ -718,9 +1230,127 @@ def get_chat_history(session_id):
             "timestamp": "System"
         }]
 
-def embed_file_in_jamai(file_path, bot_type="Public"):
+def get_history_page(session_id=None, table_id=None, cursor=None, since=None, limit=None):
+    """
+    Incremental history for /api/history: the messages of a session (or of a per-session Chat Table
+    when `table_id` is given) after `cursor` / `since`, at most `limit` of them.
+    Returns {"history", "next_cursor", "has_more", "etag"}. Raises ValueError for a bad cursor.
+    """
+    try:
+        if table_id:
+            _ensure_public_chat_history(table_id)
+            session_key = _chat_table_history_key(table_id)
+        else:
+            _ensure_chat_history(session_id)
+            session_key = _session_history_key(session_id)
+    except Exception as e:
+        print(f"Error fetching history: {e}")
+        return {
+            "history": [{
+                "role": "assistant",
+                "content": f"⚠️ **Connection Error**: Could not load chat history. {str(e)}",
+                "timestamp": "System"
+            }],
+            "next_cursor": cursor,
+            "has_more": False,
+            "etag": None
+        }
+
+    messages, next_cursor, has_more, etag = history_store.get_page(session_key, cursor=cursor, since=since, limit=limit)
+    return {"history": messages, "next_cursor": next_cursor, "has_more": has_more, "etag": etag}
+
+# --- Idle Chat Table Reaper ---
+
+def _list_chat_tables():
+    """Yields (table_id, updated_at) for every per-session chat table (chat_* children of a base table)."""
+    offset = 0
+    limit = 100
+    while True:
+        with jamai_clients.client("Public") as client:
+            page = client.table.list_tables("chat", offset=offset, limit=limit)
+        for meta in page.items:
+            if meta.id.startswith("chat_") and meta.parent_id:
+                yield meta.id, meta.updated_at
+        if len(page.items) < limit:
+            break
+        offset += limit
+
+def _chat_table_activity():
+    prefix = _chat_table_history_key("")
+    return {key[len(prefix):]: last_active for key, last_active in history_store.last_active(prefix).items()}
+
+chat_table_reaper = ChatTableReaper(
+    _list_chat_tables,
+    lambda table_id: delete_table("chat", table_id),
+    _chat_table_activity,
+    is_protected=chat_table_pool.is_pooled
+)
+
+# Content hashes of each knowledge table's files and chunks, so re-uploads only embed what changed
+knowledge_manifest = KnowledgeManifest()
+
+def _like_suffix(value):
+    """SQL `LIKE` operand matching strings that end in `value`, with its wildcards and quotes escaped."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("'", "''")
+    return f"'%{escaped}' ESCAPE '\\'"
+
+def _knowledge_file_rows(client, table_id, file_name):
+    """[(chunk hash, row id)] of the rows embed_file created for the uploaded file `file_name`."""
+    rows = []
+    offset = 0
+    while True:
+        page = client.table.list_table_rows(
+            table_type="knowledge",
+            table_id=table_id,
+            offset=offset,
+            limit=100,
+            columns=["Text", "File ID"],
+            where=f'"File ID" LIKE {_like_suffix(file_name)}'
+        )
+        rows.extend((chunk_digest(_row_text(row, "Text")), _row_id(row)) for row in page.items)
+        offset += len(page.items)
+        if len(page.items) < 100:
+            return rows
+
+def _add_knowledge_chunks(client, table_id, file_key, chunks):
+    """Adds [(hash, text)] as knowledge rows (JamAI embeds them). Returns {hash: row id}."""
+    added = {}
+    for i in range(0, len(chunks), 50):
+        batch = chunks[i:i + 50]
+        completion = client.table.add_table_rows(
+            table_type="knowledge",
+            request=protocol.MultiRowAddRequest(
+                table_id=table_id,
+                data=[{"Title": file_key, "Text": text, "File ID": file_key} for _, text in batch],
+                stream=False
+            )
+        )
+        for (digest, _), row in zip(batch, completion.rows):
+            added[digest] = row.row_id
+    return added
+
+def _delete_knowledge_rows(client, table_id, row_ids):
+    for i in range(0, len(row_ids), 100):
+        client.table.delete_table_rows(
+            table_type="knowledge",
+            request=protocol.MultiRowDeleteRequest(table_id=table_id, row_ids=row_ids[i:i + 100])
+        )
+
+def _read_text(file_path):
+    if os.path.splitext(file_path)[1].lower() not in TEXT_EXTENSIONS:
+        return None
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            return f.read()
+    except UnicodeDecodeError:
+        return None
+
+def embed_file_in_jamai(file_path, bot_type="Public", filename=None):
     """
     Embeds a file into a JamAI table.
+    `filename` (the upload name, default: the file's name) identifies the file across versions:
+    identical content is skipped, and a new version only replaces the chunks that changed.
+    Returns {"status": "unchanged" | "embedded" | "updated", "added", "removed", "kept"}.
     """
     try:
         config = BOT_CONFIG.get(bot_type)
@@ -734,14 +1364,73 @@ def embed_file_in_jamai(file_path, bot_type="Public"):
              # For now, let's raise an error to be safe.
              raise ValueError(f"No knowledge table configured for bot_type: {bot_type}")
 
-        # Initialize client for this specific bot
-        client = JamAI(token=config["api_key"], project_id=config["project_id"])
+        file_key = filename or os.path.basename(file_path)
+        file_hash = file_digest(file_path)
+        with knowledge_manifest.lock(table_id, file_key):
+            existing = knowledge_manifest.find_content(table_id, file_hash)
+            if existing:
+                knowledge_manifest.skipped += 1
+                print(f"DEBUG: {file_key} is already in {table_id} (as {existing['file_key']}); not embedding it again.")
+                return {"status": "unchanged", "added": 0, "removed": 0, "kept": existing["chunk_count"]}
 
-        response = client.table.embed_file(
-            file_path=file_path,
-            table_id=table_id,
-        )
-        return response
+            known = knowledge_manifest.chunks(table_id, file_key)
+            text = _read_text(file_path)
+            with jamai_clients.client(bot_type) as client:
+                if text is not None:
+                    # Plain text: chunk here and send only the chunks the table doesn't have yet
+                    to_add, to_delete, kept = diff_chunks(known, chunk_text(text))
+                    chunks = {digest: row_id for digest, row_id in known.items() if row_id not in to_delete}
+                    chunks.update(_add_knowledge_chunks(client, table_id, file_key, to_add))
+                    added, removed = len(to_add), len(to_delete)
+                else:
+                    client.table.embed_file(
+                        file_path=file_path,
+                        table_id=table_id,
+                    )
+                    # JamAI chunked the whole file: keep the old rows of unchanged chunks, drop the new copies
+                    try:
+                        new_rows = _knowledge_file_rows(client, table_id, os.path.basename(file_path))
+                    except Exception as e:
+                        # Without the new rows there is nothing safe to diff: delete nothing and keep the
+                        # manifest entry, so the next upload of this file lists and deduplicates both copies
+                        print(f"Warning: could not list the rows of {file_key}; its old chunks are left in place: {e}")
+                        metrics.count_error("knowledge", e)
+                        return {"status": "updated" if known else "embedded", "added": 0, "removed": 0, "kept": 0}
+                    chunks, duplicates = {}, []
+                    known_rows = set(known.values())
+                    for digest, row_id in new_rows:
+                        if row_id in known_rows:
+                            continue  # the previous version's row (same file name)
+                        if digest in chunks or known.get(digest):
+                            duplicates.append(row_id)
+                            chunks.setdefault(digest, known.get(digest))
+                        else:
+                            chunks[digest] = row_id
+                    gone = [row_id for digest, row_id in known.items() if digest not in chunks and row_id]
+                    to_delete = duplicates + gone
+                    kept = sum(1 for digest in chunks if known.get(digest))
+                    added, removed = len(chunks) - kept, len(gone)
+                if to_delete:
+                    _delete_knowledge_rows(client, table_id, to_delete)
+
+            knowledge_manifest.record(table_id, file_key, file_hash, os.path.getsize(file_path), chunks)
+        knowledge_manifest.chunks_added += added
+        knowledge_manifest.chunks_removed += removed
+        knowledge_manifest.chunks_kept += kept
+        print(f"DEBUG: Embedded {file_key} into {table_id}: {added} chunk(s) added, {removed} removed, {kept} unchanged.")
+        # New knowledge: cached answers built without it no longer match
+        knowledge_versions[bot_type] += 1
+        return {"status": "updated" if known else "embedded", "added": added, "removed": removed, "kept": kept}
     except Exception as e:
         print(f"Error embedding file: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+# Per-bot limits on embed calls, shared by single and bulk uploads (see bulk_ingest.py)
+ingest_limiter = BotRateLimiter()
+
+def _process_upload(path, bot_type, filename):
+    with ingest_limiter.slot(bot_type):
+        embed_file_in_jamai(path, bot_type=bot_type, filename=filename)
+
+# Knowledge uploads are embedded by background workers (see upload_jobs.py); server.py starts them
+upload_jobs = UploadJobQueue(_process_upload)